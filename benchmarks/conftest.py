@@ -0,0 +1,110 @@
+"""Offline fixtures for the benchmarks: a temporary profile, synthetic structures, pseudos and codes."""
+import numpy as np
+import pytest
+from aiida import orm
+
+# A temporary `core.sqlite_dos` profile, that needs no services nor existing codes
+pytest_plugins = ['aiida.tools.pytest_fixtures']
+
+# (number of atoms, number of kinds) of the synthetic structures
+SIZES = [(10, 2), (100, 10), (1000, 20), (5000, 50)]
+
+# Hubbard elements alternate with the ligands
+_HUBBARD_ELEMENTS = ('Mn', 'Fe', 'Co', 'Ni', 'Cu')
+_LIGANDS = {'O': '2p', 'S': '3p'}
+_SPACING = 2.0  # Å
+
+_UPF = """<UPF version="2.0.1">
+<PP_HEADER element="{element}" z_valence="{z_valence}" functional="PBESOL" />
+</UPF>
+"""
+_Z_VALENCE = {'Li': 3.0, 'Mn': 15.0, 'Fe': 16.0, 'Co': 17.0, 'Ni': 18.0, 'Cu': 19.0, 'O': 6.0, 'S': 6.0}
+
+
+def get_kind_symbol(index: int) -> str:
+    """Return the element of the kind with the given index: Hubbard elements for even, ligands for odd indices."""
+    if index % 2:
+        return list(_LIGANDS)[(index // 2) % len(_LIGANDS)]
+    return _HUBBARD_ELEMENTS[(index // 2) % len(_HUBBARD_ELEMENTS)]
+
+
+def make_structure(num_atoms: int, num_kinds: int) -> orm.StructureData:
+    """
+    Return a synthetic `StructureData` of `num_atoms` atoms on a simple cubic grid.
+
+    The grid is a rock-salt checkerboard of Hubbard elements and ligands, so that every
+    Hubbard atom has ligand neighbours at `_SPACING`; consecutive atoms of each sublattice
+    cycle over half of the `num_kinds` kinds.
+    """
+    side = int(np.ceil(num_atoms ** (1 / 3)))
+    side += side % 2  # keep the checkerboard periodic
+    grid = np.stack(np.meshgrid(*[np.arange(side)] * 3, indexing='ij'), axis=-1).reshape(-1, 3)
+    structure = orm.StructureData(cell=(np.eye(3) * side * _SPACING).tolist())
+    for index, point in enumerate(grid[:num_atoms]):
+        kind = 2 * (index % (num_kinds // 2)) + int(point.sum() % 2)
+        symbol = get_kind_symbol(kind)
+        structure.append_atom(position=(point * _SPACING).tolist(), symbols=symbol, name=f'{symbol}{kind}')
+    return structure
+
+
+def make_pseudos() -> dict:
+    """Return a stored `UpfData` per element, parsed from a synthetic header."""
+    import io
+
+    from aiida_pseudo.data.pseudo import UpfData
+
+    return {
+        element: UpfData(io.BytesIO(_UPF.format(element=element, z_valence=z_valence).encode())).store()
+        for element, z_valence in _Z_VALENCE.items()
+    }
+
+
+def get_hubbard_parameters(structure) -> tuple:
+    """Return `hubbard_u` and `hubbard_v` entries for every Hubbard kind, as in the settings model."""
+    hubbard_kinds = [kind.name for kind in structure.kinds if kind.symbol in _HUBBARD_ELEMENTS]
+    ligand = next(kind for kind in structure.kinds if kind.symbol in _LIGANDS)
+    hubbard_u = [[name, '3d', 4.0] for name in hubbard_kinds]
+    hubbard_v = [[name, '3d', ligand.name, _LIGANDS[ligand.symbol], 1.0] for name in hubbard_kinds]
+    return hubbard_u, hubbard_v
+
+
+@pytest.fixture(scope='session')
+def pseudos():
+    """Return a `UpfData` per element, parsed from a synthetic header."""
+    return make_pseudos()
+
+
+@pytest.fixture
+def codes(aiida_code_installed):
+    """Return the codes and resources as passed to `get_builder`, with dummy pw.x and hp.x executables."""
+    resources = {'nodes': 1, 'ntasks_per_node': 4, 'cpus_per_task': 1, 'max_wallclock_seconds': 3600}
+    return {
+        'pw': {'code': aiida_code_installed(default_calc_job_plugin='quantumespresso.pw', label='pw'), **resources},
+        'hp': {'code': aiida_code_installed(default_calc_job_plugin='quantumespresso.hp', label='hp'), **resources},
+    }
+
+
+@pytest.fixture(scope='session', params=SIZES, ids=[f'{atoms}atoms-{kinds}kinds' for atoms, kinds in SIZES])
+def structure(request):
+    """Return a synthetic structure of every size in `SIZES`."""
+    return make_structure(*request.param)
+
+
+@pytest.fixture(scope='session')
+def hubbard_parameters(structure):
+    """Return `hubbard_u` and `hubbard_v` entries for every Hubbard kind of the structure."""
+    return get_hubbard_parameters(structure)
+
+
+@pytest.fixture
+def set_input_structure():
+    """Return a function that sets the input structure of a settings model."""
+
+    def factory(model, structure):
+        # Newer QE app versions keep the uuid of the stored structure instead of the node
+        if model.has_trait('structure_uuid'):
+            model.structure_uuid = structure.store().uuid
+        else:
+            model.input_structure = structure
+
+    return factory
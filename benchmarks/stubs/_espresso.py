@@ -0,0 +1,73 @@
+"""Input reading shared by the pw.x and hp.x stand-ins; standard library only."""
+import re
+
+BOHR_TO_ANGSTROM = 0.529177210903
+
+_CARDS = ('ATOMIC_SPECIES', 'ATOMIC_POSITIONS', 'K_POINTS', 'CELL_PARAMETERS', 'HUBBARD')
+
+
+def fortran_value(string: str):
+    """Return the Python value of a namelist value written by the AiiDA input generators."""
+    string = string.strip().rstrip(',')
+    if string.lower() in ('.true.', '.t.'):
+        return True
+    if string.lower() in ('.false.', '.f.'):
+        return False
+    if string[:1] in ('"', "'"):
+        return string[1:-1]
+    try:
+        return int(string)
+    except ValueError:
+        return float(string.lower().replace('d', 'e'))
+
+
+def read_input(text: str) -> tuple:
+    """
+    Return the namelists and cards of a pw.x or hp.x input file.
+
+    :returns: tuple of a dict mapping the upper-case namelist names to dicts of their
+        variables, and a dict mapping the card names to a tuple of the card option and
+        its lines.
+    """
+    namelists, cards = {}, {}
+    namelist = card = None
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith('!'):
+            continue
+        if stripped.startswith('&'):
+            namelist = namelists.setdefault(stripped[1:].upper(), {})
+        elif stripped == '/':
+            namelist = None
+        elif namelist is not None:
+            key, _, value = stripped.partition('=')
+            namelist[key.strip()] = fortran_value(value)
+        elif stripped.split()[0] in _CARDS:
+            name, *option = stripped.split()
+            card = cards[name] = (re.sub(r'[{}()]', '', option[0]) if option else None, [])
+        elif card is not None:
+            card[1].append(stripped)
+    return namelists, cards
+
+
+def read_structure(cards: dict) -> tuple:
+    """Return the cell vectors and the `(kind, position)` sites, in Bohr, of the pw.x input cards."""
+    cell = [[float(value) / BOHR_TO_ANGSTROM for value in line.split()[:3]] for line in cards['CELL_PARAMETERS'][1]]
+    sites = []
+    for line in cards['ATOMIC_POSITIONS'][1]:
+        kind, *position = line.split()
+        sites.append((kind, [float(value) / BOHR_TO_ANGSTROM for value in position[:3]]))
+    return cell, sites
+
+
+def read_hubbard(cards: dict) -> tuple:
+    """
+    Return the projectors and parameters of the `HUBBARD` card.
+
+    Each parameter is a list of the type, the `kind-manifold` labels, the 1-based atom
+    indices of the inter-site parameters and the value, as in the card.
+    """
+    if 'HUBBARD' not in cards:
+        return None, []
+    projectors, lines = cards['HUBBARD']
+    return projectors, [line.split() for line in lines]
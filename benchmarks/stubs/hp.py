@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Stand-in for hp.x, for the end-to-end throughput harness.
+
+It reads the input of an `HpCalculation` and the `HUBBARD` card of the parent pw.x run,
+kept by the pw.x stand-in, and writes the files that the `HpParser` reads. Each run moves
+every Hubbard value halfway towards a target that depends on the q-point mesh, so that a
+self-consistent cycle converges and finer meshes change the values less and less. The
+initialization, q-mesh and single-perturbation runs of the parallelized workflows only
+write what those runs write. `QE_STUB_SECONDS` sets how long the run pretends to take.
+"""
+import argparse
+import os
+import pathlib
+import time
+
+from _espresso import read_input, read_structure, read_hubbard
+
+ONSITE_TARGET = 6.0  # eV, for the Γ-only mesh
+INTERSITE_TARGET = 1.2
+
+
+def get_targets(inputhp: dict) -> tuple:
+    """Return the on-site and inter-site targets for the q-point mesh of the run."""
+    num_qpoints = inputhp.get('nq1', 1) * inputhp.get('nq2', 1) * inputhp.get('nq3', 1)
+    return ONSITE_TARGET - 0.5 + 0.5 / num_qpoints, INTERSITE_TARGET - 0.1 + 0.1 / num_qpoints
+
+
+def get_hubbard_sites(sites: list, parameters: list) -> list:
+    """Return the `(index, kind, manifold)` of the first atom of every Hubbard kind, with 1-based indices."""
+    manifolds = {}
+    for parameter in parameters:
+        kind, _, manifold = parameter[1].partition('-')
+        is_onsite = parameter[0] == 'U' or (parameter[1] == parameter[2] and parameter[3] == parameter[4])
+        if is_onsite and kind not in manifolds:
+            manifolds[kind] = manifold
+    hubbard_sites, seen = [], set()
+    for index, (kind, _) in enumerate(sites, start=1):
+        if kind in manifolds and kind not in seen:
+            seen.add(kind)
+            hubbard_sites.append((index, kind, manifolds[kind]))
+    return hubbard_sites
+
+
+def write_matrix(handle, title: str, size: int, diagonal: float):
+    handle.write(f'\n {title}\n\n')
+    for row in range(size):
+        handle.write(' '.join(f'{diagonal if row == column else 0.1:10.6f}' for column in range(size)) + '\n\n')
+
+
+def write_results(inputhp: dict, projectors: str, parameters: list, hubbard_sites: list, kinds: list):
+    """Write the Hubbard parameters, the response matrices and the `HUBBARD.dat` of a complete run."""
+    onsite_target, intersite_target = get_targets(inputhp)
+    values = []
+    for parameter in parameters:
+        target = onsite_target if parameter[0] == 'U' or parameter[1] == parameter[2] else intersite_target
+        value = float(parameter[-1])
+        values.append(round(value + (target - value) / 2, 4))
+
+    size = max(len(hubbard_sites), 1)
+    prefix, outdir = inputhp.get('prefix', 'aiida'), pathlib.Path(inputhp.get('outdir', 'out'))
+    onsite = {parameter[1].partition('-')[0]: value for parameter, value in zip(parameters, values)
+              if parameter[0] == 'U' or parameter[1] == parameter[2]}
+    with open(f'{prefix}.Hubbard_parameters.dat', 'w', encoding='utf-8') as handle:
+        handle.write('\n  site n.  type  label  spin  new_type  new_label  manifold  Hubbard U (eV)\n')
+        for index, kind, manifold in hubbard_sites:
+            kind_type = kinds.index(kind) + 1
+            handle.write(f'    {index:3d}  {kind_type:3d}  {kind:>6}  1  {kind_type:3d}  {kind:>6}  {manifold:>4}'
+                         f'  {onsite.get(kind, onsite_target):.4f}\n')
+        handle.write('\n')
+        for title, diagonal in (
+            ('chi0 matrix :', -0.5), ('chi matrix :', -0.2), ('chi0^{-1} matrix :', -2.0),
+            ('chi^{-1} matrix :', -5.0), ('Hubbard matrix :', 3.0),
+        ):
+            write_matrix(handle, title, size, diagonal)
+    (outdir / 'HP').mkdir(parents=True, exist_ok=True)
+    with open(outdir / 'HP' / f'{prefix}.chi.dat', 'w', encoding='utf-8') as handle:
+        handle.write('\n chi0 :\n')
+        write_matrix(handle, '', size, -0.5)
+        handle.write('\n chi :\n')
+        write_matrix(handle, '', size, -0.2)
+    with open('HUBBARD.dat', 'w', encoding='utf-8') as handle:
+        handle.write('# Copy this data in the pw.x input file for DFT+Hubbard calculations\n')
+        handle.write(f'HUBBARD\t{{{projectors}}}\n')
+        for parameter, value in zip(parameters, values):
+            handle.write('\t'.join([*parameter[:-1], f'{value:.4f}']) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-in', '-inp', '-input', dest='input', required=True)
+    args, _ = parser.parse_known_args()
+
+    inputhp = read_input(pathlib.Path(args.input).read_text())[0].get('INPUTHP', {})
+    outdir = pathlib.Path(inputhp.get('outdir', 'out'))
+    _, cards = read_input((outdir / f"{inputhp.get('prefix', 'aiida')}.save" / 'pw.in').read_text())
+    _, sites = read_structure(cards)
+    kinds = [line.split()[0] for line in cards['ATOMIC_SPECIES'][1]]
+    projectors, parameters = read_hubbard(cards)
+    hubbard_sites = get_hubbard_sites(sites, parameters)
+    time.sleep(float(os.environ.get('QE_STUB_SECONDS', 0)))
+
+    print('\n     Program HP v.7.2 starts\n')
+    perturbed = [key for key in inputhp if key.startswith('perturb_only_atom') and inputhp[key]]
+    if inputhp.get('determine_num_pert_only'):
+        print(f'     List of {len(hubbard_sites):6d} atoms which will be perturbed (one at a time):\n')
+        for index, kind, _ in hubbard_sites:
+            print(f'    {index:3d}  {kind:>6}')
+    elif inputhp.get('determine_q_mesh_only'):
+        nq = [inputhp.get(f'nq{axis}', 1) for axis in (1, 2, 3)]
+        print(f'     The grid of q-points ({nq[0]:3d}{nq[1]:3d}{nq[2]:3d})  {nq[0] * nq[1] * nq[2]:6d} q-points')
+    elif perturbed and not inputhp.get('compute_hp'):
+        (outdir / 'HP').mkdir(parents=True, exist_ok=True)
+        index = perturbed[0].partition('(')[2].rstrip(')')
+        (outdir / 'HP' / f"{inputhp.get('prefix', 'aiida')}.chi.pert_{index}.dat").write_text('chi\n')
+    else:
+        write_results(inputhp, projectors, parameters, hubbard_sites, kinds)
+    print('\n     JOB DONE.\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Stand-in for pw.x, for the end-to-end throughput harness.
+
+It reads the input of a `PwCalculation` and writes a stdout and an XML data file that
+the `PwParser` accepts, for an insulator with a band gap around the Fermi energy and
+no forces nor stress, so every scf converges and every relaxation stops at the input
+structure after a single step. The number of electrons is the sum of the `z_valence`
+of the pseudopotentials. The input is kept next to the XML, where the hp.x stand-in
+reads the `HUBBARD` card. Nothing is computed; `QE_STUB_SECONDS` sets how long the run
+pretends to take.
+"""
+import argparse
+import math
+import os
+import pathlib
+import re
+import shutil
+import sys
+import time
+import xml.etree.ElementTree as ElementTree
+
+from _espresso import read_input, read_structure
+
+NAMESPACE = 'http://www.quantum-espresso.org/ns/qes/qes-1.0'
+SCHEMA_LOCATION = f'{NAMESPACE} http://www.quantum-espresso.org/ns/qes/qes_230310.xsd'
+
+# Names of the smearings in the XML schema
+SMEARINGS = {'cold': 'mv', 'marzari-vanderbilt': 'mv', 'm-v': 'mv', 'mv': 'mv', 'methfessel-paxton': 'mp',
+             'm-p': 'mp', 'mp': 'mp', 'fermi-dirac': 'fd', 'f-d': 'fd', 'fd': 'fd'}
+
+# Band edges of the canned band structure, in Hartree
+VALENCE_BAND = (-0.40, -0.20)
+CONDUCTION_BAND_MINIMUM = -0.10
+
+
+def element(parent, tag, text=None, **attributes):
+    """Append a sub-element with the text and attributes formatted as in the QE XML."""
+    child = ElementTree.SubElement(parent, tag, {key: _format(value) for key, value in attributes.items()})
+    if text is not None:
+        child.text = _format(text)
+    return child
+
+
+def _format(value) -> str:
+    if isinstance(value, bool):
+        return str(value).lower()
+    if isinstance(value, (list, tuple)):
+        return ' '.join(_format(item) for item in value)
+    return str(value)
+
+
+def _cross(u, v) -> list:
+    return [u[1] * v[2] - u[2] * v[1], u[2] * v[0] - u[0] * v[2], u[0] * v[1] - u[1] * v[0]]
+
+
+def get_volume(cell: list) -> float:
+    """Return the (signed) volume of the cell."""
+    return sum(x * y for x, y in zip(cell[0], _cross(cell[1], cell[2])))
+
+
+def get_reciprocal_lattice(cell: list) -> list:
+    """Return the reciprocal vectors in units of 2π/alat, with alat the length of the first cell vector."""
+    alat = math.dist(cell[0], (0, 0, 0))
+    a1, a2, a3 = ([value / alat for value in vector] for vector in cell)
+    volume = get_volume([a1, a2, a3])
+    return [[value / volume for value in _cross(u, v)] for u, v in ((a2, a3), (a3, a1), (a1, a2))]
+
+
+def get_z_valence(pseudo_dir: pathlib.Path, filename: str) -> float:
+    """Return the number of valence electrons of a UPF pseudopotential."""
+    match = re.search(r'z_valence\s*=\s*"\s*([-+.\dEeDd]+)', (pseudo_dir / filename).read_text(errors='ignore'))
+    return float(match.group(1).replace('D', 'E').replace('d', 'e')) if match else 1.0
+
+
+def get_fft_grid(cell: list, ecutrho: float) -> list:
+    """Return an FFT grid large enough for the density cutoff, in Ry."""
+    return [int(2 * math.sqrt(ecutrho) * math.dist(vector, (0, 0, 0)) / (2 * math.pi)) + 1 for vector in cell]
+
+
+def write_xml(filepath, namelists: dict, cards: dict, pseudo_dir: pathlib.Path) -> dict:
+    """Write the XML data file of the run and return the numbers that are also printed in the stdout."""
+    control, system = namelists.get('CONTROL', {}), namelists.get('SYSTEM', {})
+    calculation = control.get('calculation', 'scf')
+    cell, sites = read_structure(cards)
+    species = [line.split() for line in cards['ATOMIC_SPECIES'][1]]
+    z_valence = {name: get_z_valence(pseudo_dir, pseudo) for name, _, pseudo in species}
+    nelec = sum(z_valence[kind] for kind, _ in sites) - system.get('tot_charge', 0.0)
+    lsda = system.get('nspin', 1) == 2
+    occupations = system.get('occupations', 'fixed')
+    num_occupied = math.ceil(nelec / 2)
+    nbnd = system.get('nbnd') or (num_occupied if occupations == 'fixed' else max(round(0.6 * nelec), num_occupied + 4))
+    nk = [int(value) for value in cards['K_POINTS'][1][0].split()] if cards['K_POINTS'][0] == 'automatic' else None
+    alat = math.dist(cell[0], (0, 0, 0))
+    volume = abs(get_volume(cell))
+    ecutwfc, ecutrho = system['ecutwfc'] / 2, system.get('ecutrho', 4 * system['ecutwfc']) / 2  # Hartree
+    fft_grid = get_fft_grid(cell, 2 * ecutrho)
+    npwx = int(volume * (2 * ecutwfc) ** 1.5 / (6 * math.pi ** 2)) + 1
+    ngm = int(volume * (2 * ecutrho) ** 1.5 / (6 * math.pi ** 2)) + 1
+    energy = -10.0 * nelec
+
+    eigenvalues = [
+        VALENCE_BAND[0] + (VALENCE_BAND[1] - VALENCE_BAND[0]) * band / max(num_occupied - 1, 1)
+        for band in range(num_occupied)
+    ] + [CONDUCTION_BAND_MINIMUM + 0.01 * band for band in range(nbnd - num_occupied)]
+    band_occupations = [1.0] * num_occupied + [0.0] * (nbnd - num_occupied)
+    if lsda:
+        eigenvalues, band_occupations = eigenvalues * 2, band_occupations * 2
+
+    ElementTree.register_namespace('qes', NAMESPACE)
+    root = ElementTree.Element(f'{{{NAMESPACE}}}espresso', {
+        '{http://www.w3.org/2001/XMLSchema-instance}schemaLocation': SCHEMA_LOCATION,
+        'Units': 'Hartree atomic units',
+    })
+    today = time.strftime('%d%b%Y'), time.strftime('%H:%M:%S')
+    general_info = element(root, 'general_info')
+    element(general_info, 'xml_format', 'QEXSD_23.03.10', NAME='QEXSD', VERSION='23.03.10')
+    element(general_info, 'creator', 'XML file generated by PWSCF', NAME='PWSCF', VERSION='7.2')
+    element(general_info, 'created', 'This run was terminated on:  ' + ' '.join(today), DATE=today[0], TIME=today[1])
+    element(general_info, 'job', '')
+
+    def add_species(parent):
+        atomic_species = element(parent, 'atomic_species', ntyp=len(species), pseudo_dir=str(pseudo_dir))
+        for name, mass, pseudo in species:
+            specie = element(atomic_species, 'species', name=name)
+            element(specie, 'mass', float(mass))
+            element(specie, 'pseudo_file', pseudo)
+
+    def add_structure(parent):
+        atomic_structure = element(parent, 'atomic_structure', nat=len(sites), alat=alat)
+        positions = element(atomic_structure, 'atomic_positions')
+        for index, (kind, position) in enumerate(sites, start=1):
+            element(positions, 'atom', position, name=kind, index=index)
+        cell_element = element(atomic_structure, 'cell')
+        for name, vector in zip(('a1', 'a2', 'a3'), cell):
+            element(cell_element, name, vector)
+
+    def add_k_points(parent, name):
+        k_points = element(parent, name)
+        if nk:
+            element(k_points, 'monkhorst_pack', 'Monkhorst-Pack', **dict(zip(('nk1', 'nk2', 'nk3', 'k1', 'k2', 'k3'), nk)))
+        else:
+            element(k_points, 'nk', 1)
+            element(k_points, 'k_point', [0.0, 0.0, 0.0], weight=1.0)
+
+    inputs = element(root, 'input')
+    control_variables = element(inputs, 'control_variables')
+    for tag, value in (
+        ('title', ''), ('calculation', calculation),
+        ('restart_mode', control.get('restart_mode', 'from_scratch')), ('prefix', control.get('prefix', 'aiida')),
+        ('pseudo_dir', str(pseudo_dir)), ('outdir', control.get('outdir', './out/')),
+        ('stress', control.get('tstress', False)), ('forces', control.get('tprnfor', False)),
+        ('wf_collect', True), ('disk_io', 'low'), ('max_seconds', int(control.get('max_seconds', 10000000))),
+        ('etot_conv_thr', control.get('etot_conv_thr', 1.0e-5)), ('forc_conv_thr', control.get('forc_conv_thr', 1e-3)),
+        ('press_conv_thr', 0.5), ('verbosity', 'low'), ('print_every', 100000), ('fcp', False), ('rism', False),
+    ):
+        element(control_variables, tag, value)
+    add_species(inputs)
+    add_structure(inputs)
+    element(element(inputs, 'dft'), 'functional', 'PBESOL')
+    spin = element(inputs, 'spin')
+    element(spin, 'lsda', lsda)
+    element(spin, 'noncolin', False)
+    element(spin, 'spinorbit', False)
+    bands = element(inputs, 'bands')
+    if occupations == 'smearing':
+        element(bands, 'smearing', SMEARINGS.get(system.get('smearing'), 'gaussian'), degauss=system.get('degauss', 0.01) / 2)
+    element(bands, 'occupations', occupations)
+    basis = element(inputs, 'basis')
+    element(basis, 'ecutwfc', ecutwfc)
+    element(basis, 'ecutrho', ecutrho)
+    electron_control = element(inputs, 'electron_control')
+    for tag, value in (
+        ('diagonalization', 'davidson'), ('mixing_mode', 'plain'), ('mixing_beta', 0.4),
+        ('conv_thr', namelists.get('ELECTRONS', {}).get('conv_thr', 1e-6) / 2), ('mixing_ndim', 8),
+        ('max_nstep', 100), ('tq_smoothing', False), ('tbeta_smoothing', False), ('diago_thr_init', 0.0),
+        ('diago_full_acc', False),
+    ):
+        element(electron_control, tag, value)
+    add_k_points(inputs, 'k_points_IBZ')
+    element(element(inputs, 'ion_control'), 'ion_dynamics', namelists.get('IONS', {}).get('ion_dynamics', 'none'))
+    cell_control = element(inputs, 'cell_control')
+    element(cell_control, 'cell_dynamics', namelists.get('CELL', {}).get('cell_dynamics', 'none'))
+    element(cell_control, 'pressure', 0.0)
+
+    def add_forces(parent):
+        element(parent, 'forces', [0.0] * 3 * len(sites), rank=2, dims=[3, len(sites)])
+        if calculation == 'vc-relax':
+            element(parent, 'stress', [0.0] * 9, rank=2, dims=[3, 3])
+
+    if calculation in ('relax', 'vc-relax'):
+        # A single BFGS step, that finds the input structure relaxed
+        step = element(root, 'step', n_step=1)
+        step_conv = element(step, 'scf_conv')
+        element(step_conv, 'convergence_achieved', True)
+        element(step_conv, 'n_scf_steps', 8)
+        element(step_conv, 'scf_error', 1.0e-10)
+        add_structure(step)
+        element(element(step, 'total_energy'), 'etot', energy)
+        add_forces(step)
+
+    outputs = element(root, 'output')
+    scf_conv = element(element(outputs, 'convergence_info'), 'scf_conv')
+    element(scf_conv, 'convergence_achieved', True)
+    element(scf_conv, 'n_scf_steps', 8)
+    element(scf_conv, 'scf_error', 1.0e-10)
+    algorithmic_info = element(outputs, 'algorithmic_info')
+    element(algorithmic_info, 'real_space_q', False)
+    element(algorithmic_info, 'real_space_beta', False)
+    element(algorithmic_info, 'uspp', True)
+    element(algorithmic_info, 'paw', False)
+    add_species(outputs)
+    add_structure(outputs)
+    symmetries = element(outputs, 'symmetries')
+    element(symmetries, 'nsym', 1)
+    element(symmetries, 'nrot', 1)
+    element(symmetries, 'space_group', 0)
+    symmetry = element(symmetries, 'symmetry')
+    element(symmetry, 'info', 'crystal_symmetry', name='identity')
+    element(symmetry, 'rotation', [1, 0, 0, 0, 1, 0, 0, 0, 1], rank=2, dims=[3, 3])
+    element(symmetry, 'fractional_translation', [0.0, 0.0, 0.0])
+    element(symmetry, 'equivalent_atoms', list(range(1, len(sites) + 1)), size=len(sites), nat=len(sites))
+    basis_set = element(outputs, 'basis_set')
+    element(basis_set, 'gamma_only', False)
+    element(basis_set, 'ecutwfc', ecutwfc)
+    element(basis_set, 'ecutrho', ecutrho)
+    element(basis_set, 'fft_grid', nr1=fft_grid[0], nr2=fft_grid[1], nr3=fft_grid[2])
+    element(basis_set, 'fft_smooth', nr1=fft_grid[0], nr2=fft_grid[1], nr3=fft_grid[2])
+    element(basis_set, 'ngm', ngm)
+    element(basis_set, 'ngms', ngm)
+    element(basis_set, 'npwx', npwx)
+    reciprocal_lattice = element(basis_set, 'reciprocal_lattice')
+    for name, vector in zip(('b1', 'b2', 'b3'), get_reciprocal_lattice(cell)):
+        element(reciprocal_lattice, name, vector)
+    element(element(outputs, 'dft'), 'functional', 'PBESOL')
+    magnetization = element(outputs, 'magnetization')
+    element(magnetization, 'lsda', lsda)
+    element(magnetization, 'noncolin', False)
+    element(magnetization, 'spinorbit', False)
+    element(magnetization, 'total', 0.0)
+    element(magnetization, 'absolute', 0.0)
+    element(magnetization, 'do_magnetization', lsda)
+    total_energy = element(outputs, 'total_energy')
+    element(total_energy, 'etot', energy)
+    band_structure = element(outputs, 'band_structure')
+    element(band_structure, 'lsda', lsda)
+    element(band_structure, 'noncolin', False)
+    element(band_structure, 'spinorbit', False)
+    if lsda:
+        element(band_structure, 'nbnd_up', nbnd)
+        element(band_structure, 'nbnd_dw', nbnd)
+    else:
+        element(band_structure, 'nbnd', nbnd)
+    element(band_structure, 'nelec', nelec)
+    element(band_structure, 'wf_collected', True)
+    if occupations == 'smearing':
+        element(band_structure, 'fermi_energy', (VALENCE_BAND[1] + CONDUCTION_BAND_MINIMUM) / 2)
+    else:
+        element(band_structure, 'highestOccupiedLevel', VALENCE_BAND[1])
+    add_k_points(band_structure, 'starting_k_points')
+    element(band_structure, 'nks', 1)
+    element(band_structure, 'occupations_kind', occupations)
+    ks_energies = element(band_structure, 'ks_energies')
+    element(ks_energies, 'k_point', [0.0, 0.0, 0.0], weight=1.0 if lsda else 2.0)
+    element(ks_energies, 'npw', npwx)
+    element(ks_energies, 'eigenvalues', eigenvalues, size=len(eigenvalues))
+    element(ks_energies, 'occupations', band_occupations, size=len(band_occupations))
+    if calculation in ('relax', 'vc-relax'):
+        add_forces(outputs)
+    element(root, 'exit_status', 0)
+    element(root, 'closed', ' '.join(today), DATE=today[0], TIME=today[1])
+
+    ElementTree.ElementTree(root).write(filepath, encoding='UTF-8', xml_declaration=True)
+    return {
+        'alat': alat, 'volume': volume, 'nat': len(sites), 'ntyp': len(species), 'nelec': nelec, 'nbnd': nbnd,
+        'fft_grid': ', '.join(f'{size:4d}' for size in fft_grid), 'ngm': ngm, 'energy': energy,
+    }
+
+
+def write_stdout(handle, calculation: str, numbers: dict):
+    """Write a pw.x stdout with the lines the `PwParser` looks for."""
+    handle.write(f"""
+     Program PWSCF v.7.2 starts on {time.strftime('%d%b%Y')} at {time.strftime('%H:%M:%S')}
+
+     bravais-lattice index     =            0
+     lattice parameter (alat)  = {numbers['alat']:12.4f}  a.u.
+     unit-cell volume          = {numbers['volume']:12.4f} (a.u.)^3
+     number of atoms/cell      = {numbers['nat']:12d}
+     number of atomic types    = {numbers['ntyp']:12d}
+     number of electrons       = {numbers['nelec']:12.2f}
+     number of Kohn-Sham states= {numbers['nbnd']:12d}
+     number of k points=     1
+
+     Dense  grid: {numbers['ngm']:8d} G-vectors     FFT dimensions: ({numbers['fft_grid']})
+     Smooth grid: {numbers['ngm']:8d} G-vectors     FFT dimensions: ({numbers['fft_grid']})
+
+     convergence has been achieved in   8 iterations
+
+!    total energy              = {2 * numbers['energy']:17.8f} Ry
+""")
+    if calculation in ('relax', 'vc-relax'):
+        handle.write("""
+     bfgs converged in   1 scf cycles and   0 bfgs steps
+
+     End of BFGS Geometry Optimization
+""")
+    handle.write("""
+     PWSCF        :      0.10s CPU      0.10s WALL
+
+
+   This run was terminated on:  00:00:00
+
+=------------------------------------------------------------------------------=
+   JOB DONE.
+=------------------------------------------------------------------------------=
+""")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-in', '-inp', '-input', dest='input', required=True)
+    args, _ = parser.parse_known_args()
+
+    namelists, cards = read_input(pathlib.Path(args.input).read_text())
+    control = namelists.get('CONTROL', {})
+    save = pathlib.Path(control.get('outdir', './out/')) / f"{control.get('prefix', 'aiida')}.save"
+    save.mkdir(parents=True, exist_ok=True)
+    time.sleep(float(os.environ.get('QE_STUB_SECONDS', 0)))
+
+    numbers = write_xml(save / 'data-file-schema.xml', namelists, cards, pathlib.Path(control.get('pseudo_dir', '.')))
+    (save / 'charge-density.dat').write_bytes(b'')
+    shutil.copyfile(args.input, save / 'pw.in')
+    write_stdout(sys.stdout, control.get('calculation', 'scf'), numbers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""Benchmarks of the Python hot paths of the plugin, on synthetic structures of 10 to 5000 atoms."""
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+
+@pytest.fixture
+def settings_panel(structure, hubbard_parameters, set_input_structure):
+    """Return a settings panel for the structure, with the Hubbard U and V tables."""
+    from aiidalab_qe_hp.model import HPSettingsModel
+    from aiidalab_qe_hp.setting import HPSettingsPanel
+
+    model = HPSettingsModel()
+    panel = HPSettingsPanel(model=model)
+    model.calculation_type = 'DFT+U+V'
+    set_input_structure(model, structure)
+    model.hubbard_u, model.hubbard_v = hubbard_parameters
+    return panel
+
+
+@pytest.fixture(scope='session')
+def hubbard_structure(structure):
+    """Return the structure with a U on every Hubbard atom and a V to the next atom of the grid."""
+    from aiida_quantumespresso.common.hubbard import Hubbard
+    from aiida_quantumespresso.data.hubbard_structure import HubbardStructureData
+
+    hubbard_structure = HubbardStructureData.from_structure(structure)
+    parameters = []
+    for index, site in enumerate(structure.sites[:-1]):
+        if structure.get_kind(site.kind_name).symbol in ('O', 'S'):
+            continue
+        parameters.append((index, '3d', index, '3d', 4.0, (0, 0, 0), 'Ueff'))
+        parameters.append((index, '3d', index + 1, '2p', 1.0, (0, 0, 0), 'V'))
+    hubbard_structure.hubbard = Hubbard.from_list(parameters)
+    return hubbard_structure
+
+
+def test_settings_panel_construction(benchmark, structure, set_input_structure):
+    from aiidalab_qe_hp.model import HPSettingsModel
+    from aiidalab_qe_hp.setting import HPSettingsPanel
+
+    def construct():
+        model = HPSettingsModel()
+        panel = HPSettingsPanel(model=model)
+        set_input_structure(model, structure)
+        return panel
+
+    benchmark(construct)
+
+
+def test_update_hubbard_tables(benchmark, settings_panel):
+    benchmark(settings_panel._update_hubbard_tables)
+
+
+def test_qpoints_preview(benchmark, settings_panel):
+    from aiidalab_qe_hp.qpoints import _get_qpoints_mesh
+
+    # The mesh is memoized, so the cache is cleared to time the first preview of a distance
+    benchmark.pedantic(
+        settings_panel._on_qpoints_distance_change, args=(None,), setup=_get_qpoints_mesh.cache_clear, rounds=20
+    )
+    assert settings_panel.qpoint_mesh.value.startswith('Mesh')
+
+
+def test_generate_table_data(benchmark, hubbard_structure):
+    from aiidalab_qe_hp.result.model import HpResultsModel
+
+    table = benchmark(HpResultsModel()._generate_table_data, hubbard_structure)
+    assert len(table['data']) == len(hubbard_structure.hubbard.parameters)
+
+
+def test_update_structure(benchmark, hubbard_structure):
+    from weas_widget import WeasWidget
+
+    from aiidalab_qe_hp.result import HpResultsModel, HpResultsPanel
+    from aiidalab_qe_hp.result.table import get_hubbard_arrays
+
+    panel = HpResultsPanel(model=HpResultsModel())
+    panel.structure_view = WeasWidget()
+    benchmark(panel._update_structure, get_hubbard_arrays(hubbard_structure))
+
+
+def test_get_builder(benchmark, structure, hubbard_parameters, codes, pseudos):
+    from aiidalab_qe_hp.workchain import get_builder
+
+    hubbard_u, hubbard_v = hubbard_parameters
+
+    def setup():
+        # `get_builder` pops the settings it consumes, so every round gets fresh parameters
+        parameters = {
+            'hp': {
+                'method': 'one-shot',
+                'relax_type': 'cell',
+                'calculation_type': 'DFT+U+V',
+                'projector_type': 'ortho-atomic',
+                'qpoints_distance': 1.0,
+                'parallelize_atoms': True,
+                'parallelize_qpoints': True,
+                'hubbard_u': [list(entry) for entry in hubbard_u],
+                'hubbard_v': [list(entry) for entry in hubbard_v],
+            },
+            'workchain': {
+                'protocol': 'fast',
+                'relax_type': 'none',
+                'electronic_type': 'insulator',
+                'spin_type': 'none',
+            },
+            'advanced': {
+                'initial_magnetic_moments': None,
+                'pw': {
+                    'pseudos': {kind.name: pseudos[kind.symbol] for kind in structure.kinds},
+                    'parameters': {'SYSTEM': {'ecutwfc': 45.0, 'ecutrho': 360.0}},
+                },
+            },
+        }
+        return (codes, structure, parameters), {}
+
+    # A single round, as the builder of the largest structures takes minutes
+    builder = benchmark.pedantic(get_builder, setup=setup, rounds=1)
+    assert len(builder.hubbard_structure.sites) == len(structure.sites)
@@ -0,0 +1,342 @@
+"""
+End-to-end throughput of HP workflows, offline, on stand-ins for pw.x and hp.x.
+
+The harness creates a temporary AiiDA profile with a ZeroMQ broker, a `localhost`
+computer and codes that run the `stubs/pw.py` and `stubs/hp.py` stand-ins. It then
+follows the path of the app for `--workflows` copies of LiCoO2 (or of a synthetic
+structure with `--atoms`):
+
+- configure: the settings model fills the `get_builder` parameters;
+- builder: `get_builder` and the `QeAppWorkChain` builder around it;
+- daemon: all workflows are submitted at once to `--workers` daemon workers, and the
+  time until the last one terminates gives the throughput;
+- results: `HpResultsModel.fetch_result` on a cold results cache, and the rendering
+  of the `HpResultsPanel`.
+
+The stand-ins write canned outputs, so the timings are those of AiiDA, the workflows
+and the plugin; `--pw-seconds` and `--hp-seconds` make each run take longer. Usage::
+
+    python benchmarks/throughput.py --workflows 8 --workers 2 --method one-shot
+"""
+import argparse
+import contextlib
+import json
+import os
+import pathlib
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+STUBS = pathlib.Path(__file__).resolve().parent / 'stubs'
+METHODS = ('one-shot', 'adaptive', 'self-consistent')
+
+
+@contextlib.contextmanager
+def temporary_profile(dirpath: pathlib.Path):
+    """Create and load a `core.sqlite_dos` profile with a ZeroMQ broker in `dirpath`, and stop its daemon on exit."""
+    from aiida.engine.daemon.client import DaemonException, get_daemon_client
+    from aiida.manage.configuration import create_profile, get_config, profile_context, reset_config, settings
+
+    variable = os.environ.get(settings.DEFAULT_AIIDA_PATH_VARIABLE)
+    os.environ[settings.DEFAULT_AIIDA_PATH_VARIABLE] = str(dirpath)
+    reset_config()
+    settings.AiiDAConfigDir.set(dirpath / settings.DEFAULT_CONFIG_DIR_NAME)
+    config = get_config(create=True)
+    profile = create_profile(
+        config,
+        storage_backend='core.sqlite_dos',
+        storage_config={'filepath': str(dirpath / 'storage')},
+        broker_backend='core.zeromq',
+        broker_config={},
+        name='throughput',
+        email='throughput@localhost',
+        is_test_profile=True,
+    )
+    config.set_default_profile(profile.name)
+    config.store()
+    try:
+        with profile_context(profile, allow_switch=True):
+            try:
+                yield profile
+            finally:
+                client = get_daemon_client()
+                if client.is_daemon_running:
+                    # A slow shutdown must not hide an error of the harness itself
+                    with contextlib.suppress(DaemonException):
+                        client.stop_daemon(wait=True)
+    finally:
+        reset_config()
+        if variable is None:
+            os.environ.pop(settings.DEFAULT_AIIDA_PATH_VARIABLE, None)
+        else:
+            os.environ[settings.DEFAULT_AIIDA_PATH_VARIABLE] = variable
+
+
+def setup_codes(workdir: pathlib.Path, pw_seconds: float = 0.0, hp_seconds: float = 0.0, hp_tasks: int = 1) -> dict:
+    """
+    Return the codes and resources, as passed to `get_builder`, running the stand-ins on `localhost`.
+
+    :param hp_tasks: the MPI ranks of the hp code. The parallelized workflows split them over
+        the perturbations, so they also bound the number of perturbations that run at once;
+        the stand-ins themselves always run on a single process.
+    """
+    from aiida import orm
+
+    computer = orm.Computer(
+        label='localhost',
+        hostname='localhost',
+        transport_type='core.local',
+        scheduler_type='core.direct',
+        workdir=str(workdir),
+    ).store()
+    # A login shell would source the profile of the user for every transport command
+    computer.configure(safe_interval=0.0, use_login_shell=False)
+    computer.set_minimum_job_poll_interval(0.0)
+    computer.set_default_mpiprocs_per_machine(1)
+    computer.set_mpirun_command([])
+    # The stand-ins are run by the interpreter of the harness
+    path = f'export PATH="{pathlib.Path(sys.executable).parent}:$PATH"'
+    codes = {}
+    for name, plugin, seconds, tasks in (
+        ('pw', 'quantumespresso.pw', pw_seconds, 1),
+        ('hp', 'quantumespresso.hp', hp_seconds, hp_tasks),
+    ):
+        code = orm.InstalledCode(
+            computer=computer,
+            filepath_executable=str(STUBS / f'{name}.py'),
+            default_calc_job_plugin=plugin,
+            label=name,
+            prepend_text=f'{path}\nexport QE_STUB_SECONDS={seconds}',
+        ).store()
+        codes[name] = {'code': code, 'nodes': 1, 'ntasks_per_node': tasks, 'cpus_per_task': 1,
+                       'max_wallclock_seconds': 3600}
+    return codes
+
+
+def get_structure(num_atoms: int = None, num_kinds: int = 2):
+    """Return LiCoO2, as in the tests, or a synthetic structure of `num_atoms` atoms."""
+    from aiida import orm
+
+    if num_atoms:
+        from conftest import make_structure
+
+        return make_structure(num_atoms, num_kinds).store()
+    a, b, c, d = 1.40803, 0.81293, 4.68453, 1.62585
+    structure = orm.StructureData(cell=[[a, -b, c], [0.0, d, c], [-a, -b, c]])
+    for symbol, position in (('Co', (0, 0, 0)), ('O', (0, 0, 3.6608)), ('O', (0, 0, 10.392)), ('Li', (0, 0, 7.0268))):
+        structure.append_atom(position=position, symbols=symbol, name=symbol)
+    return structure.store()
+
+
+def configure(structure, method: str, pseudos: dict) -> dict:
+    """Return the `get_builder` parameters, as collected from the settings model by the app."""
+    from aiidalab_qe_hp.model import HPSettingsModel
+
+    from conftest import get_hubbard_parameters
+
+    model = HPSettingsModel()
+    if model.has_trait('structure_uuid'):
+        model.structure_uuid = structure.uuid
+    else:
+        model.input_structure = structure
+    model.protocol = 'fast'
+    model.method = method
+    model.calculation_type = 'DFT+U+V'
+    model.hubbard_u, model.hubbard_v = get_hubbard_parameters(structure)
+    return {
+        'hp': model.get_model_state(),
+        'workchain': {
+            'protocol': 'fast',
+            'relax_type': 'none',
+            'electronic_type': 'insulator',
+            'spin_type': 'none',
+        },
+        'advanced': {
+            'initial_magnetic_moments': None,
+            'pw': {
+                'pseudos': {kind.name: pseudos[kind.symbol] for kind in structure.kinds},
+                'parameters': {'SYSTEM': {'ecutwfc': 45.0, 'ecutrho': 360.0}},
+            },
+        },
+    }
+
+
+def get_app_builder(codes: dict, structure, parameters: dict):
+    """Return the `QeAppWorkChain` builder with only the HP property, as the app submits it."""
+    from aiida import orm
+    from aiidalab_qe.workflows import QeAppWorkChain
+
+    from aiidalab_qe_hp.workchain import get_builder
+
+    builder = QeAppWorkChain.get_builder()
+    builder.structure = structure
+    builder.properties = orm.List(['hp'])
+    builder.clean_workdir = orm.Bool(False)
+    builder.pop('relax', None)
+    builder.hp = get_builder(codes, structure, parameters)._inputs(prune=True)
+    return builder
+
+
+def run_daemon(builders: list, workers: int, timeout: float) -> tuple:
+    """Submit the builders to the daemon and return the nodes and the wall time until they all terminated."""
+    from aiida.engine import submit
+    from aiida.engine.daemon.client import get_daemon_client
+
+    get_daemon_client().start_daemon(number_workers=workers)
+    start = time.perf_counter()
+    nodes = [submit(builder) for builder in builders]
+    while not all(node.is_terminated for node in nodes):
+        if time.perf_counter() - start > timeout:
+            raise TimeoutError(f'the workflows did not terminate within {timeout} s.')
+        time.sleep(0.2)
+    return nodes, time.perf_counter() - start
+
+
+def render_results(node) -> tuple:
+    """Return the time to fetch the results of a workflow on a cold cache, and to render its results panel."""
+    from aiidalab_qe_hp.result import HpResultsModel, HpResultsPanel
+
+    model = HpResultsModel()
+    model.process_uuid = node.uuid
+    start = time.perf_counter()
+    model.fetch_result()
+    fetch = time.perf_counter() - start
+    panel = HpResultsPanel(model=model)
+    start = time.perf_counter()
+    panel._render()
+    return fetch, time.perf_counter() - start
+
+
+def summarize(values: list) -> dict:
+    return {'mean': statistics.mean(values), 'median': statistics.median(values), 'max': max(values)}
+
+
+def count_calculations(nodes: list) -> int:
+    """Return the number of calculation jobs run by the workflows."""
+    from aiida import orm
+
+    return sum(isinstance(child, orm.CalcJobNode) for node in nodes for child in node.called_descendants)
+
+
+def run(workflows: int = 4, workers: int = 1, method: str = 'one-shot', num_atoms: int = None, num_kinds: int = 2,
+        pw_seconds: float = 0.0, hp_seconds: float = 0.0, hp_tasks: int = 8, timeout: float = 1800.0,
+        dirpath=None) -> dict:
+    """Run the harness in a temporary profile and return the report."""
+    # The app is imported before the timings, which are for a running app
+    from aiidalab_qe.workflows import QeAppWorkChain  # noqa: F401
+
+    from aiidalab_qe_hp.model import HPSettingsModel  # noqa: F401
+    from aiidalab_qe_hp.result import HpResultsPanel  # noqa: F401
+    from conftest import make_pseudos
+
+    dirpath = pathlib.Path(dirpath or tempfile.mkdtemp(prefix='aiidalab-qe-hp-throughput-'))
+    # Fetch the results on a cold cache, outside the cache of the user
+    os.environ['AIIDALAB_QE_HP_CACHE_DIR'] = str(dirpath / 'results-cache')
+    with temporary_profile(dirpath):
+        codes = setup_codes(dirpath / 'work', pw_seconds, hp_seconds, hp_tasks)
+        structure = get_structure(num_atoms, num_kinds)
+        pseudos = make_pseudos()
+
+        configure_times, builder_times, builders = [], [], []
+        for _ in range(workflows):
+            start = time.perf_counter()
+            parameters = configure(structure, method, pseudos)
+            configure_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            builders.append(get_app_builder(codes, structure, parameters))
+            builder_times.append(time.perf_counter() - start)
+
+        nodes, wall_time = run_daemon(builders, workers, timeout)
+        failed = {node.pk: node.exit_status for node in nodes if not node.is_finished_ok}
+        fetch_times, render_times, errors = [], [], {}
+        for node in nodes:
+            if node.is_finished_ok:
+                try:
+                    fetch, render = render_results(node)
+                except Exception as exception:  # noqa: BLE001
+                    # e.g. an AiiDAlab QE version without the API of the results panel
+                    errors[node.pk] = f'{type(exception).__name__}: {exception}'
+                    continue
+                fetch_times.append(fetch)
+                render_times.append(render)
+        calculations = count_calculations(nodes)
+        num_atoms = len(structure.sites)
+
+    return {
+        'workflows': workflows,
+        'workers': workers,
+        'method': method,
+        'atoms': num_atoms,
+        'failed': failed,
+        'configure': summarize(configure_times),
+        'builder': summarize(builder_times),
+        'daemon': {
+            'wall_time': wall_time,
+            'calculations': calculations,
+            'workflows_per_minute': 60 * workflows / wall_time,
+            'calculations_per_minute': 60 * calculations / wall_time,
+        },
+        'fetch_result': summarize(fetch_times) if fetch_times else None,
+        'render': summarize(render_times) if render_times else None,
+        'results_errors': errors,
+    }
+
+
+def format_report(report: dict) -> str:
+    """Return the report as a table."""
+    lines = [
+        f"{report['workflows']} {report['method']} workflows of {report['atoms']} atoms "
+        f"on {report['workers']} daemon worker(s)",
+        f"{'stage':<16}{'mean (s)':>12}{'median (s)':>12}{'max (s)':>12}",
+    ]
+    for stage in ('configure', 'builder', 'fetch_result', 'render'):
+        if report[stage]:
+            timings = report[stage]
+            lines.append(f"{stage:<16}{timings['mean']:>12.3f}{timings['median']:>12.3f}{timings['max']:>12.3f}")
+    daemon = report['daemon']
+    lines.append(
+        f"daemon: {daemon['wall_time']:.1f} s for {report['workflows']} workflows and {daemon['calculations']} "
+        f"calculations ({daemon['workflows_per_minute']:.1f} workflows/min, "
+        f"{daemon['calculations_per_minute']:.1f} calculations/min)"
+    )
+    if report['failed']:
+        lines.append(f"failed workflows (pk: exit status): {report['failed']}")
+    for pk, error in report['results_errors'].items():
+        lines.append(f"results of workflow {pk} could not be rendered: {error}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--workflows', type=int, default=4, help='Number of concurrent workflows.')
+    parser.add_argument('--workers', type=int, default=1, help='Number of daemon workers.')
+    parser.add_argument('--method', choices=METHODS, default='one-shot')
+    parser.add_argument('--atoms', type=int, default=None, help='Use a synthetic structure with this many atoms.')
+    parser.add_argument('--kinds', type=int, default=2, help='Number of kinds of the synthetic structure.')
+    parser.add_argument('--pw-seconds', type=float, default=0.0, help='Duration of every pw.x run.')
+    parser.add_argument('--hp-seconds', type=float, default=0.0, help='Duration of every hp.x run.')
+    parser.add_argument('--hp-tasks', type=int, default=8, help='MPI ranks of the hp code, split over the perturbations.')
+    parser.add_argument('--timeout', type=float, default=1800.0, help='Seconds to wait for the workflows.')
+    parser.add_argument('--json', default=None, help='Also write the report to this JSON file.')
+    parser.add_argument('--keep', action='store_true', help='Keep the temporary profile and working directories.')
+    args = parser.parse_args(argv)
+
+    dirpath = pathlib.Path(tempfile.mkdtemp(prefix='aiidalab-qe-hp-throughput-'))
+    try:
+        report = run(args.workflows, args.workers, args.method, args.atoms, args.kinds, args.pw_seconds,
+                     args.hp_seconds, args.hp_tasks, args.timeout, dirpath)
+    finally:
+        if args.keep:
+            print(f'The profile and working directories are kept in {dirpath}')
+        else:
+            shutil.rmtree(dirpath, ignore_errors=True)
+    print(format_report(report))
+    if args.json:
+        pathlib.Path(args.json).write_text(json.dumps(report, indent=2))
+    return 1 if report['failed'] or report['results_errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,35 +1,86 @@
 """Web GUI for Quantum ESPRESSO and hp calculations in AiiDA."""
-from aiidalab_qe.common.panel import PluginOutline
+import importlib
+from collections.abc import Mapping
 
-from .model import HPSettingsModel
-from .resources import ResourceSettingsModel, ResourceSettingsPanel
-from .setting import HPSettingsPanel
-from .workchain import workchain_and_builder
-from .result import HpResultsPanel, HpResultsModel
+from aiidalab_qe.common.panel import PluginOutline
 
 
 __version__ = '0.1.2'
 
 
+class _Lazy:
+    """Reference to an attribute of a submodule, imported when first resolved."""
+
+    def __init__(self, module, attribute):
+        self.module = module
+        self.attribute = attribute
+
+    def resolve(self):
+        return getattr(importlib.import_module(self.module, __name__), self.attribute)
+
+
+class _LazyEntry(Mapping):
+    """Plugin entry whose `_Lazy` values are only imported when the app accesses them.
+
+    The QE app loads the `hp` entry point at startup; deferring the imports keeps the
+    panels, with `weas_widget` and `table_widget`, out of the startup path until the app
+    shows them. The work chain, and with it `aiida_hubbard`, is still imported at startup:
+    `aiidalab_qe.workflows` resolves the `workchain` entry of every plugin when imported.
+    """
+
+    def __init__(self, entries):
+        self._entries = dict(entries)
+
+    def __getitem__(self, key):
+        value = self._entries[key]
+        if isinstance(value, _Lazy):
+            value = self._entries[key] = value.resolve()
+        return value
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
 
 class PluginOutline(PluginOutline):
     title = 'Hubbard parameter (HP)'
     help = """"""
 
 
-hp = {
+hp = _LazyEntry({
     'outline': PluginOutline,
-    'configuration': {
-        'panel': HPSettingsPanel,
-        'model': HPSettingsModel,
-    },
-    'resources': {
-        'panel': ResourceSettingsPanel,
-        'model': ResourceSettingsModel,
-    },
-    'workchain': workchain_and_builder,
-    'result': {
-        'panel': HpResultsPanel,
-        'model': HpResultsModel,
-    },
+    'configuration': _LazyEntry({
+        'panel': _Lazy('.setting', 'HPSettingsPanel'),
+        'model': _Lazy('.model', 'HPSettingsModel'),
+    }),
+    'resources': _LazyEntry({
+        'panel': _Lazy('.resources', 'ResourceSettingsPanel'),
+        'model': _Lazy('.resources', 'ResourceSettingsModel'),
+    }),
+    'workchain': _Lazy('.workchain', 'workchain_and_builder'),
+    'result': _LazyEntry({
+        'panel': _Lazy('.result', 'HpResultsPanel'),
+        'model': _Lazy('.result.model', 'HpResultsModel'),
+    }),
+})
+
+_LAZY_ATTRIBUTES = {
+    'HPSettingsModel': _Lazy('.model', 'HPSettingsModel'),
+    'HPSettingsPanel': _Lazy('.setting', 'HPSettingsPanel'),
+    'ResourceSettingsModel': _Lazy('.resources', 'ResourceSettingsModel'),
+    'ResourceSettingsPanel': _Lazy('.resources', 'ResourceSettingsPanel'),
+    'workchain_and_builder': _Lazy('.workchain', 'workchain_and_builder'),
+    'HpResultsModel': _Lazy('.result.model', 'HpResultsModel'),
+    'HpResultsPanel': _Lazy('.result', 'HpResultsPanel'),
 }
+
+
+def __getattr__(name):
+    """Keep the previous package-level exports available, imported on demand."""
+    if name in _LAZY_ATTRIBUTES:
+        value = _LAZY_ATTRIBUTES[name].resolve()
+        globals()[name] = value
+        return value
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
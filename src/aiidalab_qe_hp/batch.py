@@ -0,0 +1,158 @@
+"""Headless batch creation and submission of HP workflows."""
+import argparse
+import copy
+import json
+import sys
+import time
+
+from aiida import orm
+
+from .hubbard import HubbardU, HubbardV
+from .protocols import cached_protocol_files, get_protocol_inputs
+from .workchain import check_codes, get_builder
+
+DEFAULT_POLL_INTERVAL = 30
+
+
+def _load_family(label: str, families: dict):
+    if label not in families:
+        families[label] = orm.load_group(label)
+    return families[label]
+
+
+def get_structure_parameters(structure, parameters: dict, families: dict) -> dict:
+    """
+    Return a copy of the shared `parameters` adapted to one structure.
+
+    Hubbard parameters and initial magnetic moments of kinds that are not in the
+    structure are dropped, and kinds without a moment get 0. The pseudopotentials and
+    recommended cutoffs are taken from the pseudo family, which is loaded once per
+    batch and passed to the protocol as overrides, instead of queried per structure.
+    """
+    from aiida_quantumespresso.workflows.pw.base import PwBaseWorkChain
+
+    parameters = copy.deepcopy(parameters)
+    kinds = set(structure.get_kind_names())
+    hp = parameters['hp']
+    hp['hubbard_u'] = HubbardU.load(hp.get('hubbard_u')).select(kinds)
+    hp['hubbard_v'] = HubbardV.load(hp.get('hubbard_v')).select(kinds)
+
+    advanced = parameters.setdefault('advanced', {})
+    moments = advanced.get('initial_magnetic_moments')
+    if moments is not None:
+        advanced['initial_magnetic_moments'] = {kind: moments.get(kind, 0.0) for kind in sorted(kinds)}
+    else:
+        advanced['initial_magnetic_moments'] = None
+
+    pw = advanced.setdefault('pw', {})
+    if 'pseudos' not in pw:
+        label = advanced.get('pseudo_family') or get_protocol_inputs(
+            PwBaseWorkChain, parameters['workchain']['protocol']
+        )['pseudo_family']
+        family = _load_family(label, families)
+        ecutwfc, ecutrho = family.get_recommended_cutoffs(structure=structure, unit='Ry')
+        pw['pseudos'] = family.get_pseudos(structure=structure)
+        system = pw.setdefault('parameters', {}).setdefault('SYSTEM', {})
+        system.setdefault('ecutwfc', ecutwfc)
+        system.setdefault('ecutrho', ecutrho)
+    return parameters
+
+
+def build_builders(codes: dict, structures, parameters: dict, **kwargs) -> list:
+    """
+    Return the builders of an HP workflow for every structure, with shared settings.
+
+    The codes are validated once, the protocol files are parsed once and the pseudo
+    family is loaded once for the whole batch.
+
+    :param codes: the codes and resources, as passed to `get_builder`.
+    :param structures: iterable of `StructureData`.
+    :param parameters: the settings shared by all structures, as passed to `get_builder`;
+        they are not modified.
+    :returns: list of builders, in the order of `structures`.
+    """
+    check_codes(codes['pw']['code'], codes['hp']['code'])
+    families = {}
+    builders = []
+    with cached_protocol_files():
+        for structure in structures:
+            structure_parameters = get_structure_parameters(structure, parameters, families)
+            builders.append(get_builder(codes, structure, structure_parameters, validate_codes=False, **kwargs))
+    return builders
+
+
+def submit_builders(builders, max_concurrent: int = None, poll_interval: float = DEFAULT_POLL_INTERVAL, group=None):
+    """
+    Submit the builders, with at most `max_concurrent` workflows running at once.
+
+    When the limit is reached, this blocks until one of the submitted workflows has
+    terminated, polling every `poll_interval` seconds.
+
+    :param group: optional `Group` to which the submitted workflows are added.
+    :returns: list of the submitted process nodes.
+    """
+    from aiida.engine import submit
+
+    nodes = []
+    for builder in builders:
+        while max_concurrent and sum(not node.is_terminated for node in nodes) >= max_concurrent:
+            time.sleep(poll_interval)
+        node = submit(builder)
+        if group is not None:
+            group.add_nodes(node)
+        nodes.append(node)
+    return nodes
+
+
+def _load_structure(identifier: str):
+    """Load a `StructureData` from a pk, UUID or a structure file readable by ASE."""
+    try:
+        return orm.load_node(identifier)
+    except Exception:  # noqa: BLE001 (not a node identifier, read it as a file)
+        from ase.io import read
+
+        return orm.StructureData(ase=read(identifier))
+
+
+def _load_settings(filepath: str) -> tuple:
+    """Return the codes and parameters of a JSON or YAML settings file; codes are given by label."""
+    with open(filepath, encoding='utf-8') as file:
+        if filepath.endswith(('.yaml', '.yml')):
+            import yaml
+
+            settings = yaml.safe_load(file)
+        else:
+            settings = json.load(file)
+    codes = {name: {**code, 'code': orm.load_code(code['code'])} for name, code in settings['codes'].items()}
+    return codes, settings['parameters']
+
+
+def main(argv=None):
+    """Build and submit HP workflows for many structures with shared settings."""
+    parser = argparse.ArgumentParser(prog='aiidalab-qe-hp-batch', description=main.__doc__)
+    parser.add_argument('settings', help='JSON or YAML file with the `codes` (by label) and the `parameters`.')
+    parser.add_argument('structures', nargs='+', help='Structure nodes (pk or UUID) or structure files.')
+    parser.add_argument('--max-concurrent', type=int, default=None, help='Maximum number of running workflows.')
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL, help='Seconds between checks.')
+    parser.add_argument('--group', default=None, help='Label of a group to add the workflows to.')
+    parser.add_argument('--dry-run', action='store_true', help='Only build the workflows, do not submit them.')
+    parser.add_argument('--profile', default=None, help='AiiDA profile, the default profile if not given.')
+    args = parser.parse_args(argv)
+
+    from aiida import load_profile
+
+    load_profile(args.profile)
+    codes, parameters = _load_settings(args.settings)
+    structures = [_load_structure(identifier) for identifier in args.structures]
+    builders = build_builders(codes, structures, parameters)
+    if args.dry_run:
+        print(f'Built {len(builders)} HP workflows.')
+        return 0
+    group = orm.Group.collection.get_or_create(args.group)[0] if args.group else None
+    for structure, node in zip(structures, submit_builders(builders, args.max_concurrent, args.poll_interval, group)):
+        print(f'{structure.get_formula()}: submitted {node.process_label}<{node.pk}>')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,219 @@
+"""Pre-submission cost estimate of the HP workflow."""
+import math
+
+import numpy as np
+
+from .hubbard import HubbardU
+from .qpoints import get_qpoints_refinement, get_structure_qpoints_mesh
+
+# Default `max_iterations` of the `SelfConsistentHubbardWorkChain`
+DEFAULT_MAX_ITERATIONS = 10
+
+_BOHR = 0.529177210903  # Å
+
+
+def _get_dataset_value(dataset, key):
+    """Read a field of a spglib dataset, which is an object in spglib>=2.5 and a dict before."""
+    return getattr(dataset, key) if hasattr(dataset, key) else dataset[key]
+
+
+def get_symmetry_info(structure, symprec: float = 1e-3, types=None):
+    """
+    Return the symmetry-equivalence classes of the sites and the number of symmetry operations.
+
+    Sites of different kinds are never equivalent, unless `types` gives another label per
+    site, e.g. the element to find the sites that only differ by their kind name. Without
+    spglib, every site is its own class and only the identity is assumed.
+
+    :returns: tuple of the (natoms,) array mapping each site to its representative site,
+        and the number of symmetry operations of the crystal.
+    """
+    sites = structure.sites
+    if types is None:
+        types = [site.kind_name for site in sites]
+    try:
+        import spglib
+    except ImportError:
+        return np.arange(len(sites)), 1
+    numbers = {}
+    cell = (
+        np.asarray(structure.cell),
+        np.array([site.position for site in sites]) @ np.linalg.inv(structure.cell),
+        [numbers.setdefault(label, len(numbers) + 1) for label in types],
+    )
+    dataset = spglib.get_symmetry_dataset(cell, symprec=symprec)
+    if dataset is None:
+        return np.arange(len(sites)), 1
+    equivalent_atoms = np.asarray(_get_dataset_value(dataset, 'equivalent_atoms'))
+    return equivalent_atoms, len(_get_dataset_value(dataset, 'rotations'))
+
+
+def count_perturbed_atoms(structure, hubbard_kinds, equivalent_atoms=None) -> int:
+    """Return the number of symmetry-inequivalent sites of the Hubbard kinds, i.e. the hp.x perturbations."""
+    if equivalent_atoms is None:
+        equivalent_atoms, _ = get_symmetry_info(structure)
+    hubbard_kinds = set(hubbard_kinds)
+    return len({
+        equivalent_atoms[index] for index, site in enumerate(structure.sites) if site.kind_name in hubbard_kinds
+    })
+
+
+def estimate_jobs(
+    num_atoms: int,
+    num_qpoints: int,
+    parallelize_atoms: bool,
+    parallelize_qpoints: bool,
+    iterations: int = 1,
+    relax: bool = False,
+) -> dict:
+    """
+    Return the number of pw.x and hp.x jobs launched by the workflow.
+
+    With `parallelize_atoms`, hp.x runs an initialization, one job per perturbed atom and a
+    final collection. With `parallelize_qpoints` as well, each atom again runs an
+    initialization, one job per q point and a collection. The pw.x count is an upper bound,
+    see below.
+    """
+    if not parallelize_atoms:
+        hp_per_atom = 0
+        hp_jobs = 1
+    else:
+        hp_per_atom = num_qpoints + 2 if parallelize_qpoints else 1
+        hp_jobs = 2 + num_atoms * hp_per_atom
+    # Every iteration runs the relax (without a final scf, which the Hubbard work chain
+    # excludes) if enabled, an scf with smearing and, for insulators only, an scf with fixed
+    # occupations; whether the system is an insulator is only known after the first scf.
+    pw_jobs = 2 + (1 if relax else 0)
+    return {
+        'pw': pw_jobs * iterations,
+        'hp': hp_jobs * iterations,
+        'hp_per_atom': hp_per_atom,
+        'iterations': iterations,
+    }
+
+
+def estimate_memory_gb(structure, ecutwfc: float = 50.0, num_kpoints: int = 1) -> dict:
+    """
+    Return a rough estimate of the peak memory per job (GB) of pw.x and hp.x.
+
+    The number of plane waves follows from the cell volume and `ecutwfc` (Ry); the number of
+    bands is taken as 6 per atom, which is conservative for transition-metal oxides. The
+    DFPT response in hp.x keeps several sets of wavefunctions and is estimated at 3x pw.x.
+    """
+    volume = abs(np.linalg.det(np.asarray(structure.cell))) / _BOHR**3
+    num_planewaves = volume * ecutwfc**1.5 / (6 * math.pi**2)
+    num_bands = 6 * len(structure.sites)
+    # Wavefunctions, Davidson work space and the FFT grids, as complex doubles
+    pw = 16 * num_planewaves * num_bands * (num_kpoints + 4) / 1024**3
+    return {'pw': float(pw), 'hp': float(3 * pw)}
+
+
+def get_estimate_symmetry(structure, merge_kinds: bool = False, magnetic_moments: dict = None) -> tuple:
+    """
+    Return the symmetry of the sites that `estimate_cost` uses, as by `get_symmetry_info`.
+
+    With `merge_kinds`, the kinds are merged as `get_builder` does, with `get_kind_mapping`
+    and the initial magnetic moments per kind. This is the slow part of the estimate;
+    callers that estimate the same structure repeatedly can compute it once and pass it
+    to `estimate_cost`.
+    """
+    from .symmetry import get_kind_mapping
+
+    types = None
+    if merge_kinds:
+        mapping = get_kind_mapping(structure, magnetic_moments)
+        types = [mapping[site.kind_name] for site in structure.sites]
+    return get_symmetry_info(structure, types=types)
+
+
+def estimate_cost(
+    structure,
+    hp_parameters: dict,
+    codes: dict = None,
+    max_iterations: int = None,
+    symmetry: tuple = None,
+    magnetic_moments: dict = None,
+) -> dict:
+    """
+    Estimate the job count, core-hours and peak memory of an HP workflow before submission.
+
+    :param structure: the input `StructureData`.
+    :param hp_parameters: the HP settings, i.e. `HPSettingsModel.get_model_state()`.
+    :param codes: optional codes and resources as passed to `get_builder`; the core-hours
+        are only estimated when given, as an upper bound from the requested wall time.
+    :param max_iterations: iterations of a self-consistent run, `DEFAULT_MAX_ITERATIONS` by default.
+    :param symmetry: optional result of `get_estimate_symmetry` for the structure and the
+        `merge_kinds` of `hp_parameters`, to skip the symmetry search.
+    :param magnetic_moments: optional initial magnetic moments per kind, which keep kinds
+        apart with `merge_kinds`.
+    :returns: dict with the number of perturbed atoms, q points and symmetry operations, and the `jobs`,
+        `memory_gb` and (optionally) `core_hours` per stage.
+    """
+    if symmetry is None:
+        symmetry = get_estimate_symmetry(structure, hp_parameters.get('merge_kinds', False), magnetic_moments)
+    equivalent_atoms, num_operations = symmetry
+    hubbard_kinds = HubbardU.load(hp_parameters.get('hubbard_u')).kinds
+    num_atoms = count_perturbed_atoms(structure, hubbard_kinds, equivalent_atoms)
+    mesh = get_structure_qpoints_mesh(structure, hp_parameters.get('qpoints_distance', 1.0))
+    # hp.x only computes the irreducible q points; this assumes the full point group
+    num_qpoints = max(math.ceil(int(np.prod(mesh)) / num_operations), 1)
+
+    self_consistent = hp_parameters.get('method', 'one-shot') == 'self-consistent'
+    iterations = (max_iterations or DEFAULT_MAX_ITERATIONS) if self_consistent else 1
+    jobs = estimate_jobs(
+        num_atoms,
+        num_qpoints,
+        hp_parameters.get('parallelize_atoms', False),
+        hp_parameters.get('parallelize_qpoints', False),
+        iterations=iterations,
+        relax=self_consistent,
+    )
+    if hp_parameters.get('method') == 'adaptive':
+        # At most, hp.x runs on every coarser mesh before the selected one
+        for distance in get_qpoints_refinement(structure, hp_parameters.get('qpoints_distance', 1.0))[:-1]:
+            coarse = get_structure_qpoints_mesh(structure, distance)
+            jobs['hp'] += estimate_jobs(
+                num_atoms,
+                max(math.ceil(int(np.prod(coarse)) / num_operations), 1),
+                hp_parameters.get('parallelize_atoms', False),
+                hp_parameters.get('parallelize_qpoints', False),
+            )['hp']
+    estimate = {
+        'perturbed_atoms': num_atoms,
+        'qpoints_mesh': mesh,
+        'qpoints': num_qpoints,
+        'symmetry_operations': num_operations,
+        'jobs': jobs,
+        'memory_gb': estimate_memory_gb(structure),
+    }
+    if codes:
+        estimate['core_hours'] = {
+            stage: jobs[stage] * _get_cores(codes[stage]) * codes[stage].get('max_wallclock_seconds', 0) / 3600
+            for stage in ('pw', 'hp')
+            if stage in codes
+        }
+    return estimate
+
+
+def _get_cores(code: dict) -> int:
+    return code.get('nodes', 1) * code.get('ntasks_per_node', 1) * code.get('cpus_per_task', 1)
+
+
+def format_cost(estimate: dict) -> str:
+    """Return a short HTML summary of an estimate, for the settings panel."""
+    jobs = estimate['jobs']
+    lines = [
+        f"<b>Estimated cost:</b> {jobs['pw']} pw.x and {jobs['hp']} hp.x jobs",
+        f"{estimate['perturbed_atoms']} perturbed Hubbard atom(s), "
+        f"~{estimate['qpoints']} irreducible q point(s) of mesh {list(estimate['qpoints_mesh'])}",
+    ]
+    if jobs['iterations'] > 1:
+        lines.append(f"up to {jobs['iterations']} self-consistent iterations")
+    lines.append(
+        f"peak memory per job ~{estimate['memory_gb']['pw']:.2f} GB (pw.x), "
+        f"~{estimate['memory_gb']['hp']:.2f} GB (hp.x)"
+    )
+    if estimate.get('core_hours'):
+        core_hours = ' + '.join(f'{hours:.0f} ({stage}.x)' for stage, hours in estimate['core_hours'].items())
+        lines.append(f'at most {core_hours} core-hours')
+    return '<div>' + '<br>'.join(lines) + '</div>'
@@ -0,0 +1,92 @@
+"""Data-backed grid widgets for the Hubbard U and V input tables."""
+from table_widget import TableWidget
+
+HUBBARD_U_COLUMNS = [
+    {'field': 'selected', 'headerName': '', 'type': 'boolean', 'editable': True, 'width': 60},
+    {'field': 'kind', 'headerName': 'Atomic Type', 'editable': False},
+    {'field': 'manifold', 'headerName': 'Manifold', 'editable': True},
+    {'field': 'value', 'headerName': 'U value (eV)', 'type': 'number', 'editable': True},
+    {'field': 'symmetry', 'headerName': 'Sites (perturbed)', 'editable': False, 'width': 160},
+]
+
+HUBBARD_V_COLUMNS = [
+    {'field': 'selected', 'headerName': '', 'type': 'boolean', 'editable': True, 'width': 60},
+    {'field': 'kind_i', 'headerName': 'Type1', 'editable': False},
+    {'field': 'manifold_i', 'headerName': 'Manif.1', 'editable': True},
+    {'field': 'kind_j', 'headerName': 'Type2', 'editable': False},
+    {'field': 'manifold_j', 'headerName': 'Manif.2', 'editable': True},
+    {'field': 'value', 'headerName': 'V value (eV)', 'type': 'number', 'editable': True},
+    {'field': 'distance', 'headerName': 'Distance (Å)', 'type': 'number', 'editable': False},
+]
+
+_FIELD_TYPES = {'selected': bool, 'manifold': str, 'manifold_i': str, 'manifold_j': str, 'value': float}
+
+
+class HubbardGrid(TableWidget):
+    """
+    A single grid widget holding every row of a Hubbard U or V input table.
+
+    The rows live in the synced `data` list and are keyed by kind (U) or kind pair (V).
+    The grid virtualizes rendering in the browser, and cell edits come back one row at
+    a time through `updatedRow`, so the number of widgets and comm channels does not
+    grow with the structure.
+    """
+
+    def __init__(self, columns, key_fields, **kwargs):
+        super().__init__(config={'pageSize': 25, 'disableSelectionOnClick': True}, **kwargs)
+        self.columns = columns
+        self._key_fields = key_fields
+        self._index = {}
+        # True while `update_row` applies an edit from Python rather than the browser
+        self.python_edit = False
+        self.observe(self._on_row_update, 'updatedRow')
+
+    def key(self, row):
+        """Return the key of `row`: the kind name, or the tuple of kind names."""
+        if len(self._key_fields) == 1:
+            return row[self._key_fields[0]]
+        return tuple(row[field] for field in self._key_fields)
+
+    def set_rows(self, rows):
+        """Replace all rows of the grid."""
+        rows = [{**row, 'id': index} for index, row in enumerate(rows)]
+        self._index = {self.key(row): row['id'] for row in rows}
+        self.data = rows
+
+    def get_row(self, key):
+        """Return the row with the given key."""
+        return self.data[self._index[key]]
+
+    def index(self, key) -> int:
+        """Return the position of the row with the given key."""
+        return self._index[key]
+
+    def update_row(self, key, **values):
+        """Edit a row from Python, as if its cells were edited in the grid."""
+        row = {**self.get_row(key), **values}
+        self.data = [row if other['id'] == row['id'] else other for other in self.data]
+        self.python_edit = True
+        try:
+            self.updatedRow = row
+        finally:
+            self.python_edit = False
+
+    def _on_row_update(self, change):
+        """Store a row edited in the browser, without syncing the whole table back."""
+        row = change['new']
+        if 'id' not in row:
+            return
+        previous = self.data[row['id']]
+        invalid = False
+        for field, convert in _FIELD_TYPES.items():
+            if field in row:
+                try:
+                    row[field] = convert(row[field] if row[field] is not None else convert())
+                except (TypeError, ValueError):
+                    # e.g. an emptied number cell: keep the last valid value
+                    row[field] = previous[field]
+                    invalid = True
+        previous.update(row)
+        if invalid:
+            # The rows are equal in Python, so the reverted cell has to be sent explicitly
+            self.send_state('data')
@@ -0,0 +1,169 @@
+"""Typed containers of the Hubbard U and V parameters of the settings."""
+import numpy as np
+
+# Single manifolds accepted by `HubbardStructureData`, e.g. `3d`; two can be joined as `3d-2p`
+MANIFOLDS = frozenset(f'{shell}{orbital}' for shell in '123456789' for orbital in 'spdfgh')
+# Accepted range (eV) of the initial values
+VALUE_RANGE = (0.0, 20.0)
+
+
+class HubbardParameters:
+    """
+    Immutable list of Hubbard entries, stored as a NumPy structured array.
+
+    The entries behave as the lists of lists the settings used before: iterating yields
+    one list per entry, e.g. `['Co', '3d', 3.0]`, and an instance compares equal to the
+    same lists. The state is serialized by column, e.g. `{'kind': ['Co'], 'manifold':
+    ['3d'], 'value': [3.0]}`, so that loading it builds each column with a single call.
+    """
+
+    __slots__ = ('_array',)
+
+    # Fields of an entry, in order; the last one is always the value
+    FIELDS = ()
+    KIND_FIELDS = ()
+    MANIFOLD_FIELDS = ()
+    label = ''
+
+    def __init__(self, array: np.ndarray = None):
+        if array is None:
+            array = self._build([np.array([], dtype=str)] * (len(self.FIELDS) - 1) + [np.array([], dtype=float)])
+        array.flags.writeable = False
+        self._array = array
+
+    @classmethod
+    def _build(cls, columns: list) -> np.ndarray:
+        array = np.empty(len(columns[-1]), dtype=[(name, column.dtype) for name, column in zip(cls.FIELDS, columns)])
+        for name, column in zip(cls.FIELDS, columns):
+            array[name] = column
+        return array
+
+    @classmethod
+    def from_columns(cls, columns: dict):
+        """Return the entries of a dict with one list per field, as returned by `to_columns`."""
+        missing = set(cls.FIELDS) - set(columns)
+        if missing:
+            raise ValueError(f'Missing Hubbard {cls.label} fields: {", ".join(sorted(missing))}.')
+        arrays = [np.asarray(columns[name], dtype=str) for name in cls.FIELDS[:-1]]
+        arrays.append(np.asarray(columns['value'], dtype=float))
+        if len({len(array) for array in arrays}) > 1 or any(array.ndim != 1 for array in arrays):
+            raise ValueError(f'The Hubbard {cls.label} fields must be lists of the same length.')
+        return cls(cls._build(arrays))
+
+    @classmethod
+    def from_entries(cls, entries):
+        """Return the entries of a list of lists, e.g. `[['Co', '3d', 3.0]]`."""
+        entries = [tuple(entry) for entry in entries]
+        if any(len(entry) != len(cls.FIELDS) for entry in entries):
+            raise ValueError(f'Hubbard {cls.label} entries must have the fields: {", ".join(cls.FIELDS)}.')
+        return cls.from_columns(dict(zip(cls.FIELDS, zip(*entries))) if entries else dict.fromkeys(cls.FIELDS, []))
+
+    @classmethod
+    def load(cls, value):
+        """Return the entries of an instance, a dict of columns, a list of lists or `None`."""
+        if value is None:
+            return cls()
+        if isinstance(value, cls):
+            return value
+        if isinstance(value, dict):
+            return cls.from_columns(value)
+        return cls.from_entries(value)
+
+    def to_columns(self) -> dict:
+        """Return the JSON-serializable state, with one list per field."""
+        return {name: self._array[name].tolist() for name in self.FIELDS}
+
+    def to_entries(self) -> list:
+        """Return the entries as a list of lists."""
+        return [list(entry) for entry in self._array.tolist()]
+
+    @property
+    def kinds(self) -> list:
+        """Return the sorted kind names used by the entries."""
+        return np.unique(np.concatenate([self._array[name] for name in self.KIND_FIELDS])).tolist()
+
+    def select(self, kinds):
+        """Return the entries whose kinds are all in `kinds`."""
+        kinds = list(kinds)
+        mask = np.logical_and.reduce([np.isin(self._array[name], kinds) for name in self.KIND_FIELDS])
+        return type(self)(self._array[mask])
+
+    def validate(self, kinds=None, value_range: tuple = VALUE_RANGE):
+        """
+        Check the kinds, manifolds and values of all entries at once.
+
+        :param kinds: the kind names of the structure; the kinds are not checked if `None`.
+        :param value_range: the lowest and highest accepted value (eV).
+        :raises ValueError: listing the invalid entries.
+        """
+        if not len(self):
+            return
+        reasons = {}
+
+        def check(invalid, reason):
+            for index in np.flatnonzero(invalid).tolist():
+                reasons.setdefault(index, []).append(reason)
+
+        if kinds is not None:
+            kinds = list(kinds)
+            for name in self.KIND_FIELDS:
+                check(~np.isin(self._array[name], kinds), f'unknown kind in `{name}`')
+        manifolds = list(MANIFOLDS)
+        for name in self.MANIFOLD_FIELDS:
+            first, separator, second = np.char.partition(np.char.lower(self._array[name]), '-').T
+            valid = np.isin(first, manifolds) & ((separator == '') | np.isin(second, manifolds))
+            check(~valid, f'invalid `{name}`')
+        values = self._array['value']
+        check(~((values >= value_range[0]) & (values <= value_range[1])), 'value out of range')
+        if reasons:
+            entries = self.to_entries()
+            details = '; '.join(f'{entries[index]} ({", ".join(reasons[index])})' for index in sorted(reasons))
+            raise ValueError(f'Invalid Hubbard {self.label} entries: {details}.')
+
+    def __len__(self):
+        return len(self._array)
+
+    def __iter__(self):
+        return iter(self.to_entries())
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return list(self._array[index].tolist())
+        return type(self)(self._array[index])
+
+    def __eq__(self, other):
+        if isinstance(other, HubbardParameters):
+            return type(other) is type(self) and self.to_entries() == other.to_entries()
+        if isinstance(other, (list, tuple)):
+            return self.to_entries() == [list(entry) for entry in other]
+        return NotImplemented
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return self.from_columns, (self.to_columns(),)
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.to_entries()!r})'
+
+
+class HubbardU(HubbardParameters):
+    """Onsite Hubbard entries `[kind, manifold, value]`."""
+
+    __slots__ = ()
+
+    FIELDS = ('kind', 'manifold', 'value')
+    KIND_FIELDS = ('kind',)
+    MANIFOLD_FIELDS = ('manifold',)
+    label = 'U'
+
+
+class HubbardV(HubbardParameters):
+    """Intersite Hubbard entries `[kind_i, manifold_i, kind_j, manifold_j, value]`."""
+
+    __slots__ = ()
+
+    FIELDS = ('kind_i', 'manifold_i', 'kind_j', 'manifold_j', 'value')
+    KIND_FIELDS = ('kind_i', 'kind_j')
+    MANIFOLD_FIELDS = ('manifold_i', 'manifold_j')
+    label = 'V'
@@ -0,0 +1,279 @@
+"""Index of the converged Hubbard parameters of finished runs, for fast queries across runs."""
+import contextlib
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+from aiida import orm
+
+from .warmstart import HUBBARD_PROCESS_LABELS, get_reduced_composition
+
+# Name and SQLite type of every column of the `parameters` table
+COLUMNS = (
+    ('process_uuid', 'TEXT'),
+    ('composition', 'TEXT'),
+    ('hubbard_type', 'TEXT'),
+    ('onsite', 'INTEGER'),
+    ('kind_i', 'TEXT'),
+    ('symbol_i', 'TEXT'),
+    ('manifold_i', 'TEXT'),
+    ('index_i', 'INTEGER'),
+    ('kind_j', 'TEXT'),
+    ('symbol_j', 'TEXT'),
+    ('manifold_j', 'TEXT'),
+    ('index_j', 'INTEGER'),
+    ('value', 'REAL'),
+    ('distance', 'REAL'),
+)
+
+# Columns the parameters are grouped by in `HubbardIndex.aggregate`
+AGGREGATE_COLUMNS = ('onsite', 'symbol_i', 'manifold_i', 'symbol_j', 'manifold_j')
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS runs (
+    process_uuid TEXT PRIMARY KEY,
+    process_label TEXT,
+    ctime TEXT,
+    composition TEXT,
+    elements TEXT
+);
+CREATE TABLE IF NOT EXISTS parameters ({', '.join(f'{name} {kind}' for name, kind in COLUMNS)});
+CREATE INDEX IF NOT EXISTS parameters_symbol ON parameters (symbol_i, manifold_i);
+CREATE INDEX IF NOT EXISTS parameters_process ON parameters (process_uuid);
+"""
+
+
+def get_default_index_path() -> Path:
+    """Return the path of the index of the current AiiDA profile."""
+    if 'AIIDALAB_QE_HP_INDEX' in os.environ:
+        return Path(os.environ['AIIDALAB_QE_HP_INDEX'])
+    from aiida.manage import get_manager
+
+    profile = get_manager().get_profile()
+    cache = Path(os.environ.get('XDG_CACHE_HOME', Path.home() / '.cache')) / 'aiidalab-qe-hp'
+    return cache / f"index-{profile.name if profile else 'default'}.sqlite"
+
+
+def get_formula(composition: tuple) -> str:
+    """Return the formula of a reduced composition, e.g. `CoLiO2`."""
+    return ''.join(f'{symbol}{count if count > 1 else ""}' for symbol, count in composition)
+
+
+def extract_parameters(process_uuid: str, hubbard_structure) -> tuple:
+    """
+    Return the composition and the parameter rows of a `HubbardStructureData`.
+
+    :returns: tuple of the reduced composition and a list of rows, ordered as `COLUMNS`.
+    """
+    from .result.table import compute_table_columns, get_hubbard_arrays
+
+    arrays = get_hubbard_arrays(hubbard_structure)
+    distances = compute_table_columns(arrays)['distance']
+    kind_names, symbols = arrays['kind_names'].tolist(), arrays['symbols'].tolist()
+    composition = get_reduced_composition(symbols)
+    formula = get_formula(composition)
+    onsite = (arrays['atom_index'] == arrays['neighbour_index']) & ~arrays['translation'].any(axis=1)
+    rows = [
+        (
+            process_uuid, formula, hubbard_type, int(is_onsite),
+            kind_names[i], symbols[i], manifold_i, i + 1,
+            kind_names[j], symbols[j], manifold_j, j + 1,
+            value, distance,
+        )
+        for hubbard_type, is_onsite, i, manifold_i, j, manifold_j, value, distance in zip(
+            arrays['hubbard_type'].tolist(), onsite.tolist(), arrays['atom_index'].tolist(),
+            arrays['atom_manifold'].tolist(), arrays['neighbour_index'].tolist(),
+            arrays['neighbour_manifold'].tolist(), arrays['value'].tolist(), distances.tolist(),
+        )
+    ]
+    return composition, rows
+
+
+class HubbardIndex:
+    """
+    SQLite index of the converged Hubbard parameters of the finished Hubbard work chains.
+
+    Every parameter of the final `hubbard_structure` of a run is a row with the kinds,
+    elements and manifolds of the pair, its value and distance, the reduced composition
+    of the structure and the UUID of the run. `update` only loads the outputs of the runs
+    that are not indexed yet, so queries across thousands of runs never load a node.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path is not None else get_default_index_path()
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    @contextlib.contextmanager
+    def _connect(self):
+        with self._lock:
+            if not self._initialized:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+            with contextlib.closing(sqlite3.connect(self.path)) as connection:
+                if not self._initialized:
+                    connection.executescript(_SCHEMA)
+                    self._initialized = True
+                with connection:
+                    yield connection
+
+    def __len__(self):
+        """Return the number of indexed runs."""
+        with self._connect() as connection:
+            return connection.execute('SELECT COUNT(*) FROM runs').fetchone()[0]
+
+    def update(self, limit: int = None) -> int:
+        """
+        Index the finished Hubbard runs that are not indexed yet, oldest first.
+
+        Runs that were deleted from the profile are dropped from the index.
+
+        :param limit: the maximum number of runs to index in this call.
+        :returns: the number of newly indexed runs.
+        """
+        from aiida_quantumespresso.data.hubbard_structure import HubbardStructureData
+
+        query = orm.QueryBuilder()
+        query.append(
+            orm.WorkflowNode,
+            filters={
+                'attributes.process_label': {'in': list(HUBBARD_PROCESS_LABELS)},
+                'attributes.exit_status': 0,
+            },
+            tag='workchain',
+            project=['uuid', 'attributes.process_label', 'ctime'],
+        )
+        query.append(
+            HubbardStructureData,
+            with_incoming='workchain',
+            edge_filters={'label': 'hubbard_structure'},
+            project=['id'],
+        )
+        query.order_by({'workchain': {'ctime': 'asc'}})
+        runs = query.all()
+
+        with self._connect() as connection:
+            indexed = {uuid for uuid, in connection.execute('SELECT process_uuid FROM runs')}
+        present = {uuid for uuid, *_ in runs}
+        self._remove(indexed - present)
+
+        count = 0
+        for uuid, label, ctime, pk in [run for run in runs if run[0] not in indexed][:limit]:
+            composition, rows = extract_parameters(uuid, orm.load_node(pk))
+            elements = '|' + '|'.join(symbol for symbol, _ in composition) + '|'
+            with self._connect() as connection:
+                # Another kernel may have indexed the run meanwhile; its parameters are already stored
+                cursor = connection.execute(
+                    'INSERT OR IGNORE INTO runs VALUES (?, ?, ?, ?, ?)',
+                    (uuid, label, ctime.isoformat(), get_formula(composition), elements),
+                )
+                if cursor.rowcount == 1:
+                    connection.executemany(f'INSERT INTO parameters VALUES ({", ".join("?" * len(COLUMNS))})', rows)
+                    count += 1
+        return count
+
+    def _remove(self, uuids):
+        if not uuids:
+            return
+        with self._connect() as connection:
+            for table in ('runs', 'parameters'):
+                connection.executemany(f'DELETE FROM {table} WHERE process_uuid = ?', [(uuid,) for uuid in uuids])
+
+    def clear(self):
+        """Drop every indexed run."""
+        with self._connect() as connection:
+            connection.execute('DELETE FROM runs')
+            connection.execute('DELETE FROM parameters')
+
+    @staticmethod
+    def _where(symbol=None, manifold=None, hubbard_type=None, onsite=None, neighbour_symbol=None,
+               composition=None, elements=None, max_distance=None, process_uuid=None) -> tuple:
+        clauses, values = [], []
+
+        def add(column, value):
+            if value is None:
+                return
+            if isinstance(value, (list, tuple, set)):
+                value = list(value)
+                clauses.append(f'{column} IN ({", ".join("?" * len(value))})')
+                values.extend(value)
+            else:
+                clauses.append(f'{column} = ?')
+                values.append(value)
+
+        add('symbol_i', symbol)
+        add('manifold_i', manifold)
+        add('hubbard_type', hubbard_type)
+        add('onsite', None if onsite is None else int(onsite))
+        add('symbol_j', neighbour_symbol)
+        add('composition', composition)
+        add('process_uuid', process_uuid)
+        for element in elements or ():
+            clauses.append('process_uuid IN (SELECT process_uuid FROM runs WHERE elements LIKE ?)')
+            values.append(f'%|{element}|%')
+        if max_distance is not None:
+            clauses.append('distance <= ?')
+            values.append(max_distance)
+        return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), values
+
+    def query(self, **filters) -> dict:
+        """
+        Return the indexed parameters that match the filters, as a dict of NumPy columns.
+
+        The filters are `symbol`, `manifold`, `neighbour_symbol`, `hubbard_type`,
+        `composition` and `process_uuid` (a value or a list of accepted values), `onsite`
+        (bool), `elements` (the elements the structure must all contain) and
+        `max_distance` (Å).
+        """
+        where, values = self._where(**filters)
+        with self._connect() as connection:
+            rows = connection.execute(f'SELECT * FROM parameters{where}', values).fetchall()
+        columns = list(zip(*rows)) if rows else [()] * len(COLUMNS)
+        return {name: np.array(column) for (name, _), column in zip(COLUMNS, columns)}
+
+    def aggregate(self, group_by=AGGREGATE_COLUMNS, **filters) -> list:
+        """
+        Return the statistics of the matching parameters, grouped by the `group_by` columns.
+
+        Every group is a dict of the `group_by` values and the `runs` and `count` of the
+        parameters and the `mean`, `std`, `min` and `max` of their values. The filters are
+        those of `query`.
+        """
+        unknown = set(group_by) - {name for name, _ in COLUMNS}
+        if unknown:
+            raise ValueError(f'Unknown columns to group by: {", ".join(sorted(unknown))}.')
+        where, values = self._where(**filters)
+        columns = ', '.join(group_by)
+        with self._connect() as connection:
+            rows = connection.execute(
+                f'SELECT {columns}, COUNT(DISTINCT process_uuid), COUNT(*), AVG(value), '
+                f'AVG(value * value), MIN(value), MAX(value) FROM parameters{where} '
+                f'GROUP BY {columns} ORDER BY {columns}',
+                values,
+            ).fetchall()
+        groups = []
+        for row in rows:
+            runs, count, mean, mean_square, minimum, maximum = row[len(group_by):]
+            groups.append({
+                **dict(zip(group_by, row)),
+                'runs': runs,
+                'count': count,
+                'mean': mean,
+                'std': max(mean_square - mean * mean, 0.0) ** 0.5,
+                'min': minimum,
+                'max': maximum,
+            })
+        return groups
+
+
+_HUBBARD_INDEX = None
+
+
+def get_hubbard_index() -> HubbardIndex:
+    """Return the process-wide index of the current profile, creating it on first use."""
+    global _HUBBARD_INDEX
+    path = get_default_index_path()
+    if _HUBBARD_INDEX is None or _HUBBARD_INDEX.path != path:
+        _HUBBARD_INDEX = HubbardIndex(path)
+    return _HUBBARD_INDEX
@@ -3,6 +3,23 @@ import traitlets as tl
 from aiidalab_qe.common.panel import ConfigurationSettingsModel
 from aiidalab_qe.common.mixins import HasInputStructure
 
+from .hubbard import HubbardU, HubbardV
+
+
+class HubbardTrait(tl.TraitType):
+    """Trait of Hubbard entries, set from a container, a dict of columns or a list of lists."""
+
+    def __init__(self, klass, **kwargs):
+        self.klass = klass
+        self.info_text = f'Hubbard {klass.label} entries'
+        super().__init__(default_value=klass(), **kwargs)
+
+    def validate(self, obj, value):
+        try:
+            return self.klass.load(value)
+        except (TypeError, ValueError):
+            self.error(obj, value)
+
 class HPSettingsModel(ConfigurationSettingsModel, HasInputStructure):
     """Traitlets-based model for the HP plugin settings."""
     title = 'HP Settings'
@@ -11,6 +28,8 @@ class HPSettingsModel(ConfigurationSettingsModel, HasInputStructure):
     dependencies = [
         'input_structure',
         'workchain.protocol',
+        'workchain.spin_type',
+        'advanced.magnetization.moments',
     ]
 
     # Basic HP traitlets
@@ -22,15 +41,42 @@ class HPSettingsModel(ConfigurationSettingsModel, HasInputStructure):
     parallelize_qpoints = tl.Bool(default_value=True)
     protocol = tl.Unicode(allow_none=True)
     relax_type = tl.Unicode(default_value='cell')
+    # Merge the kinds that only differ by name, so that hp.x perturbs fewer atoms
+    merge_kinds = tl.Bool(default_value=False)
+    # Start a self-consistent cycle from the converged values of an earlier run
+    warm_start = tl.Bool(default_value=False)
+    reuse_charge_density = tl.Bool(default_value=False)
+    # Spin type and initial magnetic moments per kind of the app, which keep kinds apart with `merge_kinds`
+    spin_type = tl.Unicode(default_value='none')
+    moments = tl.Dict()
+    # Resources of the pw and hp codes, as in the `codes` of `get_builder`, for the core-hours
+    # of the cost estimate; the app only selects them in the submission step, after this one
+    codes = tl.Dict()
 
-    # Hubbard U, V will be stored as lists-of-lists or something similar
-    # e.g. each entry in hubbard_u might be [kind_name, manifold, U-value],
-    # each entry in hubbard_v might be [kind1, manifold1, kind2, manifold2, V-value]
-    hubbard_u = tl.List(trait=tl.List(), default_value=[])
-    hubbard_v = tl.List(trait=tl.List(), default_value=[])
+    # Hubbard U, V entries, e.g. [kind_name, manifold, U-value] in hubbard_u and
+    # [kind1, manifold1, kind2, manifold2, V-value] in hubbard_v; lists of lists are
+    # converted to the typed containers of `hubbard.py`
+    hubbard_u = HubbardTrait(HubbardU)
+    hubbard_v = HubbardTrait(HubbardV)
+    # Only pairs of kinds with neighbours within this distance (Å) are offered for V
+    hubbard_v_cutoff = tl.Float(default_value=3.5)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._flush_callbacks = []
+
+    def on_flush(self, callback):
+        """Register `callback`, called before the state is read to apply edits the views still hold back."""
+        self._flush_callbacks.append(callback)
+
+    def flush(self):
+        """Apply the pending edits of the views, e.g. the debounced edits of the Hubbard tables."""
+        for callback in self._flush_callbacks:
+            callback()
 
     def get_model_state(self) -> dict:
         """Return a dictionary capturing the current model state."""
+        self.flush()
         return {
             'method': self.method,
             'relax_type': self.relax_type,
@@ -39,12 +85,21 @@ class HPSettingsModel(ConfigurationSettingsModel, HasInputStructure):
             'qpoints_distance': self.qpoints_distance,
             'parallelize_atoms': self.parallelize_atoms,
             'parallelize_qpoints': self.parallelize_qpoints,
-            'hubbard_u': self.hubbard_u,
-            'hubbard_v': self.hubbard_v,
+            'merge_kinds': self.merge_kinds,
+            'warm_start': self.warm_start,
+            'reuse_charge_density': self.reuse_charge_density,
+            'hubbard_v_cutoff': self.hubbard_v_cutoff,
+            'hubbard_u': self.hubbard_u.to_columns(),
+            'hubbard_v': self.hubbard_v.to_columns(),
         }
 
     def set_model_state(self, parameters: dict):
-        """Set the model state from a given dictionary."""
+        """
+        Set the model state from a given dictionary.
+
+        The Hubbard entries are accepted by column, as returned by `get_model_state`, or as
+        the lists of lists of older states.
+        """
         self.method = parameters.get('method', 'one-shot')
         self.relax_type = parameters.get('relax_type', 'cell')
         self.calculation_type = parameters.get('calculation_type', 'DFT+U')
@@ -52,8 +107,16 @@ class HPSettingsModel(ConfigurationSettingsModel, HasInputStructure):
         self.qpoints_distance = parameters.get('qpoints_distance', 1.0)
         self.parallelize_atoms = parameters.get('parallelize_atoms', True)
         self.parallelize_qpoints = parameters.get('parallelize_qpoints', True)
-        self.hubbard_u = parameters.get('hubbard_u', [])
-        self.hubbard_v = parameters.get('hubbard_v', [])
+        self.merge_kinds = parameters.get('merge_kinds', False)
+        self.warm_start = parameters.get('warm_start', False)
+        self.reuse_charge_density = parameters.get('reuse_charge_density', False)
+        self.hubbard_v_cutoff = parameters.get('hubbard_v_cutoff', 3.5)
+        self.hubbard_u = parameters.get('hubbard_u')
+        self.hubbard_v = parameters.get('hubbard_v')
+
+    def get_magnetic_moments(self):
+        """Return the initial magnetic moments per kind that `get_builder` receives, `None` if not spin polarized."""
+        return dict(self.moments) if self.spin_type == 'collinear' else None
 
     @tl.observe('protocol')
     def _observe_protocol(self, change):
@@ -61,7 +124,8 @@ class HPSettingsModel(ConfigurationSettingsModel, HasInputStructure):
         if change['new'] is None:
             return
         from aiida_quantumespresso.workflows.pw.base import PwBaseWorkChain
-        parameters = PwBaseWorkChain.get_protocol_inputs(change['new'])
+        from .protocols import get_protocol_inputs
+        parameters = get_protocol_inputs(PwBaseWorkChain, change['new'])
         # Example usage: If kpoints_distance is part of the protocol
         if 'kpoints_distance' in parameters:
             self.qpoints_distance = parameters['kpoints_distance'] * 4
@@ -0,0 +1,58 @@
+"""Periodic neighbor search used to propose inter-site Hubbard V pairs."""
+import numpy as np
+
+# Maximum number of (site, image, site) distances evaluated at once.
+_CHUNK_SIZE = 2_000_000
+
+
+def get_kind_pair_distances(structure, cutoff: float) -> dict:
+    """
+    Return the shortest distance between every pair of kinds that are neighbours.
+
+    Distances are searched over all periodic images within `cutoff` (Å), so only kind
+    pairs with at least one neighbour inside the cutoff are returned. Pairs are keyed
+    by `(kind_i, kind_j)` with distinct kinds, ordered as in `structure.kinds`.
+
+    :param structure: a `StructureData`.
+    :param cutoff: neighbour cutoff in Å.
+    :returns: dict mapping `(kind_i, kind_j)` to the first-shell distance in Å.
+    """
+    kind_names = [kind.name for kind in structure.kinds]
+    sites = structure.sites
+    codes = np.array([kind_names.index(site.kind_name) for site in sites], dtype=int)
+    positions = np.array([site.position for site in sites], dtype=float).reshape(-1, 3)
+    cell = np.asarray(structure.cell, dtype=float)
+    pbc = np.asarray(structure.pbc, dtype=bool)
+
+    # Wrap the atoms into the cell along periodic directions, so that the images
+    # within `cutoff` are the ones at most `ceil(cutoff / spacing)` cells away.
+    inverse = np.linalg.inv(cell)
+    fractional = positions @ inverse
+    fractional[:, pbc] %= 1.0
+    positions = fractional @ cell
+    num_images = np.where(pbc, np.ceil(cutoff * np.linalg.norm(inverse, axis=0)), 0).astype(int)
+    ranges = [np.arange(-n, n + 1) for n in num_images]
+    translations = np.stack(np.meshgrid(*ranges, indexing='ij'), axis=-1).reshape(-1, 3)
+    shifts = translations @ cell
+
+    nkinds = len(kind_names)
+    nsites = len(positions)
+    shortest = np.full((nkinds, nkinds), np.inf)
+    chunk = max(_CHUNK_SIZE // max(len(shifts) * nsites, 1), 1)
+    for start in range(0, nsites, chunk):
+        centers = positions[start : start + chunk]
+        vectors = positions[None, None, :, :] + shifts[None, :, None, :] - centers[:, None, None, :]
+        distances = np.linalg.norm(vectors, axis=-1)
+        # Exclude each atom from its own neighbour list.
+        distances[distances < 1e-8] = np.inf
+        nearest = distances.min(axis=1)
+        rows = np.repeat(codes[start : start + chunk], nsites)
+        columns = np.tile(codes, len(centers))
+        np.minimum.at(shortest, (rows, columns), nearest.ravel())
+
+    return {
+        (kind_names[i], kind_names[j]): float(shortest[i, j])
+        for i in range(nkinds)
+        for j in range(i + 1, nkinds)
+        if shortest[i, j] <= cutoff
+    }
@@ -0,0 +1,69 @@
+"""Automatic choice of the pw.x and hp.x parallelization flags."""
+import math
+
+import numpy as np
+
+from .qpoints import get_qpoints_mesh
+
+_BOHR = 0.529177210903  # Å
+
+# Below this number of bands the subspace diagonalization is faster in serial
+SERIAL_DIAGONALIZATION_BANDS = 100
+
+
+def get_num_kpoints(structure, distance: float, num_operations: int = 1) -> int:
+    """Return an estimate of the number of irreducible k points for a k-point distance (1/Å)."""
+    # The k-point mesh is built exactly like the q-point mesh, by `create_kpoints_from_distance`
+    mesh = get_qpoints_mesh(structure.cell, structure.pbc, distance)
+    return max(math.ceil(int(np.prod(mesh)) / max(num_operations, 1)), 1)
+
+
+def get_num_bands(structure, pseudos) -> int:
+    """Return the default number of bands of pw.x: half the valence electrons plus 20%, at least 4 more."""
+    num_electrons = sum(pseudos[site.kind_name].z_valence for site in structure.sites)
+    return int(max(math.ceil(1.2 * num_electrons / 2), num_electrons / 2 + 4))
+
+
+def get_fft_grid(cell, ecutrho: float) -> tuple:
+    """Return the dense FFT grid of pw.x for a cell (Å) and charge-density cutoff (Ry)."""
+    lengths = np.linalg.norm(np.asarray(cell, dtype=float), axis=1) / _BOHR
+    return tuple(_good_fft_size(int(math.sqrt(ecutrho) * length / math.pi) + 1) for length in lengths)
+
+
+def _good_fft_size(size: int) -> int:
+    """Return the smallest size >= `size` with only 2, 3 and 5 as prime factors."""
+    while True:
+        rest = size
+        for factor in (2, 3, 5):
+            while rest % factor == 0:
+                rest //= factor
+        if rest == 1:
+            return size
+        size += 1
+
+
+def get_num_pools(num_ranks: int, num_kpoints: int) -> int:
+    """Return the largest divisor of `num_ranks` that does not exceed `num_kpoints`."""
+    return max(pools for pools in range(1, min(num_ranks, num_kpoints) + 1) if num_ranks % pools == 0)
+
+
+def plan_parallelization(num_ranks: int, num_kpoints: int, num_bands: int = None, fft_grid: tuple = None) -> dict:
+    """
+    Return the parallelization flags of a pw.x or hp.x run.
+
+    k-point pools scale almost perfectly, so as many pools as possible are used. Within a
+    pool, the subspace diagonalization is done in serial for small numbers of bands, and
+    otherwise on the largest square grid of ranks. Pencil decomposition of the FFT is
+    enabled when a pool has more ranks than the FFT grid has planes, since the plane-wise
+    distribution would leave ranks idle.
+
+    :returns: dict with `npool`, `ndiag` and `pencil_decomposition`.
+    """
+    npool = get_num_pools(num_ranks, num_kpoints)
+    ranks_per_pool = num_ranks // npool
+    if num_bands is None or num_bands < SERIAL_DIAGONALIZATION_BANDS:
+        ndiag = 1
+    else:
+        ndiag = math.isqrt(ranks_per_pool) ** 2
+    pencil_decomposition = fft_grid is not None and ranks_per_pool > fft_grid[2]
+    return {'npool': npool, 'ndiag': ndiag, 'pencil_decomposition': pencil_decomposition}
@@ -0,0 +1,97 @@
+"""Per-stage resource policy of the HP workflow."""
+# The stages of the workflow that run a pw.x or hp.x calculation
+STAGES = ('relax', 'scf', 'hp_init', 'hp_perturbation')
+
+# Default walltime (s) of the hp.x initialization job of `HpParallelizeAtomsWorkChain`, its
+# `init_walltime` input; the walltime of the collection job is fixed to 1 h upstream
+HP_INIT_WALLTIME = 3600
+
+_RESOURCE_KEYS = ('nodes', 'ntasks_per_node', 'cpus_per_task', 'max_wallclock_seconds')
+
+
+def _get_resources(code_info: dict) -> dict:
+    return {
+        'nodes': code_info.get('nodes', 1),
+        'ntasks_per_node': code_info.get('ntasks_per_node', 1),
+        'cpus_per_task': code_info.get('cpus_per_task', 1),
+        'max_wallclock_seconds': code_info.get('max_wallclock_seconds', 3600 * 12),
+    }
+
+
+def get_num_perturbations(num_atoms: int, num_qpoints: int, parallelize_atoms: bool, parallelize_qpoints: bool) -> int:
+    """Return the number of hp.x perturbation jobs that run side by side, 1 if hp.x is not parallelized."""
+    if not parallelize_atoms:
+        return 1
+    return max(num_atoms, 1) * (max(num_qpoints, 1) if parallelize_qpoints else 1)
+
+
+def scale_resources(resources: dict, num_jobs: int) -> dict:
+    """
+    Return the resources of one of `num_jobs` jobs that share the work of a single job.
+
+    The MPI ranks of `resources` are split evenly over the jobs, so that running them all
+    at once does not use more than the original allocation. A job gets whole machines if
+    its share is at least one machine, otherwise part of a single machine. Each job does
+    its share of the work on its share of the ranks, so it keeps the requested walltime.
+    """
+    if num_jobs <= 1:
+        return dict(resources)
+    ntasks_per_node = resources['ntasks_per_node']
+    total_ranks = resources['nodes'] * ntasks_per_node
+    ranks = max(total_ranks // num_jobs, 1)
+    if ranks >= ntasks_per_node:
+        nodes = ranks // ntasks_per_node
+    else:
+        nodes, ntasks_per_node = 1, ranks
+    return {
+        'nodes': nodes,
+        'ntasks_per_node': ntasks_per_node,
+        'cpus_per_task': resources['cpus_per_task'],
+        'max_wallclock_seconds': resources['max_wallclock_seconds'],
+    }
+
+
+def get_stage_resources(
+    codes: dict,
+    num_atoms: int = 1,
+    num_qpoints: int = 1,
+    parallelize_atoms: bool = False,
+    parallelize_qpoints: bool = False,
+    overrides: dict = None,
+) -> dict:
+    """
+    Return the resources of every stage of the workflow.
+
+    The pw.x stages (`relax`, `scf`) use the resources of the pw code. The hp code
+    resources are those of a single hp.x run; when hp.x is parallelized they are split
+    over the `hp_perturbation` jobs with `scale_resources`. The `hp_init` job runs on the
+    same machines, as it shares the `hp` inputs, so only its walltime can differ; the
+    collection job also shares them, with the walltime fixed by `HpParallelizeAtomsWorkChain`.
+
+    :param codes: the codes and resources as passed to `get_builder`.
+    :param num_atoms: the number of perturbed Hubbard atoms.
+    :param num_qpoints: the number of irreducible q points.
+    :param overrides: optional dict mapping a stage to the resources that replace the
+        policy for that stage, e.g. `{'hp_perturbation': {'ntasks_per_node': 8}}`.
+    :returns: dict mapping each of `STAGES` to a dict of `nodes`, `ntasks_per_node`,
+        `cpus_per_task` and `max_wallclock_seconds`, plus `num_perturbations`.
+    """
+    pw = _get_resources(codes.get('pw') or {})
+    hp = _get_resources(codes.get('hp') or {})
+    num_perturbations = get_num_perturbations(num_atoms, num_qpoints, parallelize_atoms, parallelize_qpoints)
+    perturbation = scale_resources(hp, num_perturbations)
+    policy = {
+        'relax': dict(pw),
+        'scf': dict(pw),
+        'hp_init': {**perturbation, 'max_wallclock_seconds': HP_INIT_WALLTIME} if parallelize_atoms else None,
+        'hp_perturbation': perturbation,
+    }
+    for stage, resources in (overrides or {}).items():
+        if stage not in STAGES:
+            raise ValueError(f'Unknown stage `{stage}`, valid stages are: {", ".join(STAGES)}.')
+        unknown = set(resources) - set(_RESOURCE_KEYS)
+        if unknown:
+            raise ValueError(f'Unknown resources for stage `{stage}`: {", ".join(sorted(unknown))}.')
+        policy[stage] = {**(policy[stage] or perturbation), **resources}
+    policy['num_perturbations'] = num_perturbations
+    return policy
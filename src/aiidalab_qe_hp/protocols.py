@@ -0,0 +1,102 @@
+"""Process-wide cache of the workflow protocols used by the HP plugin."""
+import contextlib
+import contextvars
+import copy
+import functools
+import pathlib
+import threading
+
+import yaml
+
+# Guards the cache and the one-time installation of the cached loader, never the callers' code
+_LOCK = threading.Lock()
+_PROTOCOL_INPUTS = {}
+# Whether the protocol files are read through the cache in the current thread or task
+_ENABLED = contextvars.ContextVar('cached_protocol_files', default=False)
+_ORIGINAL = None
+
+
+@functools.lru_cache(maxsize=None)
+def _load_protocol_file(filepath: str) -> dict:
+    with open(filepath, encoding='utf-8') as file:
+        return yaml.safe_load(file)
+
+
+def _load_cached_protocol_file(cls) -> dict:
+    if not _ENABLED.get():
+        return _ORIGINAL.__func__(cls)
+    # Callers merge and pop from the returned dict, so each call gets its own copy
+    return copy.deepcopy(_load_protocol_file(str(cls.get_protocol_filepath())))
+
+
+def _install():
+    global _ORIGINAL
+    from aiida_quantumespresso.workflows.protocols.utils import ProtocolMixin
+
+    with _LOCK:
+        # Other versions of `aiida-quantumespresso` may not read the files through this method,
+        # in which case they are read as before, without the cache
+        if _ORIGINAL is None and '_load_protocol_file' in ProtocolMixin.__dict__:
+            _ORIGINAL = ProtocolMixin.__dict__['_load_protocol_file']
+            ProtocolMixin._load_protocol_file = classmethod(_load_cached_protocol_file)
+
+
+@contextlib.contextmanager
+def cached_protocol_files():
+    """
+    Within this context, every protocol YAML file is parsed at most once per process.
+
+    `get_builder_from_protocol` of the work chains re-reads the protocol file of every
+    sub work chain on each call. The first use installs a loader that is memoized
+    inside the context only: other threads and code outside the context read the
+    files as before, and concurrent contexts do not wait on each other.
+    """
+    _install()
+    token = _ENABLED.set(True)
+    try:
+        yield
+    finally:
+        _ENABLED.reset(token)
+
+
+def _freeze(value):
+    """Return a hashable version of (nested) override dictionaries."""
+    from aiida import orm
+
+    if isinstance(value, orm.Node):
+        raise TypeError('nodes are not memoized')
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    hash(value)
+    return value
+
+
+def get_protocol_inputs(workchain, protocol: str = None, overrides: dict = None) -> dict:
+    """
+    Return the protocol inputs of `workchain`, memoized on the protocol name and overrides.
+
+    Overrides containing nodes are not memoized, but still read the protocol file
+    through the cache of `cached_protocol_files`.
+
+    :param workchain: a work chain class using the `ProtocolMixin`.
+    :param protocol: the protocol name; the default protocol of the work chain if not given.
+    :param overrides: optional dictionary of overrides, see `ProtocolMixin.get_protocol_inputs`.
+    :returns: a copy of the inputs, which the caller is free to modify.
+    """
+    try:
+        key = None if isinstance(overrides, pathlib.Path) else (workchain, protocol, _freeze(overrides))
+    except TypeError:
+        key = None
+    if key is None:
+        with cached_protocol_files():
+            return workchain.get_protocol_inputs(protocol, overrides)
+    with _LOCK:
+        inputs = _PROTOCOL_INPUTS.get(key)
+    if inputs is None:
+        with cached_protocol_files():
+            inputs = workchain.get_protocol_inputs(protocol, copy.deepcopy(overrides))
+        with _LOCK:
+            inputs = _PROTOCOL_INPUTS.setdefault(key, inputs)
+    return copy.deepcopy(inputs)
@@ -0,0 +1,72 @@
+"""Fast q-point mesh preview for the HP settings panel."""
+import functools
+
+import numpy as np
+
+_EPSILON = 1e-5
+# Number of q-point meshes tried at most by the adaptive method
+DEFAULT_REFINEMENT_MESHES = 4
+
+
+def get_qpoints_mesh(cell, pbc, distance: float, force_parity: bool = False) -> tuple:
+    """
+    Return the q-point mesh of a cell for a given q-point distance.
+
+    Pure NumPy equivalent of aiida-quantumespresso's `create_kpoints_from_distance`:
+    no ORM node is created. Results are memoized on the cell, pbc and distance.
+
+    :param cell: (3, 3) cell vectors in Å.
+    :param pbc: periodic boundary conditions along the three cell vectors.
+    :param distance: maximum distance (1/Å) between adjacent q-points.
+    :param force_parity: if True, force the mesh to be even along periodic directions.
+    :returns: tuple of the three mesh sizes.
+    """
+    cell = tuple(tuple(float(x) for x in vector) for vector in np.asarray(cell, dtype=float))
+    return _get_qpoints_mesh(cell, tuple(bool(p) for p in pbc), float(distance), bool(force_parity))
+
+
+def get_structure_qpoints_mesh(structure, distance: float, force_parity: bool = False) -> tuple:
+    """Return the q-point mesh of a `StructureData` for a given q-point distance."""
+    return get_qpoints_mesh(structure.cell, structure.pbc, distance, force_parity)
+
+
+@functools.lru_cache(maxsize=1024)
+def _get_qpoints_mesh(cell: tuple, pbc: tuple, distance: float, force_parity: bool) -> tuple:
+    cell = np.array(cell)
+    reciprocal_cell = 2.0 * np.pi * np.linalg.inv(cell).T
+    # Round to the fifth digit first, to avoid that e.g. 3.00000001 becomes 4
+    mesh = [
+        max(int(np.ceil(round(np.linalg.norm(b) / distance, 5))), 1) if periodic else 1
+        for periodic, b in zip(pbc, reciprocal_cell)
+    ]
+    if force_parity:
+        mesh = [n + (n % 2) if periodic else 1 for periodic, n in zip(pbc, mesh)]
+
+    # If the vectors of the cell all have the same length, the mesh should be isotropic as well
+    lengths = np.linalg.norm(cell, axis=1)
+    if np.all(np.abs(lengths - lengths[0]) < _EPSILON) and len(set(mesh)) != 1:
+        mesh = [max(mesh) if periodic else 1 for periodic in pbc]
+    return tuple(mesh)
+
+
+def get_qpoints_refinement(
+    structure, distance: float, max_meshes: int = DEFAULT_REFINEMENT_MESHES, coarsening: float = 1.5
+) -> list:
+    """
+    Return the q-point distances of the meshes tried by the adaptive method, from coarse to fine.
+
+    The finest mesh is the one of `distance`. Coarser distances are obtained by multiplying
+    it by `coarsening`, keeping one distance per distinct mesh, down to the Γ-only mesh
+    or until there are `max_meshes` meshes.
+    """
+    distances = []
+    meshes = set()
+    while len(distances) < max_meshes:
+        mesh = get_structure_qpoints_mesh(structure, distance)
+        if mesh not in meshes:
+            meshes.add(mesh)
+            distances.append(round(distance, 6))
+        if all(n == 1 for n in mesh):
+            break
+        distance *= coarsening
+    return distances[::-1]
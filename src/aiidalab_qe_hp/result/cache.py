@@ -0,0 +1,174 @@
+# hp_results_cache.py
+
+import contextlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+STRUCTURE_FIELDS = ('cell', 'pbc', 'kind_names', 'symbols', 'positions')
+
+
+def get_default_cache_directory() -> Path:
+    """Return the directory of the on-disk results cache."""
+    if 'AIIDALAB_QE_HP_CACHE_DIR' in os.environ:
+        return Path(os.environ['AIIDALAB_QE_HP_CACHE_DIR'])
+    return Path(os.environ.get('XDG_CACHE_HOME', Path.home() / '.cache')) / 'aiidalab-qe-hp' / 'results'
+
+
+def get_process_fingerprint(process) -> Optional[str]:
+    """
+    Return a fingerprint identifying the state of a process node.
+
+    Only sealed processes can be cached: while a process runs, new iteration outputs
+    may still be attached. Re-sealing or modifying the node updates its `mtime`,
+    so the fingerprint changes and stale entries are dropped.
+    """
+    if not process.is_sealed:
+        return None
+    return f'{process.uuid}@{process.mtime.isoformat()}'
+
+
+class ResultsCache:
+    """
+    Least-recently-used cache of computed HP results, keyed by process UUID.
+
+    Entries are kept in memory and mirrored as JSON files on disk, so they survive
+    kernel restarts. An entry holds the `table_columns`, the compact structure arrays and the
+    iteration `trace`.
+    """
+
+    def __init__(self, directory=None, maxsize: int = 256):
+        self.directory = Path(directory) if directory is not None else get_default_cache_directory()
+        self.maxsize = maxsize
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, uuid: str) -> Path:
+        return self.directory / f'{uuid}.json'
+
+    def get(self, uuid: str, fingerprint: Optional[str]) -> Optional[dict]:
+        """Return the entry for `uuid`, or `None` on a miss or a stale fingerprint."""
+        if fingerprint is None:
+            return None
+        with self._lock:
+            record = self._memory.get(uuid)
+            if record is None:
+                record = self._read(uuid)
+            if record is None:
+                return None
+            if record['fingerprint'] != fingerprint:
+                self._remove(uuid)
+                return None
+            self._memory[uuid] = record
+            self._memory.move_to_end(uuid)
+            self._evict_memory()
+            self._touch(uuid)
+            return record['entry']
+
+    def set(self, uuid: str, fingerprint: Optional[str], entry: dict):
+        """Store `entry` for `uuid`; uncacheable (unsealed) processes are ignored."""
+        if fingerprint is None:
+            return
+        record = {'fingerprint': fingerprint, 'entry': entry}
+        with self._lock:
+            self._memory[uuid] = record
+            self._memory.move_to_end(uuid)
+            self._evict_memory()
+            self._write(uuid, record)
+            self._evict_disk()
+
+    def invalidate(self, uuid: str):
+        """Drop the entry of `uuid` from memory and disk."""
+        with self._lock:
+            self._remove(uuid)
+
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self._memory.clear()
+            for path in self.directory.glob('*.json'):
+                path.unlink(missing_ok=True)
+
+    def _remove(self, uuid):
+        self._memory.pop(uuid, None)
+        self._path(uuid).unlink(missing_ok=True)
+
+    def _evict_memory(self):
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        try:
+            paths = sorted(self.directory.glob('*.json'), key=lambda path: path.stat().st_mtime)
+        except OSError:
+            return
+        for path in paths[: max(len(paths) - self.maxsize, 0)]:
+            path.unlink(missing_ok=True)
+
+    def _touch(self, uuid):
+        try:
+            os.utime(self._path(uuid))
+        except OSError:
+            pass
+
+    def _read(self, uuid) -> Optional[dict]:
+        path = self._path(uuid)
+        try:
+            with open(path, encoding='utf-8') as handle:
+                record = json.load(handle)
+            entry = record['entry']
+            if not isinstance(record['fingerprint'], str):
+                raise TypeError('the fingerprint is not a string')
+            for name in ('table_columns', 'structure'):
+                if name in entry:
+                    entry[name] = {key: np.asarray(value) for key, value in entry[name].items()}
+            if 'table_columns' in entry:
+                entry['table_columns']['translation'] = entry['table_columns']['translation'].reshape(-1, 3)
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError, TypeError, AttributeError):
+            # A truncated file, or one written by an older version: drop it, the entry is rebuilt
+            with contextlib.suppress(OSError):
+                path.unlink(missing_ok=True)
+            return None
+        except OSError:
+            return None
+        return record
+
+    def _write(self, uuid, record):
+        entry = record['entry']
+        serialized = {
+            'fingerprint': record['fingerprint'],
+            'entry': {
+                name: {key: np.asarray(value).tolist() for key, value in entry[name].items()}
+                for name in ('table_columns', 'structure')
+            },
+        }
+        if 'trace' in entry:
+            serialized['entry']['trace'] = entry['trace']
+        path = self._path(uuid)
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as handle:
+                json.dump(serialized, handle)
+            os.replace(tmp_path, path)
+        except OSError:
+            # The disk store is best effort; the in-memory entry is still valid.
+            pass
+
+
+_RESULTS_CACHE = None
+
+
+def get_results_cache() -> ResultsCache:
+    """Return the process-wide results cache, creating it on first use."""
+    global _RESULTS_CACHE
+    if _RESULTS_CACHE is None:
+        _RESULTS_CACHE = ResultsCache()
+    return _RESULTS_CACHE
@@ -0,0 +1,149 @@
+# hp_results_export.py
+
+import csv
+import itertools
+import json
+from pathlib import Path
+
+from aiida import orm
+
+from .table import TABLE_COLUMNS, compute_table_columns, get_hubbard_arrays, iter_table_rows
+
+# File extension of every export format
+EXPORT_FORMATS = {'csv': '.csv', 'jsonl': '.jsonl', 'parquet': '.parquet'}
+# Number of rows converted from the columns, and written to Parquet, at a time
+EXPORT_BATCH_SIZE = 10000
+
+
+def get_export_format(path) -> str:
+    """Return the export format of a file from its extension."""
+    suffix = Path(path).suffix.lower()
+    for fmt, extension in EXPORT_FORMATS.items():
+        if suffix == extension:
+            return fmt
+    raise ValueError(f'Unknown export format for `{path}`, valid extensions are: {", ".join(EXPORT_FORMATS.values())}.')
+
+
+def get_hubbard_structure(process):
+    """Return the final `HubbardStructureData` of a QE app workflow or of a Hubbard work chain."""
+    if 'hp' in process.outputs:
+        return process.outputs.hp.hubbard_structure
+    return process.outputs.hubbard_structure
+
+
+def iter_column_rows(columns: dict, batch_size: int = EXPORT_BATCH_SIZE):
+    """Yield the rows of the table columns, converting only `batch_size` rows at a time."""
+    for start in range(0, len(columns['value']), batch_size):
+        yield from iter_table_rows(columns, start, start + batch_size)
+
+
+def iter_process_rows(processes, batch_size: int = EXPORT_BATCH_SIZE):
+    """
+    Yield the final Hubbard parameters of every process, as table rows with a `process_uuid`.
+
+    The processes are loaded one at a time, so only the parameters of one process are
+    held in memory.
+
+    :param processes: iterable of process nodes, pks or UUIDs.
+    """
+    for process in processes:
+        if not isinstance(process, orm.ProcessNode):
+            process = orm.load_node(process)
+        columns = compute_table_columns(get_hubbard_arrays(get_hubbard_structure(process)))
+        for row in iter_column_rows(columns, batch_size):
+            yield {'process_uuid': process.uuid, **row}
+
+
+def _batched(rows, batch_size: int):
+    rows = iter(rows)
+    while batch := list(itertools.islice(rows, batch_size)):
+        yield batch
+
+
+def _write_csv(rows, path: Path, fields: list) -> int:
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='') as handle:
+        writer = None
+        for row in rows:
+            if writer is None:
+                writer = csv.DictWriter(handle, fieldnames=list(row))
+                writer.writeheader()
+            writer.writerow({**row, 'translation': ' '.join(str(value) for value in row['translation'])})
+            count += 1
+        if writer is None:
+            csv.writer(handle).writerow(fields)
+    return count
+
+
+def _write_jsonl(rows, path: Path) -> int:
+    count = 0
+    with open(path, 'w', encoding='utf-8') as handle:
+        for row in rows:
+            handle.write(json.dumps(row) + '\n')
+            count += 1
+    return count
+
+
+def _write_parquet(rows, path: Path, batch_size: int, fields: list) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as exception:
+        raise ImportError(
+            'Exporting to Parquet requires `pyarrow`, install it with `pip install aiidalab-qe-hp[parquet]`.'
+        ) from exception
+
+    count = 0
+    writer = None
+    try:
+        for batch in _batched(rows, batch_size):
+            table = pa.Table.from_pylist(batch, schema=writer.schema if writer else None)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+            count += len(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        pq.write_table(pa.table({field: [] for field in fields}), path)
+    return count
+
+
+def write_rows(rows, path, fmt: str = None, batch_size: int = EXPORT_BATCH_SIZE, fields: list = None) -> int:
+    """
+    Write the table rows to a CSV, JSON Lines or Parquet file as they are generated.
+
+    The CSV writes the translation vector as three space-separated integers; JSON Lines and
+    Parquet keep it as a list. Parquet needs the optional `pyarrow` dependency.
+
+    :param rows: iterable of row dicts, e.g. from `iter_process_rows`.
+    :param fmt: one of `EXPORT_FORMATS`; by default, it is taken from the extension of `path`.
+    :param fields: the fields of the rows, for the header of a CSV or Parquet file without
+        rows; the columns of the results table by default.
+    :returns: the number of rows written.
+    """
+    path = Path(path)
+    fmt = fmt or get_export_format(path)
+    fields = fields or [column['field'] for column in TABLE_COLUMNS]
+    if fmt == 'csv':
+        return _write_csv(rows, path, fields)
+    if fmt == 'jsonl':
+        return _write_jsonl(rows, path)
+    if fmt == 'parquet':
+        return _write_parquet(rows, path, batch_size, fields)
+    raise ValueError(f'Unknown export format `{fmt}`, valid formats are: {", ".join(EXPORT_FORMATS)}.')
+
+
+def export_processes(processes, path, fmt: str = None, batch_size: int = EXPORT_BATCH_SIZE) -> int:
+    """
+    Export the final Hubbard parameters of a batch of processes to a single file.
+
+    Every row carries the `process_uuid` of its process, and the columns of the results
+    table. See `write_rows` for the formats.
+
+    :param processes: iterable of QE app workflows or Hubbard work chains, as nodes, pks or UUIDs.
+    :returns: the number of rows written.
+    """
+    fields = ['process_uuid', *(column['field'] for column in TABLE_COLUMNS)]
+    return write_rows(iter_process_rows(processes, batch_size), path, fmt, batch_size, fields)
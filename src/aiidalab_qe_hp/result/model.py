@@ -4,9 +4,16 @@ import time
 import numpy as np
 import traitlets as tl
 from aiida import orm
-from aiida_quantumespresso.utils.hubbard import get_supercell_atomic_index
 from aiidalab_qe.common.panel import ResultsModel
 
+from .cache import STRUCTURE_FIELDS, get_process_fingerprint, get_results_cache
+from .export import iter_column_rows, write_rows
+from .table import compute_table_columns, generate_table_data, get_hubbard_arrays
+from .provenance import ProcessTree
+from .trace import get_iteration_trace
+from ..index import get_hubbard_index
+from ..warmstart import HUBBARD_PROCESS_LABELS
+
 
 class HpResultsModel(ResultsModel):
     """Traitlets-based model holding the HP calculation results."""
@@ -15,75 +22,97 @@ class HpResultsModel(ResultsModel):
     identifier = 'hp'
 
     # The final structure containing the Hubbard parameters.
+    # A cached result does not load it; use `fetch_hubbard_structure`, or `structure_arrays` in views.
     hubbard_structure = tl.Instance(orm.StructureData, allow_none=True)
-    table_data = tl.Dict(allow_none=True)
+    # Compact arrays (cell, pbc, kind_names, symbols, positions) of the final structure.
+    structure_arrays = tl.Dict(allow_none=True)
+    # Columns of the results table, a NumPy array per field of `TABLE_COLUMNS`.
+    table_columns = tl.Dict(allow_none=True)
+    # Per-iteration Hubbard changes and stage timings, see `get_iteration_trace`.
+    trace = tl.Dict(allow_none=True)
+    # Statistics of the parameters of the indexed runs, see `HubbardIndex.aggregate`.
+    index_summary = tl.List(allow_none=True)
+
+    _this_process_label = 'AdaptiveHubbardWorkChain'
 
-    _this_process_label = 'SelfConsistentHubbardWorkChain'
+    def fetch_child_process_node(self, which='this'):
+        """Return the Hubbard work chain of the QE app workflow, of any of `HUBBARD_PROCESS_LABELS`."""
+        if which.lower() != 'this' or self._this_process_uuid or not self.process_uuid:
+            return super().fetch_child_process_node(which)
+        # Runs submitted before the adaptive method have a `SelfConsistentHubbardWorkChain` child
+        return next((child for child in self.process.called if child.process_label in HUBBARD_PROCESS_LABELS), None)
 
     def fetch_result(self):
         """
         Fetch the HP results from the process node and populate the traitlets.
         """
         process = self.fetch_process_node()
-        # The original code checks 'relax' in the inputs to decide:
-        if 'relax' not in process.inputs.hp:
-            self.hubbard_structure = process.outputs.hp.hubbard_structure
+        cache = get_results_cache()
+        fingerprint = get_process_fingerprint(process)
+        entry = cache.get(process.uuid, fingerprint)
+        if entry is None or not {'table_columns', 'trace'} <= entry.keys():
+            arrays = get_hubbard_arrays(self.fetch_hubbard_structure())
+            entry = {
+                'table_columns': compute_table_columns(arrays),
+                'structure': {key: arrays[key] for key in STRUCTURE_FIELDS},
+                'trace': self._get_trace(process),
+            }
+            cache.set(process.uuid, fingerprint, entry)
+        self.structure_arrays = entry['structure']
+        self.table_columns = entry['table_columns']
+        self.trace = entry['trace']
+
+    def fetch_hubbard_structure(self) -> orm.StructureData:
+        """Return the final structure with the Hubbard parameters, loading it from the process on first use."""
+        if self.hubbard_structure is None:
+            self.hubbard_structure = self.fetch_process_node().outputs.hp.hubbard_structure
+        return self.hubbard_structure
+
+    def iter_rows(self):
+        """Yield the rows of the results table, fetching the results if needed."""
+        if self.table_columns is None:
+            self.fetch_result()
+        yield from iter_column_rows(self.table_columns)
+
+    def export(self, path, fmt: str = None) -> int:
+        """
+        Write the results table to a CSV, JSON Lines or Parquet file, row by row.
+
+        See `write_rows` for the formats; `export_processes` exports a batch of processes.
+
+        :returns: the number of rows written.
+        """
+        return write_rows(self.iter_rows(), path, fmt)
+
+    def fetch_index_summary(self, limit: int = None):
+        """
+        Index the finished Hubbard runs and aggregate their parameters for the elements of this result.
+
+        :param limit: the maximum number of runs to index, the rest are indexed on the next call.
+        """
+        index = get_hubbard_index()
+        index.update(limit=limit)
+        symbols = sorted(set(np.asarray(self.structure_arrays['symbols']).tolist()))
+        self.index_summary = index.aggregate(symbol=symbols)
+
+    def fetch_process_tree(self, process=None) -> ProcessTree:
+        """Return every process called by the workflow, fetched with a fixed number of queries."""
+        return ProcessTree.fetch(process or self.fetch_process_node(), input_labels=['hp__hubbard_structure'])
+
+    def _get_trace(self, process) -> dict:
+        """Return the iteration trace of the Hubbard work chain of the process."""
+        tree = self.fetch_process_tree(process)
+        if process.process_label in HUBBARD_PROCESS_LABELS:
+            workchain = process
         else:
-            self.hubbard_structure = process.outputs.hp.hubbard_structure
-        self.table_data = self._generate_table_data(self.hubbard_structure)
+            pks = [pk for label in HUBBARD_PROCESS_LABELS for pk in tree.find(label)]
+            if not pks:
+                return {'tolerance_onsite': None, 'tolerance_intersite': None, 'iterations': []}
+            workchain = orm.load_node(pks[0])
+        return get_iteration_trace(workchain, tree)
 
-    def _generate_table_data(self, structure: orm.StructureData) -> list:
+    def _generate_table_data(self, structure: orm.StructureData) -> dict:
         """
-        Build a 2D list (header + rows) describing the final Hubbard parameters.
+        Build the table (columns + rows) describing the final Hubbard parameters.
         """
-        columns = [
-            {'field': 'hubbard_type', 'headerName': 'Hubbard type', 'editable': False},
-            {'field': 'atom_manifold_i', 'headerName': 'Kind-Manifold (I)', 'editable': False},
-            {'field': 'atom_manifold_j', 'headerName': 'Kind-Manifold (J)', 'editable': False},
-            {'field': 'atom_index_i', 'headerName': 'Index (I)', 'editable': False},
-            {'field': 'atom_index_j', 'headerName': 'Index (J)', 'editable': False},
-            {'field': 'value', 'headerName': 'Value (eV)', 'editable': False},
-            {'field': 'translation', 'headerName': 'Translation vector', 'editable': False},
-            {'field': 'distance', 'headerName': 'Distance (Å)', 'editable': False},
-        ]
-        hubbard = structure.hubbard.dict()['parameters']
-        natoms = len(structure.sites)
-        data = []
-
-        for site in hubbard:
-            kind_i = structure.sites[site['atom_index']].kind_name
-            kind_j = structure.sites[site['neighbour_index']].kind_name
-
-            index_i = site['atom_index'] + 1
-            # Use the utility to get the supercell index:
-            index_j = (
-                get_supercell_atomic_index(
-                    site['neighbour_index'], natoms, site['translation']
-                )
-                + 1
-            )
-
-            # Compute distance including the supercell translation:
-            distance = np.linalg.norm(
-                structure.sites[site['neighbour_index']].position
-                + np.dot(site['translation'], structure.cell)
-                - structure.sites[site['atom_index']].position
-            )
-            distance = round(distance, 2)
-
-            value = round(site['value'], 2)
-
-            data.append(
-                {
-                    'hubbard_type': site['hubbard_type'],
-                    'atom_manifold_i': f"{kind_i}-{site['atom_manifold']}",
-                    'atom_manifold_j': f"{kind_j}-{site['neighbour_manifold']}",
-                    'atom_index_i': index_i,
-                    'atom_index_j': index_j,
-                    'value': value,
-                    'translation': site['translation'],
-                    'distance': distance,
-                }
-            )
-
-        return {'columns': columns, 'data': data}
+        return generate_table_data(structure)
@@ -0,0 +1,139 @@
+"""Bulk provenance fetch of the processes called by an HP workflow."""
+from collections import defaultdict
+
+import numpy as np
+from aiida import orm
+from aiida.common.links import LinkType
+
+# Attributes projected for every called process
+PROCESS_FIELDS = (
+    'id',
+    'node_type',
+    'attributes.process_label',
+    'attributes.exit_status',
+    'ctime',
+    'mtime',
+    'attributes.resources',
+    'attributes.last_job_info',
+)
+
+_CALL_LINKS = (LinkType.CALL_CALC.value, LinkType.CALL_WORK.value)
+_OUTPUT_LINKS = (LinkType.CREATE.value, LinkType.RETURN.value)
+
+
+class ProcessTree:
+    """
+    The processes called by a workflow, directly or indirectly, held as columns.
+
+    The tree is fetched with one projected `QueryBuilder` query per level of the call
+    tree, plus one for the output links and one for the input links, so the number of
+    queries does not depend on the number of processes. No node is loaded.
+
+    Columns, indexed by row: `pk`, `caller` (pk of the calling process), `link_label`
+    (the call link label), `process_label`, `exit_status`, `is_calculation`, `ctime`,
+    `mtime` (POSIX timestamps), `resources` and `last_job_info` (serialized dicts).
+    """
+
+    def __init__(self, root: int, columns: dict, outputs: dict = None, inputs: dict = None):
+        self.root = root
+        self.columns = columns
+        self._row = {pk: row for row, pk in enumerate(columns['pk'].tolist())}
+        self._children = defaultdict(list)
+        for row, caller in enumerate(columns['caller'].tolist()):
+            self._children[caller].append(row)
+        self.outputs = outputs or {}
+        self.inputs = inputs or {}
+
+    @classmethod
+    def fetch(cls, process, input_labels=None) -> 'ProcessTree':
+        """
+        Fetch the processes called by `process` and their links.
+
+        :param process: the root process node or its pk.
+        :param input_labels: optional list of input link labels to fetch; all output
+            links are fetched, but input links only when requested.
+        """
+        root = process if isinstance(process, int) else process.pk
+        rows = []
+        frontier = [root]
+        while frontier:
+            query = orm.QueryBuilder()
+            query.append(orm.ProcessNode, filters={'id': {'in': frontier}}, tag='caller', project=['id'])
+            query.append(
+                orm.ProcessNode,
+                with_incoming='caller',
+                edge_filters={'type': {'in': _CALL_LINKS}},
+                edge_project=['label'],
+                project=list(PROCESS_FIELDS),
+            )
+            level = query.all()
+            rows.extend(level)
+            # Rows are the caller pk, the `PROCESS_FIELDS` and the call link label
+            frontier = [row[1] for row in level]
+        if rows:
+            caller, pk, node_type, process_label, exit_status, ctime, mtime, resources, job_info, label = zip(*rows)
+        else:
+            caller = pk = node_type = process_label = exit_status = ctime = mtime = resources = job_info = label = ()
+        columns = {
+            'pk': np.array(pk, dtype=int),
+            'caller': np.array(caller, dtype=int),
+            'link_label': np.array(label, dtype=object),
+            'process_label': np.array(process_label, dtype=object),
+            'exit_status': np.array([-1 if status is None else status for status in exit_status], dtype=int),
+            'is_calculation': np.array([kind.startswith('process.calculation.') for kind in node_type], dtype=bool),
+            'ctime': np.array([time.timestamp() for time in ctime], dtype=float),
+            'mtime': np.array([time.timestamp() for time in mtime], dtype=float),
+            'resources': np.array(resources, dtype=object),
+            'last_job_info': np.array(job_info, dtype=object),
+        }
+        pks = [root, *columns['pk'].tolist()]
+        outputs = cls._fetch_links(pks, 'with_incoming', {'type': {'in': _OUTPUT_LINKS}})
+        inputs = {}
+        if input_labels:
+            inputs = cls._fetch_links(pks, 'with_outgoing', {'label': {'in': list(input_labels)}})
+        return cls(root, columns, outputs, inputs)
+
+    @staticmethod
+    def _fetch_links(pks: list, relationship: str, edge_filters: dict) -> dict:
+        """Return a dict mapping each process pk to its links, as a dict of link label to data pk."""
+        links = defaultdict(dict)
+        if not pks:
+            return links
+        query = orm.QueryBuilder()
+        query.append(orm.ProcessNode, filters={'id': {'in': pks}}, tag='process', project=['id'])
+        query.append(orm.Data, **{relationship: 'process'}, edge_filters=edge_filters, edge_project=['label'],
+                     project=['id'])
+        for process, data, label in query.iterall():
+            links[process][label] = data
+        return links
+
+    def __len__(self):
+        return len(self.columns['pk'])
+
+    def __contains__(self, pk):
+        return pk == self.root or pk in self._row
+
+    def row(self, pk: int) -> dict:
+        """Return the columns of one process as a dict."""
+        row = self._row[pk]
+        return {field: values[row] for field, values in self.columns.items()}
+
+    def children(self, pk: int = None) -> list:
+        """Return the rows of the processes called directly by `pk`, the root by default."""
+        return list(self._children[self.root if pk is None else pk])
+
+    def descendants(self, pk: int, calculations_only: bool = False) -> list:
+        """Return the rows of the processes called by `pk`, directly or indirectly."""
+        rows = []
+        stack = self.children(pk)
+        while stack:
+            row = stack.pop()
+            rows.append(row)
+            stack.extend(self._children[int(self.columns['pk'][row])])
+        if calculations_only:
+            rows = [row for row in rows if self.columns['is_calculation'][row]]
+        return sorted(rows)
+
+    def find(self, process_label: str) -> list:
+        """Return the pks of the processes with the given process label."""
+        return self.columns['pk'][self.columns['process_label'] == process_label].tolist()
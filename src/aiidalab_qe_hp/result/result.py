@@ -1,29 +1,90 @@
 # hp_results_panel.py
 
+import base64
+import importlib.util
+import tempfile
+from pathlib import Path
+
 import ipywidgets as ipw
 import numpy as np
+from ase import Atoms
 from aiidalab_qe.common.panel import ResultsPanel
 from weas_widget import WeasWidget
 
 # Suppose you have your own custom table widget:
 from table_widget import TableWidget
+from .export import EXPORT_FORMATS
 from .model import HpResultsModel
+from .structure import tile_supercell
+from .table import TABLE_COLUMNS, TableRowSource
+from .trace import format_trace
 
 class HpResultsPanel(ResultsPanel[HpResultsModel]):
     """The 'View/Controller' for displaying HP results.
     """
 
+    # Number of rows sent to the table widget at a time, one of the page sizes it offers.
+    page_size = 25
+    # If set, the viewer only shows the atoms within this distance (Å) of the
+    # original cell instead of the full 3x3x3 supercell.
+    supercell_cutoff = None
+    # Number of finished runs indexed per click of the comparison button.
+    index_batch_size = 500
+
     def _render(self):
         self._model.fetch_result()
-        self.hubbard_structure = self._model.hubbard_structure
+        self.structure_arrays = self._model.structure_arrays
 
-        self.result_table = TableWidget()
+        # Only the visible page of rows is synced to the browser; sorting and
+        # filtering are done on the server-side row source.
+        self._row_source = TableRowSource(self._model.table_columns)
+        self._page = 0
+        self.result_table = TableWidget(config={'pageSize': self.page_size})
         self.result_table.from_data(
-            self._model.table_data['data'],
-            columns=self._model.table_data['columns']
+            self._row_source.window(0, self.page_size),
+            columns=TABLE_COLUMNS
         )
         self.result_table.observe(self.on_single_row_select, 'selectedRowId')
 
+        self.sort_by = ipw.Dropdown(
+            options=[('-', None)] + [
+                (column['headerName'], column['field'])
+                for column in TABLE_COLUMNS
+            ],
+            description='Sort by:',
+            layout=ipw.Layout(width='250px'),
+        )
+        self.sort_descending = ipw.Checkbox(description='Descending', indent=False)
+        self.filter_text = ipw.Text(
+            placeholder='Filter by type or kind-manifold',
+            continuous_update=False,
+        )
+        for widget in (self.sort_by, self.sort_descending, self.filter_text):
+            widget.observe(self._on_query_change, 'value')
+        self.previous_page = ipw.Button(description='Previous', layout=ipw.Layout(width='100px'))
+        self.previous_page.on_click(lambda _: self._show_page(self._page - 1))
+        self.next_page = ipw.Button(description='Next', layout=ipw.Layout(width='100px'))
+        self.next_page.on_click(lambda _: self._show_page(self._page + 1))
+        self.page_info = ipw.HTML()
+        self._show_page(0)
+        formats = [('CSV', 'csv'), ('JSON Lines', 'jsonl')]
+        if importlib.util.find_spec('pyarrow') is not None:
+            formats.append(('Parquet', 'parquet'))
+        self.export_format = ipw.Dropdown(options=formats, value='csv', layout=ipw.Layout(width='130px'))
+        self.download_button = ipw.Button(
+            description='Download', icon='download', layout=ipw.Layout(width='120px')
+        )
+        self.download_button.on_click(self._on_download_click)
+        self.download_link = ipw.Output()
+        table_controls = ipw.HBox([
+            self.sort_by,
+            self.sort_descending,
+            self.filter_text,
+            self.previous_page,
+            self.next_page,
+            self.page_info,
+        ])
+
         guiConfig = {
             'components': {
                 'enabled': True,
@@ -64,14 +125,47 @@ class HpResultsPanel(ResultsPanel[HpResultsModel]):
             layout=ipw.Layout(margin='0 0 20px 0'),
         )
 
-        self._update_structure(self.hubbard_structure)
+        self._update_structure(self.structure_arrays)
+        timeline_help = ipw.HTML(
+            """
+            <div style='margin: 10px 0;'>
+                <h4 style='margin-bottom: 5px; color: #3178C6;'>Iterations</h4>
+                <p style='margin: 5px 0; font-size: 14px;'>
+                    Wall time of the relax, scf and hp stages of each iteration, and the
+                    largest change of U and V; &#10003; marks a change within the tolerance.
+                </p>
+            </div>
+            """
+        )
+        self.timeline = ipw.HTML(format_trace(self._model.trace))
+        index_help = ipw.HTML(
+            """
+            <div style='margin: 10px 0;'>
+                <h4 style='margin-bottom: 5px; color: #3178C6;'>Other runs</h4>
+                <p style='margin: 5px 0; font-size: 14px;'>
+                    Statistics of the converged parameters of all the finished Hubbard runs
+                    of this profile, for the elements of this structure.
+                </p>
+            </div>
+            """
+        )
+        self.index_button = ipw.Button(description='Compare with other runs', layout=ipw.Layout(width='220px'))
+        self.index_button.on_click(self._on_index_click)
+        self.index_summary = ipw.HTML()
         self.output = ipw.HTML('HP results are ready.')
 
         self.children = [
             ipw.VBox(
                 children=[
-                    ipw.VBox([table_help, self.result_table]),
+                    ipw.VBox([
+                        table_help,
+                        table_controls,
+                        self.result_table,
+                        ipw.HBox([self.export_format, self.download_button, self.download_link]),
+                    ]),
                     ipw.VBox([structure_help, self.structure_view]),
+                    ipw.VBox([timeline_help, self.timeline]),
+                    ipw.VBox([index_help, self.index_button, self.index_summary]),
                     self.output,
                 ],
                 layout=ipw.Layout(justify_content='space-between', margin='10px'),
@@ -80,19 +174,97 @@ class HpResultsPanel(ResultsPanel[HpResultsModel]):
 
         self.rendered = True
 
+    def _on_download_click(self, _=None):
+        """Stream the table to a temporary file and send it to the browser as a download."""
+        from IPython.display import Javascript, display
+
+        fmt = self.export_format.value
+        filename = f'hubbard_parameters_{self._model.process_uuid[:8]}{EXPORT_FORMATS[fmt]}'
+        self.download_button.disabled = True
+        try:
+            # The file is only needed until it is encoded, so nothing is left on disk
+            with tempfile.TemporaryDirectory(prefix='aiidalab_qe_hp_export_') as directory:
+                path = Path(directory) / filename
+                self._model.export(path, fmt)
+                payload = base64.b64encode(path.read_bytes()).decode()
+        finally:
+            self.download_button.disabled = False
+        # Same as the download buttons of the QE app, which also work in Voila
+        self.download_link.clear_output()
+        with self.download_link:
+            display(Javascript(f"""
+                var link = document.createElement('a');
+                link.href = 'data:application/octet-stream;base64,{payload}';
+                link.download = '{filename}';
+                document.body.appendChild(link);
+                link.click();
+                document.body.removeChild(link);
+            """))
+
+    def _on_index_click(self, _=None):
+        self.index_button.disabled = True
+        self.index_summary.value = 'Indexing the finished runs...'
+        try:
+            self._model.fetch_index_summary(limit=self.index_batch_size)
+        finally:
+            self.index_button.disabled = False
+        self.index_summary.value = self._format_index_summary(self._model.index_summary)
+
+    @staticmethod
+    def _format_index_summary(groups):
+        """Return the statistics of the indexed parameters as an HTML table."""
+        if not groups:
+            return 'No finished runs with Hubbard parameters for these elements.'
+        rows = []
+        for group in groups:
+            pair = f"{group['symbol_i']}-{group['manifold_i']}"
+            neighbour = '' if group['onsite'] else f"{group['symbol_j']}-{group['manifold_j']}"
+            rows.append(
+                f"<tr><td>{'U' if group['onsite'] else 'V'}</td><td>{pair}</td><td>{neighbour}</td>"
+                f"<td>{group['runs']}</td><td>{group['mean']:.2f} &plusmn; {group['std']:.2f}</td>"
+                f"<td>{group['min']:.2f} &ndash; {group['max']:.2f}</td></tr>"
+            )
+        return (
+            '<table style="width:100%"><tr><th>Type</th><th>Element-Manifold (I)</th>'
+            '<th>Element-Manifold (J)</th><th>Runs</th><th>Mean (eV)</th><th>Range (eV)</th></tr>'
+            + ''.join(rows) + '</table>'
+        )
+
+    def _on_query_change(self, _=None):
+        self._row_source.query(
+            sort_by=self.sort_by.value,
+            descending=self.sort_descending.value,
+            text=self.filter_text.value.strip(),
+        )
+        self._show_page(0)
+
+    def _show_page(self, page):
+        """Send a single page of rows of the current query to the table widget."""
+        num_pages = max((len(self._row_source) - 1) // self.page_size + 1, 1)
+        self._page = min(max(page, 0), num_pages - 1)
+        start = self._page * self.page_size
+        self.result_table.data = self._row_source.window(start, start + self.page_size)
+        self.previous_page.disabled = self._page == 0
+        self.next_page.disabled = self._page == num_pages - 1
+        self.page_info.value = (
+            f'Page {self._page + 1} of {num_pages} ({len(self._row_source)} rows)'
+        )
+
     def on_single_row_select(self, change):
         """Highlight the corresponding atoms in the 3D viewer.
         """
-        if change['new'] is not None:
-            row_index = int(change['new'])
-            atom_index_i = self.result_table.data[row_index]['atom_index_i']
-            atom_index_j = self.result_table.data[row_index]['atom_index_j']
-            self.structure_view.avr.selected_atoms_indices = [atom_index_i - 1, atom_index_j - 1]
+        if change['new'] is not None and change['new'] >= 0:
+            row = self._row_source.row(int(change['new']))
+            atom_index_i = row['atom_index_i']
+            atom_index_j = row['atom_index_j']
+            self.structure_view.avr.selected_atoms_indices = self._get_viewer_indices(
+                [atom_index_i - 1, atom_index_j - 1]
+            )
 
             # Reposition the camera:
-            self.structure_view.camera.look_at = self.hubbard_structure.sites[
+            self.structure_view.camera.look_at = self.structure_arrays['positions'][
                 atom_index_i - 1
-            ].position
+            ].tolist()
 
             # If this is the first time, trigger a resize event in the viewer
             if not self.structure_view_ready:
@@ -107,28 +279,32 @@ class HpResultsPanel(ResultsPanel[HpResultsModel]):
                 )
                 self.structure_view_ready = True
 
-    def _update_structure(self, hubbard_structure):
+    def _get_viewer_indices(self, supercell_indices):
+        """Map supercell indices to the atoms shown in the viewer, skipping hidden ones."""
+        positions = np.searchsorted(self._supercell_indices, supercell_indices)
+        return [
+            int(position)
+            for position, index in zip(positions, supercell_indices)
+            if position < len(self._supercell_indices) and self._supercell_indices[position] == index
+        ]
+
+    def _update_structure(self, structure_arrays):
         """
         Build a large supercell around the original structure for
         better visualization, and load it into the 3D viewer.
         """
-        atoms0 = hubbard_structure.get_ase()
-        atoms = atoms0.copy()
-        # Translate 1 unit cell in +x,+y,+z
-        atoms.translate(np.dot([1, 1, 1], atoms.cell))
-
-        # Now replicate the structure in a 3x3x3 grid:
-        for i in range(-1, 2):
-            for j in range(-1, 2):
-                for k in range(-1, 2):
-                    if i == 0 and j == 0 and k == 0:
-                        continue
-                    atoms_copy = atoms0.copy()
-                    atoms_copy.translate(np.dot([i + 1, j + 1, k + 1], atoms0.cell))
-                    atoms.extend(atoms_copy)
-
-        # Expand the cell to 3× the original in each lattice direction
-        atoms.cell = np.array([3 * atoms.cell[c] for c in range(3)])
+        positions, self._supercell_indices = tile_supercell(
+            structure_arrays['positions'],
+            structure_arrays['cell'],
+            cutoff=self.supercell_cutoff,
+        )
+        atoms = Atoms(
+            symbols=np.tile(structure_arrays['symbols'], 27)[self._supercell_indices].tolist(),
+            positions=positions,
+            # Expand the cell to 3× the original in each lattice direction
+            cell=3 * np.asarray(structure_arrays['cell']),
+            pbc=structure_arrays['pbc'],
+        )
 
         self.structure_view.from_ase(atoms)
         self.structure_view.avr.model_style = 1
@@ -0,0 +1,40 @@
+# hp_results_structure.py
+
+import numpy as np
+from aiida_quantumespresso.utils.hubbard import QE_TRANSLATIONS
+
+# Translations of the 27 images, in the order of the QuantumESPRESSO supercell loop,
+# so that atom `i` of image `n` has the supercell index `i + n * natoms`.
+_TRANSLATIONS = np.array(QE_TRANSLATIONS, dtype=float)
+
+
+def tile_supercell(positions, cell, cutoff: float = None):
+    """
+    Tile a unit cell into the 3x3x3 supercell used by the HP results viewer.
+
+    All 27 images are built with a single broadcasted operation. The supercell origin
+    is shifted by one cell vector in each direction, so the original cell sits in
+    the middle and keeps the first `natoms` indices.
+
+    :param positions: (natoms, 3) Cartesian positions of the unit cell.
+    :param cell: (3, 3) cell vectors.
+    :param cutoff: if given, only keep the atoms within this distance (Å) of the faces
+        of the original cell; the full 27x supercell is returned otherwise.
+    :returns: tuple of the (M, 3) supercell positions and the (M,) supercell indices of
+        the returned atoms, i.e. their index in the full 27x supercell.
+    """
+    positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+    cell = np.asarray(cell, dtype=float)
+    shifts = (_TRANSLATIONS + 1) @ cell
+    supercell = (positions[None, :, :] + shifts[:, None, :]).reshape(-1, 3)
+    indices = np.arange(len(supercell))
+    if cutoff is None:
+        return supercell, indices
+
+    # Keep the atoms inside the slab of width `cutoff` around each pair of cell faces:
+    # the margin in fractional coordinates is the cutoff over the interplanar spacing.
+    fractional = (supercell - cell.sum(axis=0)) @ np.linalg.inv(cell)
+    margin = cutoff * np.linalg.norm(np.linalg.inv(cell), axis=0)
+    mask = np.all((fractional >= -margin - 1e-8) & (fractional < 1 + margin + 1e-8), axis=1)
+    mask[: len(positions)] = True
+    return supercell[mask], indices[mask]
@@ -0,0 +1,154 @@
+# hp_results_table.py
+
+import numpy as np
+from aiida_quantumespresso.utils.hubbard import QE_TRANSLATIONS
+
+TABLE_COLUMNS = [
+    {'field': 'hubbard_type', 'headerName': 'Hubbard type', 'editable': False},
+    {'field': 'atom_manifold_i', 'headerName': 'Kind-Manifold (I)', 'editable': False},
+    {'field': 'atom_manifold_j', 'headerName': 'Kind-Manifold (J)', 'editable': False},
+    {'field': 'atom_index_i', 'headerName': 'Index (I)', 'editable': False},
+    {'field': 'atom_index_j', 'headerName': 'Index (J)', 'editable': False},
+    {'field': 'value', 'headerName': 'Value (eV)', 'editable': False},
+    {'field': 'translation', 'headerName': 'Translation vector', 'editable': False},
+    {'field': 'distance', 'headerName': 'Distance (Å)', 'editable': False},
+]
+
+# Lookup table (shifted by +1) from a translation vector to its position in the
+# QuantumESPRESSO 3x3x3 supercell loop, i.e. a vectorized `QE_TRANSLATIONS.index`.
+_QE_TRANSLATION_INDEX = np.full((3, 3, 3), -1, dtype=int)
+for _number, _translation in enumerate(QE_TRANSLATIONS):
+    _QE_TRANSLATION_INDEX[tuple(np.asarray(_translation) + 1)] = _number
+
+
+def get_hubbard_arrays(structure) -> dict:
+    """
+    Extract the structure and Hubbard parameters of a `HubbardStructureData` into NumPy arrays.
+
+    `structure.sites` rebuilds every site on each access, so it is read exactly once here.
+    """
+    sites = structure.sites
+    kind_symbols = {kind.name: kind.symbol for kind in structure.kinds}
+    parameters = structure.hubbard.dict()['parameters']
+    return {
+        'cell': np.asarray(structure.cell, dtype=float),
+        'pbc': np.asarray(structure.pbc, dtype=bool),
+        'kind_names': np.array([site.kind_name for site in sites], dtype=str),
+        'symbols': np.array([kind_symbols[site.kind_name] for site in sites], dtype=str),
+        'positions': np.array([site.position for site in sites], dtype=float).reshape(-1, 3),
+        'atom_index': np.array([p['atom_index'] for p in parameters], dtype=int),
+        'neighbour_index': np.array([p['neighbour_index'] for p in parameters], dtype=int),
+        'translation': np.array([p['translation'] for p in parameters], dtype=int).reshape(-1, 3),
+        'atom_manifold': np.array([p['atom_manifold'] for p in parameters], dtype=str),
+        'neighbour_manifold': np.array([p['neighbour_manifold'] for p in parameters], dtype=str),
+        'hubbard_type': np.array([p['hubbard_type'] for p in parameters], dtype=str),
+        'value': np.array([p['value'] for p in parameters], dtype=float),
+    }
+
+
+def _round(values: np.ndarray, digits: int) -> np.ndarray:
+    """Round as Python's `round`, which `np.round` does not match, e.g. 2.675 to 2.67 rather than 2.68."""
+    return np.array([round(value, digits) for value in values.tolist()], dtype=float)
+
+
+def compute_table_columns(arrays: dict) -> dict:
+    """
+    Compute every table column in one vectorized pass over the Hubbard arrays.
+
+    Returns a dict mapping each field of `TABLE_COLUMNS` to a NumPy array.
+    """
+    atom_index = arrays['atom_index']
+    neighbour_index = arrays['neighbour_index']
+    translation = arrays['translation']
+    kind_names = arrays['kind_names']
+    positions = arrays['positions']
+    natoms = len(kind_names)
+
+    supercell_number = _QE_TRANSLATION_INDEX[tuple((translation + 1).T)]
+    if (supercell_number < 0).any():
+        raise ValueError('Translation vectors must lie within the 3x3x3 supercell.')
+
+    vectors = positions[neighbour_index] + translation @ arrays['cell'] - positions[atom_index]
+    return {
+        'hubbard_type': arrays['hubbard_type'],
+        'atom_manifold_i': np.char.add(np.char.add(kind_names[atom_index], '-'), arrays['atom_manifold']),
+        'atom_manifold_j': np.char.add(np.char.add(kind_names[neighbour_index], '-'), arrays['neighbour_manifold']),
+        'atom_index_i': atom_index + 1,
+        'atom_index_j': neighbour_index + supercell_number * natoms + 1,
+        'value': _round(arrays['value'], 2),
+        'translation': translation,
+        'distance': _round(np.linalg.norm(vectors, axis=1), 2),
+    }
+
+
+def iter_table_rows(columns: dict, start: int = 0, stop: int = None):
+    """Yield the table rows in ``[start, stop)`` as plain dicts of Python objects."""
+    fields = [column['field'] for column in TABLE_COLUMNS]
+    values = [columns[field][start:stop].tolist() for field in fields]
+    translations = fields.index('translation')
+    values[translations] = [tuple(translation) for translation in values[translations]]
+    for row in zip(*values):
+        yield dict(zip(fields, row))
+
+
+def build_table_data(arrays: dict) -> dict:
+    """Build the ``{'columns', 'data'}`` table from the arrays of `get_hubbard_arrays`."""
+    return {'columns': TABLE_COLUMNS, 'data': list(iter_table_rows(compute_table_columns(arrays)))}
+
+
+def generate_table_data(structure) -> dict:
+    """Build the ``{'columns', 'data'}`` table of the final Hubbard parameters."""
+    return build_table_data(get_hubbard_arrays(structure))
+
+
+class TableRowSource:
+    """
+    Server-side source of result table rows.
+
+    The rows are held as columns; sorting and filtering only reorder an index array,
+    and a view requests just the window of rows it displays via `window`.
+    """
+
+    _text_fields = ('hubbard_type', 'atom_manifold_i', 'atom_manifold_j')
+
+    def __init__(self, columns: dict):
+        self.fields = [column['field'] for column in TABLE_COLUMNS]
+        self._columns = {field: np.asarray(columns[field]) for field in self.fields}
+        self._columns['translation'] = self._columns['translation'].reshape(-1, 3)
+        self._order = np.arange(len(self._columns['value']))
+
+    def __len__(self):
+        return len(self._order)
+
+    def query(self, sort_by: str = None, descending: bool = False, text: str = ''):
+        """Select the rows whose text columns contain `text`, ordered by the `sort_by` column."""
+        mask = np.ones(len(self._columns['value']), dtype=bool)
+        if text:
+            text = text.lower()
+            mask[:] = False
+            for field in self._text_fields:
+                mask |= np.char.find(np.char.lower(self._columns[field].astype(str)), text) >= 0
+        order = np.flatnonzero(mask)
+        if sort_by is not None:
+            column = self._columns[sort_by][order]
+            if sort_by == 'translation':
+                keys = np.lexsort(column.T[::-1])
+            else:
+                keys = np.argsort(column, kind='stable')
+            if descending:
+                keys = keys[::-1]
+            order = order[keys]
+        self._order = order
+
+    def window(self, start: int, stop: int) -> list:
+        """Return the rows in ``[start, stop)`` of the current query, with their row `id`."""
+        indices = self._order[start:stop]
+        columns = {field: self._columns[field][indices] for field in self.fields}
+        return [
+            {'id': row_id, **row} for row_id, row in zip(indices.tolist(), iter_table_rows(columns))
+        ]
+
+    def row(self, row_id: int) -> dict:
+        """Return a single row by its `id`."""
+        columns = {field: self._columns[field][row_id : row_id + 1] for field in self.fields}
+        return next(iter_table_rows(columns))
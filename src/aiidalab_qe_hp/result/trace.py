@@ -0,0 +1,159 @@
+"""Per-iteration convergence and timing trace of a self-consistent Hubbard run."""
+import re
+
+import numpy as np
+
+STAGES = ('relax', 'scf', 'hp')
+
+_LABEL = re.compile(r'iteration_(\d+)_(relax|scf|hp)')
+
+
+def parse_call_label(label: str):
+    """Return the iteration and stage of a `SelfConsistentHubbardWorkChain` call link label, or `None`."""
+    match = _LABEL.match(label or '')
+    if match is None:
+        return None
+    return int(match.group(1)), match.group(2)
+
+
+def get_hubbard_deltas(old: list, new: list) -> tuple:
+    """
+    Return the largest change of the on-site and inter-site Hubbard values.
+
+    The parameters are compared in order, as in the convergence check of the
+    `SelfConsistentHubbardWorkChain`; `None` is returned for both when the number of
+    parameters differs, as at the first iteration, and for the inter-site change
+    when there are no inter-site parameters.
+    """
+    if len(old) != len(new) or not old:
+        return None, None
+    old = np.array([parameter[4] for parameter in old], dtype=float)
+    new_values = np.array([parameter[4] for parameter in new], dtype=float)
+    onsite = np.array([p[0] == p[2] and p[1] == p[3] for p in new], dtype=bool)
+    diff = np.abs(new_values - old)
+    return (
+        float(diff[onsite].max()) if onsite.any() else None,
+        float(diff[~onsite].max()) if (~onsite).any() else None,
+    )
+
+
+def get_job_times(job_info: dict, resources: dict, elapsed: float) -> dict:
+    """
+    Return the queue and CPU time (s) of a finished calculation.
+
+    The queue time is taken from the serialized last scheduler job info, when the
+    scheduler reports the submission and dispatch times. The CPU time is the reported
+    one, or otherwise the `elapsed` time outside the queue times the number of cores.
+    """
+    from aiida.schedulers.datastructures import JobInfo
+
+    info = JobInfo.load_from_dict(job_info) if job_info else None
+    queue = 0.0
+    if info is not None and info.submission_time and info.dispatch_time:
+        queue = max((info.dispatch_time - info.submission_time).total_seconds(), 0.0)
+    cpu = info.cpu_time if info is not None and info.cpu_time else None
+    if cpu is None:
+        resources = resources or {}
+        cores = resources.get('num_cpus') or (
+            resources.get('num_machines', 1)
+            * resources.get('num_mpiprocs_per_machine', 1)
+            * resources.get('num_cores_per_mpiproc', 1)
+        )
+        cpu = max(elapsed - queue, 0.0) * cores
+    return {'queue': queue, 'cpu': float(cpu)}
+
+
+def get_iteration_trace(workchain, tree=None) -> dict:
+    """
+    Return the per-iteration trace of a `SelfConsistentHubbardWorkChain`.
+
+    For every iteration, the largest change of the Hubbard values computed by hp.x with
+    respect to its input, and the wall, queue and CPU time (s) spent in each of `STAGES`.
+    The wall time of a stage is the elapsed time of its work chain, so the parallel hp.x
+    jobs are counted once; queue and CPU time are summed over its calculations.
+
+    :param tree: a `ProcessTree` containing the work chain, fetched if not given. Only the
+        input and output Hubbard structures of the hp.x stages are loaded as nodes.
+    :returns: dict with the `tolerance_onsite`, `tolerance_intersite` and the list of
+        `iterations`.
+    """
+    from aiida.orm import load_node
+
+    from .provenance import ProcessTree
+
+    if tree is None or workchain.pk not in tree:
+        tree = ProcessTree.fetch(workchain, input_labels=['hp__hubbard_structure'])
+    columns = tree.columns
+    iterations = {}
+    # In call order, so that the last hp.x run of an iteration, e.g. on the finest q-point mesh, is kept
+    for child in sorted(tree.children(workchain.pk), key=lambda row: columns['pk'][row]):
+        parsed = parse_call_label(columns['link_label'][child])
+        if parsed is None:
+            continue
+        number, stage = parsed
+        iteration = iterations.setdefault(number, {
+            'iteration': number,
+            'delta_onsite': None,
+            'delta_intersite': None,
+            'stages': {},
+        })
+        times = iteration['stages'].setdefault(stage, {'wall': 0.0, 'queue': 0.0, 'cpu': 0.0})
+        times['wall'] += columns['mtime'][child] - columns['ctime'][child]
+        for row in tree.descendants(int(columns['pk'][child]), calculations_only=True):
+            job_times = get_job_times(
+                columns['last_job_info'][row], columns['resources'][row], columns['mtime'][row] - columns['ctime'][row]
+            )
+            for key, value in job_times.items():
+                times[key] += value
+        pk = int(columns['pk'][child])
+        if stage == 'hp' and columns['exit_status'][child] == 0:
+            old = load_node(tree.inputs[pk]['hp__hubbard_structure']).hubbard.to_list()
+            new = load_node(tree.outputs[pk]['hubbard_structure']).hubbard.to_list()
+            iteration['delta_onsite'], iteration['delta_intersite'] = get_hubbard_deltas(old, new)
+    return {
+        'tolerance_onsite': _get_value(workchain, 'tolerance_onsite'),
+        'tolerance_intersite': _get_value(workchain, 'tolerance_intersite'),
+        'iterations': [iterations[number] for number in sorted(iterations)],
+    }
+
+
+def _get_value(workchain, name):
+    return workchain.inputs[name].value if name in workchain.inputs else None
+
+
+def format_trace(trace: dict) -> str:
+    """Return the trace as a compact HTML timeline, one row per iteration."""
+    iterations = trace['iterations']
+    if not iterations:
+        return ''
+    colors = {'relax': '#8fbc8f', 'scf': '#6495ed', 'hp': '#f4a460'}
+    longest = max(sum(times['wall'] for times in it['stages'].values()) for it in iterations) or 1.0
+    totals = {stage: sum(it['stages'].get(stage, {}).get('cpu', 0.0) for it in iterations) for stage in STAGES}
+
+    def delta(value, tolerance):
+        if value is None:
+            return '-'
+        mark = '&#10003;' if tolerance is not None and value <= tolerance else ''
+        return f'{value:.3f} {mark}'
+
+    rows = []
+    for it in iterations:
+        bars = ''.join(
+            f"<div title='{stage}: {times['wall']:.0f} s wall, {times['queue']:.0f} s queued' "
+            f"style='display:inline-block; height:12px; background:{colors[stage]}; "
+            f"width:{100 * times['wall'] / longest:.1f}%'></div>"
+            for stage, times in sorted(it['stages'].items(), key=lambda item: STAGES.index(item[0]))
+        )
+        rows.append(
+            f"<tr><td>{it['iteration']}</td><td style='width:60%'>{bars}</td>"
+            f"<td>{delta(it['delta_onsite'], trace['tolerance_onsite'])}</td>"
+            f"<td>{delta(it['delta_intersite'], trace['tolerance_intersite'])}</td></tr>"
+        )
+    legend = ' '.join(
+        f"<span style='color:{colors[stage]}'>&#9632;</span> {stage} ({totals[stage] / 3600:.1f} CPU h)"
+        for stage in STAGES
+    )
+    return (
+        '<table style="width:100%"><tr><th>Iteration</th><th>Wall time</th>'
+        '<th>&Delta;U (eV)</th><th>&Delta;V (eV)</th></tr>' + ''.join(rows) + f'</table><div>{legend}</div>'
+    )
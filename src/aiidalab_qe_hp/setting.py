@@ -1,12 +1,16 @@
 # hp_panel.py
+import asyncio
+
 import ipywidgets as ipw
+import numpy as np
 import traitlets as tl
 from aiidalab_qe.common.panel import ConfigurationSettingsPanel
-from aiida.orm import Float, Bool
-from aiida_quantumespresso.calculations.functions.create_kpoints_from_distance import (
-    create_kpoints_from_distance,
-)
+from .cost import estimate_cost, format_cost, get_estimate_symmetry
+from .grid import HUBBARD_U_COLUMNS, HUBBARD_V_COLUMNS, HubbardGrid
 from .model import HPSettingsModel  # import the model you just created
+from .neighbors import get_kind_pair_distances
+from .qpoints import get_qpoints_refinement, get_structure_qpoints_mesh
+from .symmetry import get_kind_symmetry
 
 
 class HPSettingsPanel(ConfigurationSettingsPanel[HPSettingsModel]):
@@ -14,6 +18,10 @@ class HPSettingsPanel(ConfigurationSettingsPanel[HPSettingsModel]):
 
     # Pre-defined HTML help strings:
     one_shot_description = """<div>Single calculation without iterative self-consistent procedure, no structural optimization. </div>"""
+    adaptive_description = (
+        """<div>Single calculation, with hp.x run on coarse q-point meshes first and refined up to the """
+        """selected q-point distance only while U/V change by more than the protocol tolerance. </div>"""
+    )
     self_consistent_description = """<div>Iterative self-consistent procedure, with structural optimization. </div>"""
     dft_u_description = """<div>Only on-site U Hubbard parameter is computed. </div>"""
     dft_u_v_description = """<div>On-site U and inter-site V Hubbard parameters are computed. </div>"""
@@ -21,13 +29,32 @@ class HPSettingsPanel(ConfigurationSettingsPanel[HPSettingsModel]):
     ortho_atomic_description = """<div>Löwdin-orthogonalized atomic orbitals. </div>"""
     relax_description = """<div>Choose between cell relaxation (default) or atomic relaxation.</div>"""
 
+    # Edits arriving within this delay (s) are applied to the model as one change.
+    hubbard_debounce_delay = 0.3
+    # Settings changed within this delay (s) update the cost estimate once.
+    cost_debounce_delay = 0.3
+
     def __init__(self, model: HPSettingsModel, **kwargs):
         super().__init__(model=model, **kwargs)
         self._model = model  # keep a reference
+        # Selected Hubbard entries, keyed by kind (U) or kind pair (V)
+        self._hubbard_entries = {'u': {}, 'v': {}}
+        self._pending_flush = None
+        # True while `_flush_hubbard` writes the entries of the tables to the model
+        self._flushing = False
+        # Element of every kind of the structure the tables were last updated for
+        self._hubbard_kind_symbols = {}
+        # Kinds changed since the V table was built, and the structure UUID and cutoff it was built for
+        self._hubbard_v_changed = set()
+        self._hubbard_v_source = None
+        self._pending_estimate = None
+        # Symmetry data of the structure, for the structure UUID, `merge_kinds` and magnetic moments of the key
+        self._symmetry_key = None
+        self._symmetry_data = {}
 
         # 1) Create your widgets.
         self.method = ipw.Dropdown(
-            options=['one-shot', 'self-consistent'],
+            options=['one-shot', 'adaptive', 'self-consistent'],
             description='Method:',
             style={'description_width': 'initial'},
         )
@@ -70,18 +97,42 @@ class HPSettingsPanel(ConfigurationSettingsPanel[HPSettingsModel]):
             description='Use parallelization over q points.',
             style={'description_width': 'initial'},
         )
+        self.merge_kinds = ipw.Checkbox(
+            description='Merge symmetry-equivalent kinds of the same element, to perturb fewer atoms.',
+            style={'description_width': 'initial'},
+            layout={'width': '600px'},
+        )
+        self.warm_start = ipw.Checkbox(
+            description='Start from the converged values of an earlier run on the same composition.',
+            style={'description_width': 'initial'},
+            layout={'width': '600px'},
+        )
+        self.reuse_charge_density = ipw.Checkbox(
+            description='Also restart from its charge density, for the same structure.',
+            style={'description_width': 'initial'},
+            layout={'width': '600px'},
+        )
 
         # Dynamic U/V table placeholders:
         self.Hubbard_U_title = ipw.HTML(
             """<div style="padding-top: 0px; padding-bottom: 0px">
             <h4>Select atoms for which on-site Hubbard U must be computed</h4></div>"""
         )
-        self.hubbard_u = ipw.VBox()
+        self.hubbard_u = HubbardGrid(HUBBARD_U_COLUMNS, key_fields=('kind',))
+        self.hubbard_u.observe(lambda change: self._on_hubbard_row_update(change, 'u'), 'updatedRow')
         self.Hubbard_V_title = ipw.HTML(
             """<div style="padding-top: 0px; padding-bottom: 0px">
             <h4>Select couples of atoms for which inter-site Hubbard V must be computed</h4></div>"""
         )
-        self.hubbard_v = ipw.VBox()
+        self.hubbard_v_cutoff = ipw.BoundedFloatText(
+            min=0.5,
+            max=10.0,
+            step=0.1,
+            description='Neighbour cutoff (Å):',
+            style={'description_width': 'initial'},
+        )
+        self.hubbard_v = HubbardGrid(HUBBARD_V_COLUMNS, key_fields=('kind_i', 'kind_j'))
+        self.hubbard_v.observe(lambda change: self._on_hubbard_row_update(change, 'v'), 'updatedRow')
 
         #Options RelaxType
         self.relax_type = ipw.Dropdown(
@@ -109,8 +160,24 @@ class HPSettingsPanel(ConfigurationSettingsPanel[HPSettingsModel]):
 
         ipw.link((self._model, 'parallelize_atoms'), (self.parallelize_atoms, 'value'))
         ipw.link((self._model, 'parallelize_qpoints'), (self.parallelize_qpoints, 'value'))
+        ipw.link((self._model, 'merge_kinds'), (self.merge_kinds, 'value'))
+        ipw.link((self._model, 'warm_start'), (self.warm_start, 'value'))
+        ipw.link((self._model, 'reuse_charge_density'), (self.reuse_charge_density, 'value'))
+        # Warm starts only apply to self-consistent cycles
+        for checkbox in (self.warm_start, self.reuse_charge_density):
+            ipw.dlink(
+                (self._model, 'method'),
+                (checkbox.layout, 'display'),
+                lambda method: 'flex' if method == 'self-consistent' else 'none',
+            )
+        ipw.dlink(
+            (self._model, 'warm_start'),
+            (self.reuse_charge_density, 'disabled'),
+            lambda warm_start: not warm_start,
+        )
 
         ipw.link((self._model, 'relax_type'), (self.relax_type, 'value'))
+        ipw.link((self._model, 'hubbard_v_cutoff'), (self.hubbard_v_cutoff, 'value'))
 
         # Example of disabling qpoints_distance if not overridden:
         def _toggle_distance(change):
@@ -119,7 +186,27 @@ class HPSettingsPanel(ConfigurationSettingsPanel[HPSettingsModel]):
 
         # 3) Observe changes in input structure and re-generate table
         self._model.observe(self._update_hubbard_tables, 'input_structure')
-        self._model.observe(self._update_hubbard_tables, 'calculation_type')
+        self._model.observe(self._on_qpoints_distance_change, ['input_structure', 'method'])
+        self._model.observe(
+            self._update_cost_estimate,
+            [
+                'input_structure',
+                'method',
+                'qpoints_distance',
+                'parallelize_atoms',
+                'parallelize_qpoints',
+                'merge_kinds',
+                'spin_type',
+                'moments',
+                'codes',
+                'hubbard_u',
+            ],
+        )
+        self._model.observe(self._update_hubbard_symmetry, ['merge_kinds', 'spin_type', 'moments'])
+        self._model.observe(self._update_hubbard_v, ['calculation_type', 'hubbard_v_cutoff'])
+        self._model.observe(self._on_model_hubbard_change, ['hubbard_u', 'hubbard_v'])
+        # Browser edits still waiting for the debounce are applied before the state is read
+        self._model.on_flush(self._flush_pending_hubbard)
 
         # 4) Arrange them in self.children
         self.children = [
@@ -135,9 +222,12 @@ class HPSettingsPanel(ConfigurationSettingsPanel[HPSettingsModel]):
             ]),
             self.parallelize_atoms,
             self.parallelize_qpoints,
+            self.merge_kinds,
+            self.warm_start,
+            self.reuse_charge_density,
             ipw.VBox(layout=ipw.Layout(border='1px solid black')),
             ipw.VBox(children=[self.Hubbard_U_title, self.hubbard_u]),
-            ipw.VBox(children=[self.Hubbard_V_title, self.hubbard_v]),
+            ipw.VBox(children=[self.Hubbard_V_title, self.hubbard_v_cutoff, self.hubbard_v]),
             self.Info,
         ]
 
@@ -156,8 +246,10 @@ class HPSettingsPanel(ConfigurationSettingsPanel[HPSettingsModel]):
 
     # Sync the short descriptive text below the dropdowns:
     def _sync_method_description(self, _=None):
-        if self.method.value == 'one-shot':
-            self.method_description.value = self.one_shot_description
+        if self.method.value in ('one-shot', 'adaptive'):
+            self.method_description.value = (
+                self.one_shot_description if self.method.value == 'one-shot' else self.adaptive_description
+            )
             #self.relax_type_description.value = ""
             self.relax_type.layout.display = 'none'
         else:
@@ -183,124 +275,266 @@ class HPSettingsPanel(ConfigurationSettingsPanel[HPSettingsModel]):
         if not self._model.input_structure:
             return
         if self.qpoints_distance.value > 0:
-            mesh = create_kpoints_from_distance.process_class._func(
+            mesh = get_structure_qpoints_mesh(
                 self._model.input_structure,
-                Float(self.qpoints_distance.value),
-                Bool(False),
+                self.qpoints_distance.value,
             )
-            self.qpoint_mesh.value = f'Mesh {mesh.get_kpoints_mesh()[0]}'
+            self.qpoint_mesh.value = f'Mesh {list(mesh)} ({int(np.prod(mesh))} q-points)'
+            if self._model.method == 'adaptive':
+                meshes = [
+                    list(get_structure_qpoints_mesh(self._model.input_structure, distance))
+                    for distance in get_qpoints_refinement(self._model.input_structure, self.qpoints_distance.value)
+                ]
+                self.qpoint_mesh.value = f"Meshes {' &rarr; '.join(map(str, meshes))}, refined while U/V change"
         else:
             self.qpoint_mesh.value = 'Please select a number > 0.0'
 
+    def _update_cost_estimate(self, _=None):
+        """Schedule the update of the cost estimate; without an event loop, update it at once."""
+        if self._pending_estimate is not None:
+            self._pending_estimate.cancel()
+            self._pending_estimate = None
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._refresh_cost_estimate()
+            return
+        self._pending_estimate = loop.call_later(self.cost_debounce_delay, self._refresh_cost_estimate)
+
+    def _refresh_cost_estimate(self):
+        """Show the estimated number of jobs and memory of the workflow in the info area."""
+        self._pending_estimate = None
+        structure = self._model.input_structure
+        if not structure or self._model.qpoints_distance <= 0:
+            self.Info.value = ''
+            return
+        state = self._model.get_model_state()
+        moments = self._model.get_magnetic_moments()
+        symmetry = self._get_symmetry_data(
+            'estimate', lambda: get_estimate_symmetry(structure, state['merge_kinds'], moments)
+        )
+        estimate = estimate_cost(structure, state, codes=self._model.codes or None, symmetry=symmetry)
+        self.Info.value = format_cost(estimate)
+
+    def _get_symmetry_data(self, name, compute):
+        """Return the symmetry data `name` of the structure, computed once per structure and kind merging."""
+        moments = self._model.get_magnetic_moments()
+        key = (
+            self._model.input_structure.uuid,
+            self._model.merge_kinds,
+            tuple(sorted(moments.items())) if moments else None,
+        )
+        if key != self._symmetry_key:
+            self._symmetry_key, self._symmetry_data = key, {}
+        if name not in self._symmetry_data:
+            self._symmetry_data[name] = compute()
+        return self._symmetry_data[name]
+
     # Generate or update the “Hubbard U” and “Hubbard V” tables
     def _update_hubbard_tables(self, _=None):
-        self._generate_hubbard_u()
+        """Update the tables to the kinds of the structure, keeping the rows of the unchanged kinds."""
+        structure = self._model.input_structure
+        symbols = {kind.name: kind.symbol for kind in structure.kinds} if structure else {}
+        changed = {name for name, symbol in self._hubbard_kind_symbols.items() if symbols.get(name) != symbol}
+        self._hubbard_kind_symbols = symbols
+        self._hubbard_v_changed |= changed
+        self._generate_hubbard_u(changed)
         self._generate_hubbard_v()
+        self._flush_hubbard()
 
-    def _generate_hubbard_u(self):
-        """Example approach: one row per atomic kind."""
-        self.hubbard_u.children = []  # Clear old
+    def _update_hubbard_v(self, _=None):
+        """Show or hide the V table for the calculation type, leaving the U table untouched."""
+        self._generate_hubbard_v()
+        self._flush_hubbard()
+
+    def _generate_hubbard_u(self, changed=frozenset()):
+        """One row per atomic kind."""
         structure = self._model.input_structure
         if not structure:
+            self._merge_hubbard_rows('u', [])
             return
+        symmetry = self._get_hubbard_symmetry()
+        self._merge_hubbard_rows('u', [
+            {'selected': False, 'kind': kind.name, 'manifold': '', 'value': 0.0, 'symmetry': symmetry[kind.name]}
+            for kind in structure.kinds
+        ], changed)
+
+    def _get_hubbard_symmetry(self) -> dict:
+        """Return the text of the symmetry column of the U table, per kind."""
+        symmetry = self._get_symmetry_data(
+            'kinds',
+            lambda: get_kind_symmetry(
+                self._model.input_structure,
+                merge_kinds=self._model.merge_kinds,
+                magnetic_moments=self._model.get_magnetic_moments(),
+            ),
+        )
+        return {
+            name: (
+                f"merged into {info['merged_into']}"
+                if info['merged_into']
+                else f"{info['sites']} ({info['irreducible']})"
+            )
+            for name, info in symmetry.items()
+        }
 
-        # Table header:
-        header = ipw.HBox([
-            ipw.HTML(value=''),
-            ipw.HTML(value='Atomic Type', layout=ipw.Layout(width='100px')),
-            ipw.HTML(value='Manifold', layout=ipw.Layout(width='100px')),
-            ipw.HTML(value='U value (eV)', layout=ipw.Layout(width='100px')),
-        ])
-        rows = [header]
-
-        # We could store a temporary mapping of widget→(kind_name, manifold_widget, U_widget)
-        # so that we can assemble self._model.hubbard_u list automatically
-        self._hubbard_u_map = {}
-
-        for kind in structure.kinds:
-            kind_name = kind.name
-            checkbox = ipw.Checkbox(value=False, indent=False, layout=ipw.Layout(width='30px'))
-            name_html = ipw.HTML(value=kind_name, layout=ipw.Layout(width='80px'))
-            manifold = ipw.Text(value='', layout=ipw.Layout(width='100px'))
-            u_val = ipw.FloatText(value=0.0, layout=ipw.Layout(width='80px'))
-
-            row = ipw.HBox([checkbox, name_html, manifold, u_val])
-            rows.append(row)
-
-            # For demonstration, whenever these widgets change, we can reassemble into model.hubbard_u
-            def on_change(_=None):
-                self._assemble_hubbard_u()
-            checkbox.observe(on_change, 'value')
-            manifold.observe(on_change, 'value')
-            u_val.observe(on_change, 'value')
-
-            self._hubbard_u_map[kind_name] = (checkbox, manifold, u_val)
-
-        self.hubbard_u.children = rows
+    def _update_hubbard_symmetry(self, _=None):
+        """Refresh the symmetry column of the U table, keeping the user's edits."""
+        if not self._model.input_structure or not self.hubbard_u.data:
+            return
+        symmetry = self._get_hubbard_symmetry()
+        self.hubbard_u.data = [{**row, 'symmetry': symmetry[row['kind']]} for row in self.hubbard_u.data]
 
     def _generate_hubbard_v(self):
-        """Example approach: only if calc_type == 'DFT+U+V', build pairwise table."""
-        self.hubbard_v.children = []
+        """
+        Only if calc_type == 'DFT+U+V', build a table of the neighbouring pairs of kinds.
+
+        The pairs are only searched when the table is shown and the structure or the
+        cutoff changed since it was last built; hiding the table keeps its rows.
+        """
         structure = self._model.input_structure
-        if not structure or self.calculation_type.value != 'DFT+U+V':
+        if not structure:
+            self._merge_hubbard_rows('v', [])
+            self._hubbard_v_changed, self._hubbard_v_source = set(), None
+        if not structure or self._model.calculation_type != 'DFT+U+V':
+            self.hubbard_v.layout.display = 'none'
             return
 
-        header = ipw.HBox([
-            ipw.HTML(value='', layout=ipw.Layout(width='30px')),
-            ipw.HTML(value='Type1', layout=ipw.Layout(width='60px')),
-            ipw.HTML(value='Manif.1', layout=ipw.Layout(width='80px')),
-            ipw.HTML(value='Type2', layout=ipw.Layout(width='60px')),
-            ipw.HTML(value='Manif.2', layout=ipw.Layout(width='80px')),
-            ipw.HTML(value='V value (eV)', layout=ipw.Layout(width='80px')),
-        ])
-        rows = [header]
-        self._hubbard_v_map = {}
-
-        kind_names = [k.name for k in structure.kinds]
-        for i in range(len(kind_names)):
-            for j in range(i + 1, len(kind_names)):
-                kn1 = kind_names[i]
-                kn2 = kind_names[j]
-                checkbox = ipw.Checkbox(value=False, indent=False, layout=ipw.Layout(width='30px'))
-                manif1 = ipw.Text(value='', layout=ipw.Layout(width='80px'))
-                manif2 = ipw.Text(value='', layout=ipw.Layout(width='80px'))
-                v_val = ipw.FloatText(value=0.0, layout=ipw.Layout(width='80px'))
-
-                row = ipw.HBox([checkbox,
-                                ipw.HTML(kn1, layout=ipw.Layout(width='50px')),
-                                manif1,
-                                ipw.HTML(kn2, layout=ipw.Layout(width='50px')),
-                                manif2,
-                                v_val])
-                rows.append(row)
-
-                def on_change(_=None):
-                    self._assemble_hubbard_v()
-                for widget in (checkbox, manif1, manif2, v_val):
-                    widget.observe(on_change, 'value')
-
-                self._hubbard_v_map[(kn1, kn2)] = (checkbox, manif1, manif2, v_val)
-
-        self.hubbard_v.children = rows
-
-    def _assemble_hubbard_u(self):
-        """Rebuild the model.hubbard_u from the checkboxes/text fields."""
-        new_list = []
-        for kind_name, (cb, manifold, u_val) in self._hubbard_u_map.items():
-            if cb.value:  # only if user has "checked" that they want U for this kind
-                new_list.append([kind_name, manifold.value, max(u_val.value, 1e-10)])
-        self._model.hubbard_u = new_list
-
-    def _assemble_hubbard_v(self):
-        """Rebuild the model.hubbard_v from checkboxes/text fields."""
-        new_list = []
-        for (kn1, kn2), (cb, man1, man2, v_val) in self._hubbard_v_map.items():
-            if cb.value:
-                new_list.append([
-                    kn1,
-                    man1.value,
-                    kn2,
-                    man2.value,
-                    max(v_val.value, 1e-10),
-                ])
-        self._model.hubbard_v = new_list
+        self.hubbard_v.layout.display = 'block'
+        cutoff = self._model.hubbard_v_cutoff
+        if self._hubbard_v_source == (structure.uuid, cutoff):
+            return
+        # Only propose pairs of kinds that have neighbours within the cutoff
+        pair_distances = get_kind_pair_distances(structure, cutoff)
+        self._merge_hubbard_rows('v', [
+            {
+                'selected': False,
+                'kind_i': kn1,
+                'manifold_i': '',
+                'kind_j': kn2,
+                'manifold_j': '',
+                'value': 0.0,
+                'distance': round(distance, 2),
+            }
+            for (kn1, kn2), distance in pair_distances.items()
+        ], self._hubbard_v_changed)
+        self._hubbard_v_changed, self._hubbard_v_source = set(), (structure.uuid, cutoff)
+
+    def _merge_hubbard_rows(self, which, rows, changed=frozenset()):
+        """
+        Set the rows of the U or V table, keeping the edits of the rows that are still present.
+
+        Rows of the `changed` kinds are reset. New rows are filled from the entries of the
+        model, e.g. of a loaded state, so the table shows what will be submitted.
+        """
+        grid = self.hubbard_u if which == 'u' else self.hubbard_v
+        model_entries = self._model.hubbard_u if which == 'u' else self._model.hubbard_v
+        kind_fields = model_entries.KIND_FIELDS
+        editable = [column['field'] for column in grid.columns if column['editable']]
+        previous = {grid.key(row): row for row in grid.data}
+        loaded = self._get_model_rows(grid, model_entries)
+        entries = {}
+        for index, row in enumerate(rows):
+            key = grid.key(row)
+            if not changed.intersection(row[field] for field in kind_fields):
+                if key in previous:
+                    row = rows[index] = {**row, **{field: previous[key][field] for field in editable}}
+                elif key in loaded:
+                    row = rows[index] = {**row, **loaded[key], 'selected': True}
+            if row['selected']:
+                entries[key] = self._get_hubbard_entry(which, row)
+        self._hubbard_entries[which] = entries
+        if rows != [{field: value for field, value in row.items() if field != 'id'} for row in grid.data]:
+            grid.set_rows(rows)
+
+    @staticmethod
+    def _get_model_rows(grid, model_entries) -> dict:
+        """Return the entries of the model as partial rows, keyed as the rows of `grid`."""
+        rows = [dict(zip(model_entries.FIELDS, entry)) for entry in model_entries]
+        return {grid.key(row): row for row in rows}
+
+    def _on_model_hubbard_change(self, change):
+        """Show the U or V entries set on the model from elsewhere, e.g. by loading a state."""
+        if self._flushing:
+            return
+        which = 'u' if change['name'] == 'hubbard_u' else 'v'
+        grid = self.hubbard_u if which == 'u' else self.hubbard_v
+        # Tables built later fill their rows from the model
+        if not grid.data:
+            return
+        loaded = self._get_model_rows(grid, change['new'])
+        rows = []
+        entries = {}
+        for row in grid.data:
+            row = {field: value for field, value in row.items() if field != 'id'}
+            key = grid.key(row)
+            row = {**row, **loaded[key], 'selected': True} if key in loaded else {**row, 'selected': False}
+            if row['selected']:
+                entries[key] = self._get_hubbard_entry(which, row)
+            rows.append(row)
+        self._hubbard_entries[which] = entries
+        if rows != [{field: value for field, value in row.items() if field != 'id'} for row in grid.data]:
+            grid.set_rows(rows)
+
+    @staticmethod
+    def _get_hubbard_entry(which, row) -> list:
+        """Return the model entry of a selected U or V row."""
+        if which == 'u':
+            return [row['kind'], row['manifold'], max(row['value'], 1e-10)]
+        return [row['kind_i'], row['manifold_i'], row['kind_j'], row['manifold_j'], max(row['value'], 1e-10)]
+
+    def _on_hubbard_row_update(self, change, which):
+        """Apply the edit of a single U or V row, then schedule the model update."""
+        grid = self.hubbard_u if which == 'u' else self.hubbard_v
+        row = change['new']
+        if 'id' not in row:
+            return
+        key = grid.key(row)
+        entries = self._hubbard_entries[which]
+        if row['selected']:  # only if user has "checked" that they want U/V for this row
+            entries[key] = self._get_hubbard_entry(which, row)
+        else:
+            entries.pop(key, None)
+
+        # Edits made from Python are applied at once, so the model is up to date
+        # when the caller reads it; browser edits are batched.
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is None or grid.python_edit:
+            self._flush_hubbard()
+            return
+        if self._pending_flush is not None:
+            self._pending_flush.cancel()
+        self._pending_flush = loop.call_later(self.hubbard_debounce_delay, self._flush_hubbard)
+
+    def _flush_hubbard(self):
+        """Write the pending U and V entries to the model as a single change."""
+        if self._pending_flush is not None:
+            self._pending_flush.cancel()
+            self._pending_flush = None
+        hubbard_u = self._sorted_entries(self.hubbard_u, self._hubbard_entries['u'])
+        hubbard_v = []
+        # V entries are kept while the V table is hidden, but only submitted for DFT+U+V
+        if self._model.calculation_type == 'DFT+U+V':
+            hubbard_v = self._sorted_entries(self.hubbard_v, self._hubbard_entries['v'])
+        self._flushing = True
+        try:
+            with self._model.hold_trait_notifications():
+                if hubbard_u != self._model.hubbard_u:
+                    self._model.hubbard_u = hubbard_u
+                if hubbard_v != self._model.hubbard_v:
+                    self._model.hubbard_v = hubbard_v
+        finally:
+            self._flushing = False
+
+    def _flush_pending_hubbard(self):
+        """Write the U and V entries to the model now, if an edit is waiting for the debounce."""
+        if self._pending_flush is not None:
+            self._flush_hubbard()
+
+    @staticmethod
+    def _sorted_entries(grid, entries):
+        """Return the entries in the order of the grid rows."""
+        return [entries[key] for key in sorted(entries, key=grid.index)]
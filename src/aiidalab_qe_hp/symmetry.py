@@ -0,0 +1,116 @@
+"""Symmetry analysis of the Hubbard atoms and merging of equivalent kinds."""
+from aiida import orm
+
+from .cost import get_symmetry_info
+from .hubbard import HubbardU, HubbardV
+
+
+def _get_merge_types(structure, magnetic_moments: dict = None) -> list:
+    """Return a label per site that only tells apart sites that must keep different kinds."""
+    magnetic_moments = magnetic_moments or {}
+    labels = []
+    for site in structure.sites:
+        kind = structure.get_kind(site.kind_name)
+        labels.append((kind.symbols, kind.weights, kind.mass, magnetic_moments.get(kind.name, 0.0)))
+    return labels
+
+
+def get_kind_mapping(structure, magnetic_moments: dict = None) -> dict:
+    """
+    Return a mapping of every kind to the kind it can be merged with.
+
+    Two kinds can be merged when symmetry maps sites of one onto sites of the other once
+    the kind names are ignored. Kinds of different elements, masses or initial magnetic
+    moments are never merged, so e.g. antiferromagnetic sublattices are kept apart.
+    Each group of kinds maps onto its first kind in `structure.kinds`.
+    """
+    kind_names = [kind.name for kind in structure.kinds]
+    equivalent_atoms, _ = get_symmetry_info(structure, types=_get_merge_types(structure, magnetic_moments))
+    site_kinds = [site.kind_name for site in structure.sites]
+    mapping = {name: name for name in kind_names}
+
+    def find(name):
+        while mapping[name] != name:
+            name = mapping[name]
+        return name
+
+    for index, representative in enumerate(equivalent_atoms):
+        first, second = sorted((find(site_kinds[index]), find(site_kinds[representative])), key=kind_names.index)
+        mapping[second] = first
+    return {name: find(name) for name in kind_names}
+
+
+def get_kind_symmetry(structure, merge_kinds: bool = False, magnetic_moments: dict = None) -> dict:
+    """
+    Return the number of sites and of symmetry-irreducible sites of every kind.
+
+    The irreducible sites of a Hubbard kind are the atoms that hp.x perturbs. With
+    `merge_kinds`, the kinds are first merged as by `get_kind_mapping`, and the merged
+    kinds count their sites and perturbations in the kind they are merged into.
+
+    :returns: dict mapping each kind name to a dict with `sites`, `irreducible` and
+        `merged_into` (the kind it is merged into, or `None`).
+    """
+    mapping = get_kind_mapping(structure, magnetic_moments) if merge_kinds else None
+    types = None
+    if mapping is not None:
+        types = [mapping[site.kind_name] for site in structure.sites]
+    equivalent_atoms, _ = get_symmetry_info(structure, types=types)
+    symmetry = {
+        kind.name: {
+            'sites': 0,
+            'irreducible': 0,
+            'merged_into': mapping[kind.name] if mapping and mapping[kind.name] != kind.name else None,
+        }
+        for kind in structure.kinds
+    }
+    for index, site in enumerate(structure.sites):
+        name = mapping[site.kind_name] if mapping else site.kind_name
+        symmetry[name]['sites'] += 1
+        symmetry[name]['irreducible'] += int(equivalent_atoms[index] == index)
+    return symmetry
+
+
+def canonicalize_kinds(structure, mapping: dict):
+    """Return a new `StructureData` with every site relabelled with the kind of `mapping`."""
+    canonical = orm.StructureData(cell=structure.cell, pbc=structure.pbc)
+    for kind in structure.kinds:
+        if mapping[kind.name] == kind.name:
+            canonical.append_kind(kind)
+    for site in structure.sites:
+        canonical.append_site(orm.Site(kind_name=mapping[site.kind_name], position=site.position))
+    return canonical
+
+
+def merge_kind_parameters(parameters: dict, mapping: dict) -> dict:
+    """
+    Rename the kinds of the `get_builder` parameters in place, after merging with `mapping`.
+
+    Hubbard entries that become duplicates keep their first occurrence, and the
+    per-kind magnetic moments and pseudopotentials keep the values of the kept kinds.
+    """
+    hp = parameters['hp']
+    seen = set()
+    hubbard_u = []
+    for kind, manifold, value in HubbardU.load(hp.get('hubbard_u')):
+        if (mapping[kind], manifold) not in seen:
+            seen.add((mapping[kind], manifold))
+            hubbard_u.append([mapping[kind], manifold, value])
+    hubbard_v = []
+    for kind_i, manifold_i, kind_j, manifold_j, value in HubbardV.load(hp.get('hubbard_v')):
+        key = (mapping[kind_i], manifold_i, mapping[kind_j], manifold_j)
+        if key not in seen:
+            seen.add(key)
+            hubbard_v.append([*key, value])
+    hp['hubbard_u'], hp['hubbard_v'] = HubbardU.from_entries(hubbard_u), HubbardV.from_entries(hubbard_v)
+
+    advanced = parameters.get('advanced', {})
+    kept = {name for name, target in mapping.items() if name == target}
+    if advanced.get('initial_magnetic_moments'):
+        advanced['initial_magnetic_moments'] = {
+            name: moment for name, moment in advanced['initial_magnetic_moments'].items() if name in kept
+        }
+    pseudos = advanced.get('pw', {}).get('pseudos')
+    if pseudos:
+        advanced['pw']['pseudos'] = {name: pseudo for name, pseudo in pseudos.items() if name in kept}
+    return parameters
@@ -0,0 +1,161 @@
+"""Warm start of Hubbard runs from the converged parameters of earlier runs."""
+from collections import Counter, defaultdict
+from math import gcd
+
+import numpy as np
+from aiida import orm
+
+# Process labels of the Hubbard work chains submitted by the plugin, older runs first
+HUBBARD_PROCESS_LABELS = ('SelfConsistentHubbardWorkChain', 'AdaptiveHubbardWorkChain')
+
+# Number of the most recent finished runs that are compared with the structure
+DEFAULT_CANDIDATES = 200
+
+_POSITION_TOLERANCE = 1e-3  # Å
+
+
+def _get_symbols(kinds: list, sites: list) -> list:
+    kind_symbols = {kind['name']: kind['symbols'][0] for kind in kinds}
+    return [kind_symbols[site['kind_name']] for site in sites]
+
+
+def get_reduced_composition(symbols) -> tuple:
+    """Return the composition of a list of symbols divided by the greatest common divisor of the counts."""
+    counts = Counter(symbols)
+    divisor = 0
+    for count in counts.values():
+        divisor = gcd(divisor, count)
+    return tuple(sorted((symbol, count // divisor) for symbol, count in counts.items()))
+
+
+def _is_same_structure(structure, kinds: list, sites: list, cell: list) -> bool:
+    if len(sites) != len(structure.sites) or not np.allclose(cell, structure.cell, atol=_POSITION_TOLERANCE):
+        return False
+    if _get_symbols(kinds, sites) != [structure.get_kind(site.kind_name).symbol for site in structure.sites]:
+        return False
+    positions = np.array([site['position'] for site in sites])
+    return np.allclose(positions, [site.position for site in structure.sites], atol=_POSITION_TOLERANCE)
+
+
+def find_previous_run(structure, match: str = 'composition', candidates: int = DEFAULT_CANDIDATES):
+    """
+    Return the most recent finished Hubbard work chain run on a matching structure.
+
+    Only the structure attributes of the last `candidates` runs are fetched, in a single
+    query; no node is loaded until a match is found. A run on the same structure is
+    preferred over one with the same composition.
+
+    :param match: `structure` to only accept the same cell and positions, or `composition`
+        to also accept a structure with the same reduced composition.
+    :returns: tuple of the work chain node and whether its input is the same structure,
+        or `None` if there is no matching run.
+    """
+    from aiida_quantumespresso.data.hubbard_structure import HubbardStructureData
+
+    if match not in ('structure', 'composition'):
+        raise ValueError(f"`match` should be 'structure' or 'composition', not {match!r}.")
+    query = orm.QueryBuilder()
+    query.append(
+        HubbardStructureData, tag='input', project=['attributes.kinds', 'attributes.sites', 'attributes.cell']
+    )
+    query.append(
+        orm.WorkflowNode,
+        with_incoming='input',
+        edge_filters={'label': 'hubbard_structure'},
+        filters={
+            'attributes.process_label': {'in': list(HUBBARD_PROCESS_LABELS)},
+            'attributes.exit_status': 0,
+        },
+        tag='workchain',
+        project=['id'],
+    )
+    query.order_by({'workchain': {'ctime': 'desc'}}).limit(candidates)
+
+    composition = get_reduced_composition(structure.get_kind(site.kind_name).symbol for site in structure.sites)
+    first_match = None
+    for kinds, sites, cell, pk in query.iterall():
+        if _is_same_structure(structure, kinds, sites, cell):
+            return orm.load_node(pk), True
+        if first_match is None and get_reduced_composition(_get_symbols(kinds, sites)) == composition:
+            first_match = pk
+    if match == 'composition' and first_match is not None:
+        return orm.load_node(first_match), False
+    return None
+
+
+def get_converged_values(hubbard_structure) -> tuple:
+    """
+    Return the converged Hubbard values of a `HubbardStructureData`, keyed by element.
+
+    The on-site values are averaged over the sites of the same element and manifold.
+    Kinds are keyed by element because the self-consistent cycle relabels them.
+
+    :returns: tuple of a dict mapping `(symbol, manifold)` to U, and a dict mapping
+        `(symbol_i, manifold_i, symbol_j, manifold_j)` to the V of the nearest pair.
+    """
+    from .result.table import compute_table_columns, get_hubbard_arrays
+
+    arrays = get_hubbard_arrays(hubbard_structure)
+    distances = compute_table_columns(arrays)['distance']
+    symbols = arrays['symbols']
+    onsite = defaultdict(list)
+    intersite = {}
+    for index, (i, j) in enumerate(zip(arrays['atom_index'], arrays['neighbour_index'])):
+        manifold_i, manifold_j = arrays['atom_manifold'][index], arrays['neighbour_manifold'][index]
+        value = float(arrays['value'][index])
+        if i == j and not arrays['translation'][index].any():
+            onsite[(symbols[i], manifold_i)].append(value)
+            continue
+        for key in ((symbols[i], manifold_i, symbols[j], manifold_j), (symbols[j], manifold_j, symbols[i], manifold_i)):
+            if key not in intersite or distances[index] < intersite[key][0]:
+                intersite[key] = (distances[index], value)
+    return (
+        {key: float(np.mean(values)) for key, values in onsite.items()},
+        {key: value for key, (_, value) in intersite.items()},
+    )
+
+
+def warm_start_hubbard(structure, hubbard_u: list, hubbard_v: list, hubbard_structure) -> tuple:
+    """
+    Return the `hubbard_u` and `hubbard_v` entries with the values of a converged run.
+
+    Entries are matched by element and manifold; entries without a converged value are
+    returned unchanged.
+    """
+    onsite, intersite = get_converged_values(hubbard_structure)
+    symbol = {kind.name: kind.symbol for kind in structure.kinds}
+    hubbard_u = [
+        [kind, manifold, onsite.get((symbol[kind], manifold), value)] for kind, manifold, value in hubbard_u
+    ]
+    hubbard_v = [
+        [kind_i, manifold_i, kind_j, manifold_j,
+         intersite.get((symbol[kind_i], manifold_i, symbol[kind_j], manifold_j), value)]
+        for kind_i, manifold_i, kind_j, manifold_j, value in hubbard_v
+    ]
+    return hubbard_u, hubbard_v
+
+
+def get_charge_density_folder(workchain, computer=None):
+    """
+    Return the remote folder of the last scf of a work chain, to restart the charge density from.
+
+    :param computer: the computer of the new run; `None` is returned if the folder is elsewhere.
+    """
+    query = orm.QueryBuilder()
+    query.append(orm.WorkflowNode, filters={'id': workchain.pk}, tag='workchain')
+    query.append(
+        orm.WorkflowNode,
+        with_incoming='workchain',
+        filters={'attributes.process_label': 'PwBaseWorkChain', 'attributes.exit_status': 0},
+        edge_filters={'label': {'like': 'iteration_%_scf%'}},
+        tag='scf',
+    )
+    query.append(orm.RemoteData, with_incoming='scf', edge_filters={'label': 'remote_folder'}, project=['*'])
+    query.order_by({'scf': {'ctime': 'desc'}}).limit(1)
+    result = query.first()
+    if result is None:
+        return None
+    folder = result[0]
+    if computer is not None and folder.computer.pk != computer.pk:
+        return None
+    return folder
@@ -1,11 +1,18 @@
 from aiida_quantumespresso.data.hubbard_structure import HubbardStructureData
 from aiida_quantumespresso.common.types import ElectronicType, SpinType, RelaxType
-from aiida_hubbard.workflows.hubbard import SelfConsistentHubbardWorkChain
 from aiida import orm
-from aiidalab_qe.utils import (
-    enable_pencil_decomposition,
-    set_component_resources,
-)
+from aiida_hubbard.workflows.hubbard import SelfConsistentHubbardWorkChain
+from aiidalab_qe.utils import set_component_resources
+
+from .cost import estimate_cost
+from .hubbard import HubbardU, HubbardV
+from .parallelization import get_fft_grid, get_num_bands, get_num_kpoints, plan_parallelization
+from .protocols import cached_protocol_files
+from .qpoints import get_qpoints_refinement
+from .symmetry import canonicalize_kinds, get_kind_mapping, merge_kind_parameters
+from .warmstart import find_previous_run, get_charge_density_folder, warm_start_hubbard
+from .policy import get_stage_resources
+from .workflows import AdaptiveHubbardWorkChain
 
 
 PROTOCOL_MAP_U = {'fast': 1.0, 'balanced': 0.5, 'stringent': 0.1}
@@ -42,23 +49,116 @@ def check_codes(pw_code, hp_code):
         )
 
 
-def update_resources(builder, codes):
-    set_component_resources(builder.relax.base.pw, codes.get('pw'))
-    set_component_resources(builder.scf.pw, codes.get('pw'))
-    set_component_resources(builder.hubbard.hp, codes.get('hp'))
+def update_resources(builder, codes, policy=None):
+    """
+    Set the resources of the pw.x and hp.x calculations of the builder.
+
+    :param policy: the per-stage resources from `get_stage_resources`; without it, every
+        stage uses the resources of its code. The hp.x initialization, perturbation and
+        collection jobs share the `hubbard.hp` inputs, which get the perturbation resources;
+        the walltime of the initialization job is set with `hubbard.init_walltime`.
+    """
+    if policy is None:
+        policy = get_stage_resources(codes)
+    stages = (
+        ('relax', 'pw', builder.relax.base.pw),
+        ('scf', 'pw', builder.scf.pw),
+        ('hp_perturbation', 'hp', builder.hubbard.hp),
+    )
+    for stage, code, component in stages:
+        if codes.get(code):
+            set_component_resources(component, {**codes[code], **policy[stage]})
+    # Only versions of aiida-hubbard that expose the input of `HpParallelizeAtomsWorkChain`
+    if policy.get('hp_init') and 'init_walltime' in builder.hubbard._port_namespace:
+        builder.hubbard.init_walltime = policy['hp_init']['max_wallclock_seconds']
+    if policy['num_perturbations'] > 1 and codes.get('hp'):
+        hp, perturbation = codes['hp'], policy['hp_perturbation']
+        # Run at most as many perturbations at once as fit in the requested hp.x allocation
+        available = hp.get('nodes', 1) * hp.get('ntasks_per_node', 1)
+        max_concurrent = max(available // (perturbation['nodes'] * perturbation['ntasks_per_node']), 1)
+        if max_concurrent < policy['num_perturbations']:
+            builder.hubbard.max_concurrent_base_workchains = orm.Int(max_concurrent)
+
+
+def _add_cmdline(component, *flags):
+    """Append command line flags to the `settings` of a calculation, unless already given."""
+    settings = component.settings.get_dict() if component.get('settings') else {}
+    cmdline = settings.get('CMDLINE', [])
+    if flags[0] not in cmdline:
+        settings['CMDLINE'] = [*cmdline, *flags]
+        component.settings = orm.Dict(settings)
+
+
+def update_parallelization(builder, structure, policy, num_operations=1):
+    """
+    Set the pool, diagonalization and FFT parallelization of every pw.x and hp.x calculation.
+
+    The flags are planned with `plan_parallelization` from the MPI ranks of each stage
+    and the estimated number of k points, bands and FFT planes. Flags that were given
+    with the code resources are kept. hp.x has no `parallelization` input, so its pools
+    are passed on the command line; it works on the pools and FFT grid of the scf.
+    """
+    parameters = builder.scf.pw.parameters.get_dict()
+    fft_grid = get_fft_grid(structure.cell, parameters['SYSTEM']['ecutrho'])
+    num_bands = parameters['SYSTEM'].get('nbnd') or get_num_bands(structure, builder.scf.pw.pseudos)
+    stages = [('scf', builder.scf, 'pw'), ('hp_perturbation', builder.scf, 'hp')]
+    if 'relax' in builder:
+        stages.append(('relax', builder.relax.base, 'pw'))
+    for stage, base, code in stages:
+        resources = policy[stage]
+        num_kpoints = get_num_kpoints(structure, base.kpoints_distance.value, num_operations)
+        plan = plan_parallelization(
+            resources['nodes'] * resources['ntasks_per_node'], num_kpoints, num_bands, fft_grid
+        )
+        if code == 'hp':
+            _add_cmdline(builder.hubbard.hp, '-npool', str(plan['npool']))
+            continue
+        if not base.pw.get('parallelization'):
+            base.pw.parallelization = orm.Dict({'npool': plan['npool'], 'ndiag': plan['ndiag']})
+        if plan['pencil_decomposition']:
+            _add_cmdline(base.pw, '-pd', '.true.')
+
+
+def set_charge_density_restart(builder, workchain, computer):
+    """Start the scf calculations from the charge density of the last scf of `workchain`, if still on `computer`."""
+    folder = get_charge_density_folder(workchain, computer)
+    if folder is None:
+        return
+    parameters = builder.scf.pw.parameters.get_dict()
+    parameters.setdefault('ELECTRONS', {})['startingpot'] = 'file'
+    builder.scf.pw.parameters = orm.Dict(parameters)
+    builder.scf.pw.parent_folder = folder
 
 
-def get_builder(codes, structure, parameters, **kwargs):
+def get_builder(codes, structure, parameters, validate_codes=True, **kwargs):
 
 
     pw_code = codes.get('pw')['code']
     hp_code = codes.get('hp')['code']
-    check_codes(pw_code, hp_code)
+    if validate_codes:
+        check_codes(pw_code, hp_code)
     protocol = parameters['workchain']['protocol']
+    if parameters['hp'].pop('merge_kinds', False):
+        # kinds that only differ by name would be perturbed separately by hp.x
+        mapping = get_kind_mapping(structure, parameters['advanced'].get('initial_magnetic_moments'))
+        if any(name != target for name, target in mapping.items()):
+            structure = canonicalize_kinds(structure, mapping)
+            merge_kind_parameters(parameters, mapping)
     # generate Hubbard structure
     hubbard_structure = HubbardStructureData.from_structure(structure)
-    hubbard_u = parameters['hp'].pop('hubbard_u')
-    hubbard_v = parameters['hp'].pop('hubbard_v')
+    hubbard_u = HubbardU.load(parameters['hp'].pop('hubbard_u'))
+    hubbard_v = HubbardV.load(parameters['hp'].pop('hubbard_v'))
+    kind_names = structure.get_kind_names()
+    hubbard_u.validate(kind_names)
+    hubbard_v.validate(kind_names)
+    # seed a self-consistent cycle with the converged values of an earlier run
+    previous = None
+    if parameters['hp'].pop('warm_start', False) and parameters['hp'].get('method') == 'self-consistent':
+        previous = find_previous_run(structure)
+    if previous is not None:
+        hubbard_u, hubbard_v = warm_start_hubbard(
+            structure, hubbard_u, hubbard_v, previous[0].outputs.hubbard_structure
+        )
     for data in hubbard_u:
         hubbard_structure.initialize_onsites_hubbard(*data)
     for data in hubbard_v:
@@ -67,6 +167,16 @@ def get_builder(codes, structure, parameters, **kwargs):
     hubbard = parameters.get('hp', {})
     parallelize_atoms = hubbard.get('parallelize_atoms', False)
     parallelize_qpoints = hubbard.get('parallelize_qpoints', False)
+    # scale the hp.x resources with the estimated number of perturbations
+    estimate = estimate_cost(structure, {**hubbard, 'hubbard_u': hubbard_u}, max_iterations=1)
+    policy = get_stage_resources(
+        codes,
+        num_atoms=estimate['perturbed_atoms'],
+        num_qpoints=estimate['qpoints'],
+        parallelize_atoms=parallelize_atoms,
+        parallelize_qpoints=parallelize_qpoints,
+        overrides=hubbard.pop('resources', None),
+    )
 
     relax_type = parameters['hp']['relax_type']
 
@@ -86,33 +196,45 @@ def get_builder(codes, structure, parameters, **kwargs):
         'relax': relax_overrides,
         'scf': scf_overrides,
     }
-    builder = SelfConsistentHubbardWorkChain.get_builder_from_protocol(
-        pw_code=pw_code,
-        hp_code=hp_code,  # modify here if you downloaded the notebook
-        hubbard_structure=hubbard_structure,
-        protocol=protocol,
-        overrides=overrides,
-        electronic_type=ElectronicType(parameters['workchain']['electronic_type']),
-        spin_type=SpinType(parameters['workchain']['spin_type']),
-        relax_type=RelaxType.POSITIONS if relax_type == 'atomic' else RelaxType.POSITIONS_CELL,
-        initial_magnetic_moments=parameters['advanced']['initial_magnetic_moments'],
-        **kwargs,
-    )
-    # update resources
-    update_resources(builder, codes)
+    # The adaptive q-point refinement needs the subclass; its inputs are a superset of the parent's
     method = parameters['hp'].pop('method')
-    if method == 'one-shot':
+    workchain = AdaptiveHubbardWorkChain if method == 'adaptive' else SelfConsistentHubbardWorkChain
+    with cached_protocol_files():
+        builder = workchain.get_builder_from_protocol(
+            pw_code=pw_code,
+            hp_code=hp_code,  # modify here if you downloaded the notebook
+            hubbard_structure=hubbard_structure,
+            protocol=protocol,
+            overrides=overrides,
+            electronic_type=ElectronicType(parameters['workchain']['electronic_type']),
+            spin_type=SpinType(parameters['workchain']['spin_type']),
+            relax_type=RelaxType.POSITIONS if relax_type == 'atomic' else RelaxType.POSITIONS_CELL,
+            initial_magnetic_moments=parameters['advanced']['initial_magnetic_moments'],
+            **kwargs,
+        )
+    # update resources
+    update_resources(builder, codes, policy)
+    update_parallelization(builder, hubbard_structure, policy, estimate['symmetry_operations'])
+    reuse_charge_density = parameters['hp'].pop('reuse_charge_density', False)
+    if previous is not None and previous[1] and reuse_charge_density:
+        set_charge_density_restart(builder, previous[0], pw_code.computer)
+    if method in ('one-shot', 'adaptive'):
         builder.max_iterations = orm.Int(1)
         builder.meta_convergence = orm.Bool(False)
         builder.pop('relax', None)
+    if method == 'adaptive':
+        # start from a coarse q-point mesh, and refine it up to `qpoints_distance` while U/V change
+        builder.qpoints_distances = orm.List(get_qpoints_refinement(structure, hubbard.get('qpoints_distance', 1)))
 
     builder.pop('clean_workdir', None)
 
     return builder
 
 
+# The QE app runs this class for every method: with the outline of the `SelfConsistentHubbardWorkChain`,
+# it only differs from it when `qpoints_distances` is given
 workchain_and_builder = {
-    'workchain': SelfConsistentHubbardWorkChain,
+    'workchain': AdaptiveHubbardWorkChain,
     'exclude': ('structure',),
     'get_builder': get_builder,
 }
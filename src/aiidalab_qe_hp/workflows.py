@@ -0,0 +1,197 @@
+"""Hubbard work chain that converges the hp.x q-point mesh adaptively."""
+from aiida import orm
+from aiida.common import AttributeDict
+from aiida.engine import ToContext, WorkChain, append_, while_
+from aiida_hubbard.workflows.hubbard import HpWorkChain, SelfConsistentHubbardWorkChain, get_separated_parameters
+import numpy as np
+
+
+def validate_qpoints_distances(value, _):
+    """Validate that the q-point distances are positive and go from coarse to fine."""
+    distances = value.get_list()
+    if not distances:
+        return 'at least one q-point distance is required.'
+    if any(distance <= 0 for distance in distances):
+        return 'the q-point distances must be positive.'
+    if any(coarse <= fine for coarse, fine in zip(distances, distances[1:])):
+        return 'the q-point distances must be strictly decreasing, from the coarse to the fine mesh.'
+
+
+def get_max_differences(old: list, new: list) -> tuple:
+    """
+    Return the largest change of the on-site and inter-site values between two Hubbard parameter lists.
+
+    The lists must come from the same structure, so that the parameters are in the same order;
+    the inter-site change is `None` when there are no inter-site parameters.
+    """
+    old_onsites, old_intersites = get_separated_parameters(old)
+    new_onsites, new_intersites = get_separated_parameters(new)
+    onsite = float(np.max(np.abs(
+        np.array([p[4] for p in new_onsites], dtype=float) - np.array([p[4] for p in old_onsites], dtype=float)
+    ), initial=0.0))
+    intersite = None
+    if new_intersites:
+        intersite = float(np.max(np.abs(
+            np.array([p[4] for p in new_intersites], dtype=float)
+            - np.array([p[4] for p in old_intersites], dtype=float)
+        )))
+    return onsite, intersite
+
+
+class QpointsRefinementWorkChain(WorkChain):
+    """
+    Run the `HpWorkChain` on finer and finer q-point meshes until the Hubbard values settle.
+
+    hp.x first runs on the mesh of the first of `qpoints_distances`, then on the next finer
+    one, until the Hubbard values of two consecutive meshes differ by less than
+    `tolerance_onsite` and `tolerance_intersite`, or the finest mesh is reached. The outputs
+    are those of the last, finest `HpWorkChain`, and `qpoints_distance` is the coarser
+    distance of the converged pair, enough for later iterations.
+    """
+
+    @classmethod
+    def define(cls, spec):
+        """Define the specifications of the process."""
+        # yapf: disable
+        super().define(spec)
+        spec.expose_inputs(HpWorkChain, exclude=('qpoints_distance',))
+        spec.input('qpoints_distances', valid_type=orm.List, validator=validate_qpoints_distances,
+            help='The q-point distances (1/Å) of the meshes to try, from coarse to fine.')
+        spec.input('tolerance_onsite', valid_type=orm.Float, default=lambda: orm.Float(0.1),
+            help='Largest change (eV) of the on-site values between two meshes to stop the refinement.')
+        spec.input('tolerance_intersite', valid_type=orm.Float, default=lambda: orm.Float(0.01),
+            help='Largest change (eV) of the inter-site values between two meshes to stop the refinement.')
+        spec.outline(
+            cls.setup,
+            while_(cls.should_run_hp)(
+                cls.run_hp,
+                cls.inspect_hp,
+            ),
+            cls.results,
+        )
+        spec.expose_outputs(HpWorkChain)
+        spec.output('qpoints_distance', valid_type=orm.Float,
+            help='The q-point distance of the coarser mesh of the converged pair, or of the finest mesh.')
+        spec.exit_code(400, 'ERROR_SUB_PROCESS_FAILED_HP',
+            message='The HpWorkChain sub process failed on the q-point distance {distance}.')
+        # yapf: enable
+
+    def setup(self):
+        """Set up Context variables."""
+        self.ctx.qpoints_distances = self.inputs.qpoints_distances.get_list()
+        self.ctx.qpoints_index = 0
+        self.ctx.qpoints_settled = False
+        self.ctx.qpoints_converged = False
+        self.ctx.workchains_hp = []
+
+    def should_run_hp(self):
+        """Return whether hp.x should run on a finer mesh."""
+        return not self.ctx.qpoints_settled
+
+    def run_hp(self):
+        """Run the `HpWorkChain` on the current mesh."""
+        inputs = AttributeDict(self.exposed_inputs(HpWorkChain))
+        inputs.qpoints_distance = orm.Float(self.ctx.qpoints_distances[self.ctx.qpoints_index])
+        inputs.metadata.call_link_label = f'qpoints_{self.ctx.qpoints_index + 1:02d}_hp'
+        running = self.submit(HpWorkChain, **inputs)
+        self.report(f'launching HpWorkChain<{running.pk}> with the q-point distance {inputs.qpoints_distance.value}')
+        return ToContext(workchains_hp=append_(running))
+
+    def inspect_hp(self):
+        """Compare the Hubbard values with those of the previous mesh, and move to the next mesh if they changed."""
+        workchain = self.ctx.workchains_hp[-1]
+        distance = self.ctx.qpoints_distances[self.ctx.qpoints_index]
+        if not workchain.is_finished_ok:
+            self.report(f'hp.x on the q-point distance {distance} failed with exit status {workchain.exit_status}')
+            return self.exit_codes.ERROR_SUB_PROCESS_FAILED_HP.format(distance=distance)
+
+        if len(self.ctx.workchains_hp) > 1:
+            reference = self.ctx.workchains_hp[-2].outputs.hubbard_structure
+            onsite, intersite = get_max_differences(
+                reference.hubbard.to_list(), workchain.outputs.hubbard_structure.hubbard.to_list()
+            )
+            self.report(
+                f'q-point distance {distance}: the Hubbard values changed by at most {onsite} (on-site) and '
+                f'{intersite} (inter-site) with respect to the previous mesh.'
+            )
+            if onsite <= self.inputs.tolerance_onsite.value and (
+                intersite is None or intersite <= self.inputs.tolerance_intersite.value
+            ):
+                self.ctx.qpoints_settled = self.ctx.qpoints_converged = True
+                return
+        if self.ctx.qpoints_index == len(self.ctx.qpoints_distances) - 1:
+            self.report('reached the finest q-point mesh without converging the Hubbard values between meshes.')
+            self.ctx.qpoints_settled = True
+            return
+        self.ctx.qpoints_index += 1
+
+    def results(self):
+        """Attach the outputs of the finest `HpWorkChain` and the q-point distance for later iterations."""
+        workchains = self.ctx.workchains_hp
+        self.out_many(self.exposed_outputs(workchains[-1], HpWorkChain))
+        # The coarser mesh of a converged pair is enough for the next iterations
+        settled = workchains[-2] if self.ctx.qpoints_converged else workchains[-1]
+        self.out('qpoints_distance', settled.inputs.qpoints_distance)
+
+
+class AdaptiveHubbardWorkChain(SelfConsistentHubbardWorkChain):
+    """
+    `SelfConsistentHubbardWorkChain` that refines the hp.x q-point mesh only as far as needed.
+
+    With `qpoints_distances`, the hp.x step of the first iteration runs the
+    `QpointsRefinementWorkChain` instead of a single `HpWorkChain`, and later iterations of
+    a self-consistent cycle run on the q-point distance it settled on. The outline is the
+    one of the `SelfConsistentHubbardWorkChain`; without `qpoints_distances`, it behaves
+    as the `SelfConsistentHubbardWorkChain`.
+    """
+
+    @classmethod
+    def define(cls, spec):
+        """Define the specifications of the process."""
+        # yapf: disable
+        super().define(spec)
+        spec.input('qpoints_distances', valid_type=orm.List, required=False, validator=validate_qpoints_distances,
+            help=('The q-point distances (1/Å) of the meshes to try, from coarse to fine. If given, they replace '
+                  '`hubbard.qpoints_distance`.'))
+        spec.output('qpoints_distance', valid_type=orm.Float, required=False,
+            help='The q-point distance of the mesh of the later hp.x runs, when `qpoints_distances` is given.')
+        # yapf: enable
+
+    def setup(self):
+        """Set up Context variables."""
+        super().setup()
+        self.ctx.qpoints_distance = None
+
+    def _should_refine_qpoints(self):
+        return 'qpoints_distances' in self.inputs and self.ctx.qpoints_distance is None
+
+    def exposed_inputs(self, process_class, namespace=None, agglomerate=True):
+        """Return the exposed inputs, with the settled q-point distance for the `HpWorkChain`."""
+        inputs = super().exposed_inputs(process_class, namespace=namespace, agglomerate=agglomerate)
+        if process_class is HpWorkChain and self.ctx.get('qpoints_distance') is not None:
+            inputs['qpoints_distance'] = self.ctx.qpoints_distance
+        return inputs
+
+    def submit(self, process, inputs=None, **kwargs):
+        """Submit a process, running the q-point refinement in place of the first `HpWorkChain`."""
+        if process is HpWorkChain and self._should_refine_qpoints():
+            inputs = AttributeDict({**(inputs or {}), **kwargs})
+            inputs.pop('qpoints_distance', None)
+            inputs.qpoints_distances = self.inputs.qpoints_distances
+            inputs.tolerance_onsite = self.inputs.tolerance_onsite
+            inputs.tolerance_intersite = self.inputs.tolerance_intersite
+            return super().submit(QpointsRefinementWorkChain, **inputs)
+        return super().submit(process, inputs, **kwargs)
+
+    def inspect_hp(self):
+        """Analyze the last completed hp.x step, keeping the q-point distance of a q-point refinement."""
+        workchain = self.ctx.workchains_hp[-1]
+        if workchain.is_finished_ok and 'qpoints_distance' in workchain.outputs:
+            self.ctx.qpoints_distance = workchain.outputs.qpoints_distance
+        return super().inspect_hp()
+
+    def run_results(self):
+        """Attach the final Hubbard parameters, the structure and the settled q-point distance."""
+        if self.ctx.qpoints_distance is not None:
+            self.out('qpoints_distance', self.ctx.qpoints_distance)
+        return super().run_results()
@@ -1,7 +1,18 @@
+import io
+
 import pytest
-from aiida import orm, load_profile
+from aiida import orm
+from aiida.common.links import LinkType
+from aiida.engine import ProcessState
+
+# A temporary profile, so that the fake runs stored by the tests never reach a real one
+pytest_plugins = ['aiida.tools.pytest_fixtures']
 
-load_profile()
+_UPF = """<UPF version="2.0.1">
+<PP_HEADER element="{element}" z_valence="{z_valence}" functional="PBESOL" />
+</UPF>
+"""
+_Z_VALENCE = {'Li': 3.0, 'Co': 17.0, 'Ni': 18.0, 'O': 6.0}
 
 
 @pytest.fixture
@@ -21,10 +32,56 @@ def LiCoO2():
 
 
 @pytest.fixture
-def pw_code():
-    return orm.load_code('pw-7.4@localhost')
+def finished_run():
+    """
+    Return a function that stores a process node as a finished work chain.
+
+    The optional `hubbard_structure` is attached as its output, `inputs` maps input
+    link labels to nodes, and `caller` with `link_label` makes it a called process.
+    """
+
+    def factory(label, hubbard_structure=None, inputs=None, caller=None, link_label=None, exit_status=0):
+        workchain = orm.WorkflowNode()
+        workchain.set_process_label(label)
+        workchain.set_process_state(ProcessState.FINISHED)
+        workchain.set_exit_status(exit_status)
+        for input_label, node in (inputs or {}).items():
+            workchain.base.links.add_incoming(node.store(), LinkType.INPUT_WORK, input_label)
+        if caller is not None:
+            workchain.base.links.add_incoming(caller, LinkType.CALL_WORK, link_label)
+        workchain.store()
+        if hubbard_structure is not None:
+            hubbard_structure.store().base.links.add_incoming(workchain, LinkType.RETURN, 'hubbard_structure')
+        return workchain
+
+    return factory
+
+
+@pytest.fixture
+def pw_code(aiida_code_installed):
+    return aiida_code_installed(label='pw-7.4', default_calc_job_plugin='quantumespresso.pw')
+
+
+@pytest.fixture
+def hp_code(aiida_code_installed):
+    return aiida_code_installed(label='hp-7.4', default_calc_job_plugin='quantumespresso.hp')
 
 
 @pytest.fixture
-def hp_code():
-    return orm.load_code('hp-7.4@localhost')
+def pseudo_family():
+    """Return the pseudo family of the protocols, with synthetic pseudopotentials and cutoffs."""
+    from aiida_pseudo.data.pseudo import UpfData
+    from aiida_pseudo.groups.family import CutoffsPseudoPotentialFamily
+
+    label = 'SSSP/1.3/PBEsol/efficiency'
+    existing = orm.QueryBuilder().append(orm.Group, filters={'label': label}).first(flat=True)
+    if existing is not None:
+        return existing
+    family = CutoffsPseudoPotentialFamily(label=label).store()
+    family.add_nodes([
+        UpfData(io.BytesIO(_UPF.format(element=element, z_valence=z_valence).encode())).store()
+        for element, z_valence in _Z_VALENCE.items()
+    ])
+    cutoffs = {element: {'cutoff_wfc': 45.0, 'cutoff_rho': 360.0} for element in _Z_VALENCE}
+    family.set_cutoffs(cutoffs, 'normal', unit='Ry')
+    return family
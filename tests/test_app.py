@@ -1,12 +1,5 @@
-def test_app():
+def test_app(pw_code, hp_code):
     from aiidalab_qe.app import App
-    from aiida import load_profile, orm
-
-    load_profile()
-
-    pw_code = orm.load_code('pw-7.2@localhost')
-    hp_code = orm.load_code('hp-7.2@localhost')
-
     app = App(qe_auto_setup=True)
 
     step1 = app.structure_step
@@ -28,12 +21,10 @@ def test_app():
     #
     configure_step.settings['hp'].calculation_type.value = 'DFT+U+V'
     configure_step.settings['hp'].qpoints_distance.value = 3.0
-    configure_step.settings['hp'].hubbard_u_map['Co'][0].value = True
-    configure_step.settings['hp'].hubbard_u_map['Co'][2].value = '3d'
-    configure_step.settings['hp'].hubbard_u_map['Co'][3].value = 3.0
-    configure_step.settings['hp'].hubbard_v_map[('Co', 'O')][0].value = True
-    configure_step.settings['hp'].hubbard_v_map[('Co', 'O')][2].value = '3d'
-    configure_step.settings['hp'].hubbard_v_map[('Co', 'O')][4].value = '2p'
+    configure_step.settings['hp'].hubbard_u.update_row('Co', selected=True, manifold='3d', value=3.0)
+    configure_step.settings['hp'].hubbard_v.update_row(
+        ('Co', 'O'), selected=True, manifold_i='3d', manifold_j='2p'
+    )
     configure_step.confirm()
     #
     app.submit_step.pw_code.code_selection.refresh()
@@ -46,15 +37,8 @@ def test_app():
     app.submit_step.submit()
 
 
-def test_app_hubbard_u():
+def test_app_hubbard_u(pw_code, hp_code):
     from aiidalab_qe.app import App
-    from aiida import load_profile, orm
-
-    load_profile()
-
-    pw_code = orm.load_code('pw-7.2@localhost')
-    hp_code = orm.load_code('hp-7.2@localhost')
-
     app = App(qe_auto_setup=True)
 
     step1 = app.structure_step
@@ -74,9 +58,7 @@ def test_app_hubbard_u():
     }
     configure_step.set_configuration_parameters(parameters)
     #
-    configure_step.settings['hp'].hubbard_u_map['Co'][0].value = True
-    configure_step.settings['hp'].hubbard_u_map['Co'][2].value = '3d'
-    configure_step.settings['hp'].hubbard_u_map['Co'][3].value = 3.0
+    configure_step.settings['hp'].hubbard_u.update_row('Co', selected=True, manifold='3d', value=3.0)
     configure_step.confirm()
     #
     app.submit_step.pw_code.code_selection.refresh()
@@ -87,15 +69,8 @@ def test_app_hubbard_u():
     app.submit_step.submit()
 
 
-def test_app_scf():
+def test_app_scf(pw_code, hp_code):
     from aiidalab_qe.app import App
-    from aiida import load_profile, orm
-
-    load_profile()
-
-    pw_code = orm.load_code('pw-7.2@localhost')
-    hp_code = orm.load_code('hp-7.2@localhost')
-
     app = App(qe_auto_setup=True)
 
     step1 = app.structure_step
@@ -117,12 +92,10 @@ def test_app_scf():
     #
     configure_step.settings['hp'].method.value = 'self-consistent'
     configure_step.settings['hp'].calculation_type.value = 'DFT+U+V'
-    configure_step.settings['hp'].hubbard_u_map['Co'][0].value = True
-    configure_step.settings['hp'].hubbard_u_map['Co'][2].value = '3d'
-    configure_step.settings['hp'].hubbard_u_map['Co'][3].value = 3.0
-    configure_step.settings['hp'].hubbard_v_map[('Co', 'O')][0].value = True
-    configure_step.settings['hp'].hubbard_v_map[('Co', 'O')][2].value = '3d'
-    configure_step.settings['hp'].hubbard_v_map[('Co', 'O')][4].value = '2p'
+    configure_step.settings['hp'].hubbard_u.update_row('Co', selected=True, manifold='3d', value=3.0)
+    configure_step.settings['hp'].hubbard_v.update_row(
+        ('Co', 'O'), selected=True, manifold_i='3d', manifold_j='2p'
+    )
     configure_step.confirm()
     #
     app.submit_step.pw_code.code_selection.refresh()
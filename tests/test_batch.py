@@ -0,0 +1,54 @@
+import copy
+
+
+def get_settings(pw_code, hp_code):
+    resources = {'nodes': 1, 'ntasks_per_node': 1, 'cpus_per_task': 1, 'max_wallclock_seconds': 3600}
+    codes = {'pw': {'code': pw_code, **resources}, 'hp': {'code': hp_code, **resources}}
+    parameters = {
+        'hp': {
+            'method': 'one-shot',
+            'relax_type': 'atomic',
+            'qpoints_distance': 1.0,
+            'parallelize_atoms': False,
+            'parallelize_qpoints': False,
+            'hubbard_u': [['Co', '3d', 3.0], ['Ni', '3d', 3.0]],
+            'hubbard_v': [['Co', '3d', 'O', '2p', 1.0], ['Ni', '3d', 'O', '2p', 1.0]],
+        },
+        'workchain': {
+            'protocol': 'fast',
+            'electronic_type': 'insulator',
+            'spin_type': 'collinear',
+        },
+        'advanced': {'initial_magnetic_moments': {'Co': 1.0, 'Ni': 1.0}},
+    }
+    return codes, parameters
+
+
+def test_structure_parameters(LiCoO2, pw_code, hp_code, pseudo_family):
+    from aiidalab_qe_hp.batch import get_structure_parameters
+
+    _, parameters = get_settings(pw_code, hp_code)
+    families = {}
+    structure_parameters = get_structure_parameters(LiCoO2, parameters, families)
+    assert structure_parameters['hp']['hubbard_u'] == [['Co', '3d', 3.0]]
+    assert structure_parameters['hp']['hubbard_v'] == [['Co', '3d', 'O', '2p', 1.0]]
+    advanced = structure_parameters['advanced']
+    assert advanced['initial_magnetic_moments'] == {'Co': 1.0, 'Li': 0.0, 'O': 0.0}
+    assert sorted(advanced['pw']['pseudos']) == ['Co', 'Li', 'O']
+    assert {'ecutwfc', 'ecutrho'} <= set(advanced['pw']['parameters']['SYSTEM'])
+    # the pseudo family is loaded once per batch
+    assert len(families) == 1
+
+
+def test_build_builders(LiCoO2, pw_code, hp_code, pseudo_family):
+    from aiidalab_qe_hp.batch import build_builders
+
+    codes, parameters = get_settings(pw_code, hp_code)
+    original = copy.deepcopy(parameters)
+    builders = build_builders(codes, [LiCoO2, LiCoO2], parameters)
+    assert len(builders) == 2
+    assert parameters == original
+    for builder in builders:
+        hubbard = builder.hubbard_structure.hubbard.to_list()
+        assert hubbard[0] == (0, '3d', 0, '3d', 3.0, (0, 0, 0), 'Ueff')
+        assert {(entry[1], entry[3]) for entry in hubbard[1:]} == {('3d', '2p')}
@@ -0,0 +1,48 @@
+def test_estimate_jobs():
+    from aiidalab_qe_hp.cost import estimate_jobs
+
+    # scf with smearing + scf with fixed occupations (insulators)
+    assert estimate_jobs(2, 4, False, False) == {'pw': 2, 'hp': 1, 'hp_per_atom': 0, 'iterations': 1}
+    # init + one job per atom + collection
+    assert estimate_jobs(2, 4, True, False)['hp'] == 4
+    # init + per atom (init + one job per q point + collection) + collection
+    assert estimate_jobs(2, 4, True, True)['hp'] == 2 + 2 * 6
+    jobs = estimate_jobs(2, 4, True, False, iterations=3, relax=True)
+    assert (jobs['pw'], jobs['hp']) == (9, 12)
+
+
+def test_estimate_cost(LiCoO2):
+    from aiidalab_qe_hp.cost import estimate_cost, format_cost
+
+    parameters = {
+        'method': 'one-shot',
+        'qpoints_distance': 1.2,
+        'parallelize_atoms': True,
+        'parallelize_qpoints': True,
+        'hubbard_u': [['Co', '3d', 3.0]],
+    }
+    codes = {'hp': {'nodes': 1, 'ntasks_per_node': 4, 'cpus_per_task': 1, 'max_wallclock_seconds': 3600}}
+    estimate = estimate_cost(LiCoO2, parameters, codes)
+    assert estimate['perturbed_atoms'] == 1
+    assert estimate['qpoints_mesh'] == (3, 3, 3)
+    # LiCoO2 is an insulator: scf with smearing, then with fixed occupations
+    assert estimate['jobs']['pw'] == 2
+    assert estimate['jobs']['hp'] == 2 + estimate['qpoints'] + 2
+    assert estimate['core_hours'] == {'hp': 4 * estimate['jobs']['hp']}
+    assert 'hp.x jobs' in format_cost(estimate)
+
+
+def test_estimate_cost_adaptive(LiCoO2):
+    from aiidalab_qe_hp.cost import estimate_cost
+
+    parameters = {'method': 'adaptive', 'qpoints_distance': 1.2, 'hubbard_u': [['Co', '3d', 3.0]]}
+    # one hp.x job per mesh, (1, 1, 1) and (2, 2, 2) before (3, 3, 3)
+    assert estimate_cost(LiCoO2, parameters)['jobs']['hp'] == 3
+
+
+def test_estimate_cost_symmetry(LiCoO2):
+    from aiidalab_qe_hp.cost import estimate_cost, get_estimate_symmetry
+
+    parameters = {'qpoints_distance': 1.2, 'hubbard_u': [['Co', '3d', 3.0]]}
+    symmetry = get_estimate_symmetry(LiCoO2)
+    assert estimate_cost(LiCoO2, parameters, symmetry=symmetry) == estimate_cost(LiCoO2, parameters)
@@ -0,0 +1,47 @@
+import pytest
+
+
+def test_hubbard_parameters():
+    from aiidalab_qe_hp.hubbard import HubbardU, HubbardV
+
+    hubbard_u = HubbardU.from_entries([['Co', '3d', 3.0], ['Li', '2s', 1.0]])
+    assert hubbard_u == [['Co', '3d', 3.0], ['Li', '2s', 1.0]]
+    assert [value for _, _, value in hubbard_u] == [3.0, 1.0]
+    assert hubbard_u.to_columns() == {'kind': ['Co', 'Li'], 'manifold': ['3d', '2s'], 'value': [3.0, 1.0]}
+    assert HubbardU.load(hubbard_u.to_columns()) == hubbard_u
+    assert hubbard_u.select(['Co', 'O']) == [['Co', '3d', 3.0]]
+    assert HubbardU.load(None) == []
+
+    hubbard_v = HubbardV.load([['Co', '3d', 'O', '2p', 1.0], ['Co', '3d-4s', 'Li', '2s', 0.5]])
+    assert hubbard_v.kinds == ['Co', 'Li', 'O']
+    assert hubbard_v.select(['Co', 'O']) == [['Co', '3d', 'O', '2p', 1.0]]
+    hubbard_v.validate(['Co', 'Li', 'O'])
+    with pytest.raises(ValueError, match='unknown kind in `kind_j`'):
+        hubbard_v.validate(['Co', 'O'])
+    with pytest.raises(ValueError, match='invalid `manifold`'):
+        HubbardU.from_entries([['Co', '3x', 3.0]]).validate()
+    with pytest.raises(ValueError, match='value out of range'):
+        HubbardU.from_entries([['Co', '3d', -1.0]]).validate()
+    with pytest.raises(ValueError):
+        HubbardU.from_entries([['Co', '3d']])
+
+
+def test_model_hubbard_state():
+    from traitlets import TraitError
+
+    from aiidalab_qe_hp.model import HPSettingsModel
+
+    model = HPSettingsModel()
+    model.hubbard_u = [['Co', '3d', 3.0]]
+    state = model.get_model_state()
+    assert state['hubbard_u'] == {'kind': ['Co'], 'manifold': ['3d'], 'value': [3.0]}
+    state['hubbard_u']['value'][0] = 4.0
+    assert model.hubbard_u == [['Co', '3d', 3.0]]
+    model.set_model_state(state)
+    assert model.hubbard_u == [['Co', '3d', 4.0]]
+    assert model.hubbard_v == []
+    # States saved with lists of lists are still accepted
+    model.set_model_state({'hubbard_v': [['Co', '3d', 'O', '2p', 1.0]]})
+    assert model.hubbard_v == [['Co', '3d', 'O', '2p', 1.0]]
+    with pytest.raises(TraitError):
+        model.hubbard_u = [['Co', '3d']]
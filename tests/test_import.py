@@ -0,0 +1,61 @@
+import subprocess
+import sys
+
+# Budget for the time spent in the plugin's own modules when the app loads the entry point.
+IMPORT_TIME_BUDGET_US = 50_000
+
+HEAVY_MODULES = (
+    'weas_widget',
+    'table_widget',
+    'aiida_hubbard.workflows.hubbard',
+    'aiida_quantumespresso.calculations.functions.create_kpoints_from_distance',
+)
+
+
+def _importtime(statement):
+    """Return the `python -X importtime` records (module -> self time in us) of `statement`."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    records = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time, _, module = line[len('import time:'):].split('|')
+        records[module.strip()] = int(self_time)
+    return records
+
+
+def test_entry_point_import_is_lazy():
+    # Loading the entry point alone, e.g. to list the plugins, imports none of them
+    records = _importtime('from aiidalab_qe_hp import hp; hp["outline"]')
+    assert not [module for module in HEAVY_MODULES if module in records]
+    own_time = sum(time for module, time in records.items() if module.startswith('aiidalab_qe_hp'))
+    assert own_time < IMPORT_TIME_BUDGET_US
+
+
+def test_entry_point_resolves():
+    from aiidalab_qe_hp import hp
+    from aiidalab_qe_hp.model import HPSettingsModel
+    from aiidalab_qe_hp.workchain import workchain_and_builder
+
+    assert hp['configuration']['model'] is HPSettingsModel
+    assert hp.get('workchain') is workchain_and_builder
+    assert set(hp) == {'outline', 'configuration', 'resources', 'workchain', 'result'}
+
+
+def test_app_startup_imports():
+    # `aiidalab_qe.workflows` resolves the work chain of every plugin, so `aiida_hubbard`
+    # is imported at startup, but the panels only when the app shows them
+    result = subprocess.run(
+        [sys.executable, '-c', 'import sys, aiidalab_qe.workflows; print(*sys.modules)'],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = result.stdout.split()
+    assert 'aiidalab_qe_hp.workchain' in modules
+    assert not [module for module in modules if module.startswith(('aiidalab_qe_hp.setting', 'aiidalab_qe_hp.result'))]
@@ -0,0 +1,70 @@
+import pytest
+
+
+@pytest.fixture
+def hubbard_run(LiCoO2, finished_run):
+    """Return a function that creates a finished Hubbard work chain with the given converged U of Co."""
+    from aiida_quantumespresso.data.hubbard_structure import HubbardStructureData
+
+    def factory(value, label='SelfConsistentHubbardWorkChain'):
+        outputs = HubbardStructureData.from_structure(LiCoO2)
+        outputs.initialize_onsites_hubbard('Co', '3d', value)
+        outputs.initialize_intersites_hubbard('Co', '3d', 'O', '2p', 1.2)
+        return finished_run(label, outputs)
+
+    return factory
+
+
+def test_hubbard_index(aiida_profile_clean, hubbard_run, tmp_path):
+    from aiidalab_qe_hp.index import HubbardIndex
+
+    index = HubbardIndex(tmp_path / 'index.sqlite')
+    runs = [hubbard_run(7.0), hubbard_run(8.0, 'AdaptiveHubbardWorkChain')]
+    uuids = [run.uuid for run in runs]
+    assert index.update(limit=1) == 1
+    assert index.update() == 1
+    # Indexed runs are not loaded again
+    assert index.update() == 0
+    assert len(HubbardIndex(tmp_path / 'index.sqlite')) == 2
+
+    columns = index.query(symbol='Co', manifold='3d', onsite=True, elements=['Li', 'O'], process_uuid=uuids)
+    assert sorted(columns['value'].tolist()) == [7.0, 8.0]
+    assert set(columns['process_uuid'].tolist()) == set(uuids)
+    assert set(columns['composition'].tolist()) == {'CoLiO2'}
+    assert len(index.query(elements=['S'], process_uuid=uuids)['value']) == 0
+
+    intersite = index.query(symbol='Co', neighbour_symbol='O', onsite=False, max_distance=2.0, process_uuid=uuids)
+    assert len(intersite['value']) > 0
+    assert (intersite['distance'] <= 2.0).all()
+
+    (onsite,) = index.aggregate(symbol=['Co', 'Li'], onsite=True, process_uuid=uuids)
+    assert (onsite['symbol_i'], onsite['manifold_i'], onsite['runs']) == ('Co', '3d', 2)
+    assert onsite['mean'] == pytest.approx(7.5)
+    assert onsite['std'] == pytest.approx(0.5)
+    assert (onsite['min'], onsite['max']) == (7.0, 8.0)
+    with pytest.raises(ValueError):
+        index.aggregate(group_by=('unknown',))
+
+    index.clear()
+    assert len(index) == 0
+
+
+def test_hubbard_index_concurrent_update(aiida_profile_clean, hubbard_run, tmp_path, monkeypatch):
+    from aiidalab_qe_hp import index as index_module
+    from aiidalab_qe_hp.index import HubbardIndex
+
+    run = hubbard_run(7.0)
+    index = HubbardIndex(tmp_path / 'index.sqlite')
+    other = HubbardIndex(tmp_path / 'index.sqlite')
+    extract_parameters = index_module.extract_parameters
+
+    def extract_parameters_racing(*args):
+        # Another kernel indexes the same run while this one extracts its parameters
+        monkeypatch.setattr(index_module, 'extract_parameters', extract_parameters)
+        assert other.update() == 1
+        return extract_parameters(*args)
+
+    monkeypatch.setattr(index_module, 'extract_parameters', extract_parameters_racing)
+    assert index.update() == 0
+    assert len(index) == 1
+    assert len(index.query(process_uuid=[run.uuid])['value']) == len(run.outputs.hubbard_structure.hubbard.parameters)
@@ -0,0 +1,12 @@
+import pytest
+
+
+def test_kind_pair_distances(LiCoO2):
+    from aiidalab_qe_hp.neighbors import get_kind_pair_distances
+
+    pairs = get_kind_pair_distances(LiCoO2, 3.5)
+    assert list(pairs) == [('Co', 'O'), ('Co', 'Li'), ('O', 'Li')]
+    assert pairs[('Co', 'O')] == pytest.approx(1.9209, abs=1e-4)
+    assert pairs[('O', 'Li')] == pytest.approx(2.0933, abs=1e-4)
+    # Pairs without neighbours within the cutoff are not proposed
+    assert list(get_kind_pair_distances(LiCoO2, 2.0)) == [('Co', 'O')]
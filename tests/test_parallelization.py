@@ -0,0 +1,37 @@
+from aiidalab_qe_hp.parallelization import (
+    get_fft_grid,
+    get_num_kpoints,
+    get_num_pools,
+    plan_parallelization,
+)
+
+
+def test_num_pools():
+    assert get_num_pools(64, 100) == 64
+    assert get_num_pools(64, 10) == 8
+    assert get_num_pools(12, 5) == 4
+    assert get_num_pools(7, 3) == 1
+
+
+def test_fft_grid(LiCoO2):
+    grid = get_fft_grid(LiCoO2.cell, 360)
+    assert len(grid) == 3
+    # only 2, 3 and 5 as prime factors, and a larger cutoff never shrinks the grid
+    for size in grid:
+        for factor in (2, 3, 5):
+            while size % factor == 0:
+                size //= factor
+        assert size == 1
+    assert all(a <= b for a, b in zip(grid, get_fft_grid(LiCoO2.cell, 720)))
+
+
+def test_num_kpoints(LiCoO2):
+    assert get_num_kpoints(LiCoO2, 0.15) >= get_num_kpoints(LiCoO2, 0.6) >= 1
+    assert get_num_kpoints(LiCoO2, 0.15, num_operations=12) < get_num_kpoints(LiCoO2, 0.15)
+
+
+def test_plan_parallelization():
+    plan = plan_parallelization(64, 10, num_bands=40, fft_grid=(48, 48, 48))
+    assert plan == {'npool': 8, 'ndiag': 1, 'pencil_decomposition': False}
+    plan = plan_parallelization(128, 1, num_bands=400, fft_grid=(48, 48, 48))
+    assert plan == {'npool': 1, 'ndiag': 121, 'pencil_decomposition': True}
@@ -0,0 +1,59 @@
+import pytest
+
+from aiidalab_qe_hp.policy import get_num_perturbations, get_stage_resources, scale_resources
+
+
+def resources(nodes=1, ntasks_per_node=4, walltime=3600):
+    return {'nodes': nodes, 'ntasks_per_node': ntasks_per_node, 'cpus_per_task': 1, 'max_wallclock_seconds': walltime}
+
+
+def test_num_perturbations():
+    assert get_num_perturbations(4, 8, False, False) == 1
+    assert get_num_perturbations(4, 8, True, False) == 4
+    assert get_num_perturbations(4, 8, True, True) == 32
+
+
+def test_scale_resources():
+    full = resources(nodes=4, ntasks_per_node=32, walltime=24 * 3600)
+    assert scale_resources(full, 1) == full
+    # two jobs share the four nodes
+    scaled = scale_resources(full, 2)
+    assert (scaled['nodes'], scaled['ntasks_per_node']) == (2, 32)
+    # many small jobs get part of a single machine
+    scaled = scale_resources(full, 16)
+    assert (scaled['nodes'], scaled['ntasks_per_node']) == (1, 8)
+    assert scaled['max_wallclock_seconds'] == full['max_wallclock_seconds']
+    scaled = scale_resources(full, 1000)
+    assert (scaled['nodes'], scaled['ntasks_per_node']) == (1, 1)
+
+
+def test_stage_resources():
+    codes = {'pw': resources(nodes=2), 'hp': resources(nodes=2, ntasks_per_node=16)}
+    policy = get_stage_resources(codes)
+    assert policy['relax'] == policy['scf'] == codes['pw']
+    assert policy['hp_perturbation'] == codes['hp']
+    assert policy['hp_init'] is None
+
+    policy = get_stage_resources(codes, num_atoms=4, parallelize_atoms=True)
+    assert policy['num_perturbations'] == 4
+    assert policy['hp_perturbation']['ntasks_per_node'] == 8
+    assert policy['hp_init']['ntasks_per_node'] == 8
+    assert policy['hp_init']['max_wallclock_seconds'] == 3600
+
+    policy = get_stage_resources(
+        codes, num_atoms=4, parallelize_atoms=True, overrides={'hp_init': {'max_wallclock_seconds': 600}}
+    )
+    assert policy['hp_init']['max_wallclock_seconds'] == 600
+    with pytest.raises(ValueError, match='Unknown stage'):
+        get_stage_resources(codes, overrides={'hp_collect': {}})
+
+
+def test_stage_resources_overrides():
+    codes = {'pw': resources(), 'hp': resources()}
+    policy = get_stage_resources(codes, overrides={'relax': {'max_wallclock_seconds': 100}})
+    assert policy['relax']['max_wallclock_seconds'] == 100
+    assert policy['scf']['max_wallclock_seconds'] == 3600
+    with pytest.raises(ValueError, match='Unknown stage'):
+        get_stage_resources(codes, overrides={'nscf': {}})
+    with pytest.raises(ValueError, match='Unknown resources'):
+        get_stage_resources(codes, overrides={'scf': {'queue': 'debug'}})
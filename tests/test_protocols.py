@@ -0,0 +1,81 @@
+import threading
+
+
+def test_get_protocol_inputs(monkeypatch):
+    from aiida_quantumespresso.workflows.pw.base import PwBaseWorkChain
+
+    from aiidalab_qe_hp import protocols
+    from aiidalab_qe_hp.protocols import _load_protocol_file, get_protocol_inputs
+
+    monkeypatch.setattr(protocols, '_PROTOCOL_INPUTS', {})
+    _load_protocol_file.cache_clear()
+    for protocol in ('fast', 'balanced', 'fast'):
+        inputs = get_protocol_inputs(PwBaseWorkChain, protocol)
+        assert inputs == PwBaseWorkChain.get_protocol_inputs(protocol)
+    # The YAML file is parsed once, however often the protocols are resolved
+    assert _load_protocol_file.cache_info().misses == 1
+    # Callers get their own copy
+    inputs['kpoints_distance'] = -1
+    assert get_protocol_inputs(PwBaseWorkChain, 'fast')['kpoints_distance'] > 0
+
+
+def test_get_protocol_inputs_overrides(monkeypatch):
+    from aiida import orm
+    from aiida_quantumespresso.workflows.pw.base import PwBaseWorkChain
+
+    from aiidalab_qe_hp import protocols
+    from aiidalab_qe_hp.protocols import get_protocol_inputs
+
+    monkeypatch.setattr(protocols, '_PROTOCOL_INPUTS', {})
+    overrides = {'kpoints_distance': 0.5, 'pw': {'parameters': {'SYSTEM': {'ecutwfc': 50}}}}
+    inputs = get_protocol_inputs(PwBaseWorkChain, 'fast', overrides)
+    overrides['pw']['parameters']['SYSTEM']['ecutwfc'] = 60
+    assert get_protocol_inputs(PwBaseWorkChain, 'fast', overrides)['pw']['parameters']['SYSTEM']['ecutwfc'] == 60
+    assert inputs['pw']['parameters']['SYSTEM']['ecutwfc'] == 50
+    assert len(protocols._PROTOCOL_INPUTS) == 2
+    # Nodes are passed on as they are, and not memoized
+    distance = orm.Float(0.3)
+    assert get_protocol_inputs(PwBaseWorkChain, 'fast', {'kpoints_distance': distance})['kpoints_distance'] is distance
+    assert len(protocols._PROTOCOL_INPUTS) == 2
+
+
+def test_cached_protocol_files():
+    from aiida_hubbard.workflows.hubbard import SelfConsistentHubbardWorkChain
+
+    from aiidalab_qe_hp.protocols import _load_protocol_file, cached_protocol_files
+
+    _load_protocol_file.cache_clear()
+    with cached_protocol_files():
+        with cached_protocol_files():
+            inputs = SelfConsistentHubbardWorkChain.get_protocol_inputs('fast')
+        assert SelfConsistentHubbardWorkChain.get_protocol_inputs('fast') == inputs
+        assert _load_protocol_file.cache_info().misses == 1
+        # Other threads read the files as before, and are not blocked while the context is open
+        thread = threading.Thread(target=SelfConsistentHubbardWorkChain.get_protocol_inputs, args=('fast',))
+        thread.start()
+        thread.join(timeout=10)
+        assert not thread.is_alive()
+    assert SelfConsistentHubbardWorkChain.get_protocol_inputs('fast') == inputs
+    info = _load_protocol_file.cache_info()
+    assert (info.hits, info.misses) == (1, 1)
+
+
+def test_cached_protocol_files_fallback(monkeypatch):
+    from aiida_quantumespresso.workflows.protocols.utils import ProtocolMixin
+    from aiida_quantumespresso.workflows.pw.base import PwBaseWorkChain
+
+    from aiidalab_qe_hp import protocols
+    from aiidalab_qe_hp.protocols import _load_protocol_file, cached_protocol_files
+
+    # A version of the mixin without `_load_protocol_file` is left as it is
+    original = protocols._ORIGINAL or ProtocolMixin.__dict__['_load_protocol_file']
+    monkeypatch.setattr(protocols, '_ORIGINAL', None)
+    monkeypatch.delattr(ProtocolMixin, '_load_protocol_file')
+    monkeypatch.setattr(PwBaseWorkChain, '_load_protocol_file', original, raising=False)
+    _load_protocol_file.cache_clear()
+    with cached_protocol_files():
+        inputs = PwBaseWorkChain.get_protocol_inputs('fast')
+    assert inputs['kpoints_distance'] > 0
+    assert protocols._ORIGINAL is None
+    assert '_load_protocol_file' not in ProtocolMixin.__dict__
+    assert _load_protocol_file.cache_info().misses == 0
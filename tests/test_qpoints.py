@@ -0,0 +1,35 @@
+import pytest
+
+
+@pytest.mark.parametrize('distance', [0.1, 0.3, 0.5, 1.0, 1.2, 3.0])
+@pytest.mark.parametrize('force_parity', [False, True])
+def test_qpoints_mesh(LiCoO2, distance, force_parity):
+    """The NumPy q-point mesh matches the one of `create_kpoints_from_distance`."""
+    from aiida.orm import Bool, Float
+    from aiida_quantumespresso.calculations.functions.create_kpoints_from_distance import (
+        create_kpoints_from_distance,
+    )
+
+    from aiidalab_qe_hp.qpoints import get_structure_qpoints_mesh
+
+    kpoints = create_kpoints_from_distance.process_class._func(LiCoO2, Float(distance), Bool(force_parity))
+    mesh = get_structure_qpoints_mesh(LiCoO2, distance, force_parity)
+    assert list(mesh) == kpoints.get_kpoints_mesh()[0]
+
+
+def test_qpoints_mesh_pbc():
+    from aiidalab_qe_hp.qpoints import get_qpoints_mesh
+
+    cell = [[4.0, 0.0, 0.0], [0.0, 5.0, 0.0], [0.0, 0.0, 20.0]]
+    assert get_qpoints_mesh(cell, (True, True, False), 0.5) == (4, 3, 1)
+    assert get_qpoints_mesh(cell, (True, True, False), 0.5, force_parity=True) == (4, 4, 1)
+
+
+def test_qpoints_refinement(LiCoO2):
+    from aiidalab_qe_hp.qpoints import get_qpoints_refinement, get_structure_qpoints_mesh
+
+    distances = get_qpoints_refinement(LiCoO2, 1.2)
+    assert distances == [2.7, 1.8, 1.2]
+    assert [get_structure_qpoints_mesh(LiCoO2, d) for d in distances] == [(1, 1, 1), (2, 2, 2), (3, 3, 3)]
+    # only the finest meshes are kept
+    assert get_qpoints_refinement(LiCoO2, 0.3, max_meshes=2) == [0.45, 0.3]
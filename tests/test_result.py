@@ -0,0 +1,332 @@
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def hubbard_LiCoO2(LiCoO2):
+    from aiida_quantumespresso.data.hubbard_structure import HubbardStructureData
+
+    hubbard_structure = HubbardStructureData.from_structure(LiCoO2)
+    hubbard_structure.initialize_onsites_hubbard('Co', '3d', 3.0)
+    hubbard_structure.initialize_intersites_hubbard('Co', '3d', 'O', '2p', 1.0)
+    hubbard_structure.append_hubbard_parameter(0, '3d', 2, '2p', 0.5, (1, 0, -1), 'V')
+    hubbard_structure.append_hubbard_parameter(3, '2s', 0, '3d', 0.25, (-1, 1, 1), 'V')
+    return hubbard_structure
+
+
+def _generate_table_data_loop(structure):
+    """Reference per-site implementation the vectorized table builder replaces."""
+    from aiida_quantumespresso.utils.hubbard import get_supercell_atomic_index
+
+    natoms = len(structure.sites)
+    data = []
+    for site in structure.hubbard.dict()['parameters']:
+        kind_i = structure.sites[site['atom_index']].kind_name
+        kind_j = structure.sites[site['neighbour_index']].kind_name
+        distance = np.linalg.norm(
+            structure.sites[site['neighbour_index']].position
+            + np.dot(site['translation'], structure.cell)
+            - structure.sites[site['atom_index']].position
+        )
+        data.append(
+            {
+                'hubbard_type': site['hubbard_type'],
+                'atom_manifold_i': f"{kind_i}-{site['atom_manifold']}",
+                'atom_manifold_j': f"{kind_j}-{site['neighbour_manifold']}",
+                'atom_index_i': site['atom_index'] + 1,
+                'atom_index_j': get_supercell_atomic_index(site['neighbour_index'], natoms, site['translation']) + 1,
+                'value': round(site['value'], 2),
+                'translation': site['translation'],
+                'distance': round(distance, 2),
+            }
+        )
+    return data
+
+
+def test_generate_table_data(hubbard_LiCoO2):
+    from aiidalab_qe_hp.result.table import TABLE_COLUMNS, generate_table_data
+
+    table_data = generate_table_data(hubbard_LiCoO2)
+    assert table_data['columns'] == TABLE_COLUMNS
+    assert len(table_data['data']) == 4
+    assert table_data['data'] == _generate_table_data_loop(hubbard_LiCoO2)
+    # Values that are not exact in binary are rounded as by Python's `round`
+    for value in (2.675, 4.445, 1.005, 0.125):
+        hubbard_LiCoO2.append_hubbard_parameter(0, '3d', 1, '2p', value, (0, 0, 0), 'V')
+    table_data = generate_table_data(hubbard_LiCoO2)
+    assert [row['value'] for row in table_data['data'][-4:]] == [2.67, 4.45, 1.0, 0.12]
+    assert table_data['data'] == _generate_table_data_loop(hubbard_LiCoO2)
+
+
+def test_results_cache(hubbard_LiCoO2, tmp_path):
+    from aiidalab_qe_hp.result.cache import STRUCTURE_FIELDS, ResultsCache
+    from aiidalab_qe_hp.result.table import compute_table_columns, get_hubbard_arrays, iter_table_rows
+
+    arrays = get_hubbard_arrays(hubbard_LiCoO2)
+    entry = {
+        'table_columns': compute_table_columns(arrays),
+        'structure': {key: arrays[key] for key in STRUCTURE_FIELDS},
+        'trace': {
+            'tolerance_onsite': 0.1,
+            'tolerance_intersite': 0.01,
+            'iterations': [{
+                'iteration': 1,
+                'delta_onsite': 0.5,
+                'delta_intersite': None,
+                'stages': {'hp': {'wall': 10.0, 'queue': 2.0, 'cpu': 40.0}},
+            }],
+        },
+    }
+    cache = ResultsCache(directory=tmp_path, maxsize=2)
+    cache.set('a', 'a@1', entry)
+    cache.set('b', None, entry)  # unsealed processes are never cached
+    assert cache.get('a', 'a@1') is entry
+    assert cache.get('b', None) is None
+    # A fresh cache (e.g. a new kernel) reloads the entry from disk
+    reloaded = ResultsCache(directory=tmp_path, maxsize=2).get('a', 'a@1')
+    assert list(iter_table_rows(reloaded['table_columns'])) == list(iter_table_rows(entry['table_columns']))
+    assert np.allclose(reloaded['structure']['positions'], arrays['positions'])
+    assert reloaded['trace'] == entry['trace']
+    # A changed node (new mtime) invalidates the entry
+    assert cache.get('a', 'a@2') is None
+    assert not (tmp_path / 'a.json').exists()
+    # Least-recently-used entries are evicted
+    for uuid in ('c', 'd', 'e'):
+        cache.set(uuid, f'{uuid}@1', entry)
+    assert cache.get('c', 'c@1') is None
+    assert sorted(path.stem for path in tmp_path.glob('*.json')) == ['d', 'e']
+    # Truncated files and files of an older format are misses, and are deleted
+    for uuid, content in (('f', '{"fingerprint": "f@1", "ent'), ('g', '{"fingerprint": "g@1"}'), ('h', '[]')):
+        (tmp_path / f'{uuid}.json').write_text(content)
+        assert ResultsCache(directory=tmp_path).get(uuid, f'{uuid}@1') is None
+        assert not (tmp_path / f'{uuid}.json').exists()
+
+
+def test_results_model_cache_hit(aiida_profile_clean, hubbard_LiCoO2, tmp_path, monkeypatch):
+    from aiida import orm
+    from aiida.common.links import LinkType
+
+    from aiidalab_qe_hp.result import cache
+    from aiidalab_qe_hp.result.model import HpResultsModel
+
+    monkeypatch.setattr(cache, '_RESULTS_CACHE', cache.ResultsCache(directory=tmp_path))
+    workchain = orm.WorkflowNode().store()
+    output = hubbard_LiCoO2.clone().store()
+    output.base.links.add_incoming(workchain, LinkType.RETURN, 'hp__hubbard_structure')
+    workchain.seal()
+    model = HpResultsModel(process_uuid=workchain.uuid)
+    model.fetch_result()
+    assert model.hubbard_structure.uuid == output.uuid
+    # A cached result only holds the arrays; the structure is loaded when asked for
+    model = HpResultsModel(process_uuid=workchain.uuid)
+    model.fetch_result()
+    assert model.hubbard_structure is None
+    assert model.fetch_hubbard_structure().uuid == output.uuid
+
+
+def test_table_row_source(hubbard_LiCoO2):
+    from aiidalab_qe_hp.result.table import TableRowSource, compute_table_columns, generate_table_data, get_hubbard_arrays
+
+    table_data = generate_table_data(hubbard_LiCoO2)
+    source = TableRowSource(compute_table_columns(get_hubbard_arrays(hubbard_LiCoO2)))
+    assert len(source) == 4
+    window = source.window(1, 3)
+    assert [row.pop('id') for row in window] == [1, 2]
+    assert window == table_data['data'][1:3]
+
+    source.query(sort_by='value', descending=True)
+    assert [row['value'] for row in source.window(0, 10)] == [3.0, 1.0, 0.5, 0.25]
+    source.query(text='li-')
+    assert [row['id'] for row in source.window(0, 10)] == [3]
+    assert source.row(3) == table_data['data'][3]
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'jsonl', 'parquet'])
+def test_export_processes(aiida_profile_clean, hubbard_LiCoO2, finished_run, tmp_path, fmt):
+    import csv
+    import json
+
+    from aiidalab_qe_hp.result.export import export_processes, write_rows
+    from aiidalab_qe_hp.result.table import generate_table_data
+
+    if fmt == 'parquet':
+        pq = pytest.importorskip('pyarrow.parquet')
+    workchains = [finished_run('SelfConsistentHubbardWorkChain', hubbard_LiCoO2.clone()) for _ in range(2)]
+    expected = generate_table_data(hubbard_LiCoO2)['data']
+
+    # Rows are converted in batches smaller than the table
+    path = tmp_path / f'export.{fmt}'
+    assert export_processes([workchains[0], workchains[1].uuid], path, batch_size=3) == 2 * len(expected)
+    if fmt == 'csv':
+        with open(path, encoding='utf-8') as handle:
+            rows = list(csv.DictReader(handle))
+        assert rows[0]['translation'] == ' '.join(str(value) for value in expected[0]['translation'])
+        assert [float(row['value']) for row in rows] == [row['value'] for row in expected] * 2
+    elif fmt == 'jsonl':
+        rows = [json.loads(line) for line in path.read_text().splitlines()]
+        assert rows[len(expected)] == {'process_uuid': workchains[1].uuid, **expected[0], 'translation': [0, 0, 0]}
+    else:
+        rows = pq.read_table(path).to_pylist()
+        assert [row['translation'] for row in rows[:4]] == [list(row['translation']) for row in expected]
+    assert [row['process_uuid'] for row in rows] == [workchain.uuid for workchain in workchains for _ in expected]
+
+    # An empty table still has a header
+    assert write_rows(iter([]), tmp_path / f'empty.{fmt}') == 0
+    # which includes the process of every row for a batch of processes
+    assert export_processes([], tmp_path / f'empty_processes.{fmt}') == 0
+    if fmt == 'csv':
+        header = (tmp_path / 'empty_processes.csv').read_text().splitlines()[0].split(',')
+        assert header[0] == 'process_uuid'
+    elif fmt == 'parquet':
+        assert pq.read_table(tmp_path / 'empty_processes.parquet').column_names[0] == 'process_uuid'
+    with pytest.raises(ValueError):
+        write_rows(iter(expected), tmp_path / 'export.xlsx')
+
+
+def test_results_model_iter_rows(hubbard_LiCoO2):
+    from aiidalab_qe_hp.result.model import HpResultsModel
+    from aiidalab_qe_hp.result.table import compute_table_columns, generate_table_data, get_hubbard_arrays
+
+    model = HpResultsModel()
+    model.table_columns = compute_table_columns(get_hubbard_arrays(hubbard_LiCoO2))
+    assert list(model.iter_rows()) == generate_table_data(hubbard_LiCoO2)['data']
+
+
+def _tile_supercell_loop(atoms0):
+    """Reference implementation the broadcasted supercell tiling replaces."""
+    atoms = atoms0.copy()
+    atoms.translate(np.dot([1, 1, 1], atoms.cell))
+    for i in range(-1, 2):
+        for j in range(-1, 2):
+            for k in range(-1, 2):
+                if i == 0 and j == 0 and k == 0:
+                    continue
+                atoms_copy = atoms0.copy()
+                atoms_copy.translate(np.dot([i + 1, j + 1, k + 1], atoms0.cell))
+                atoms.extend(atoms_copy)
+    return atoms
+
+
+def test_tile_supercell(LiCoO2):
+    from aiidalab_qe_hp.result.structure import tile_supercell
+
+    atoms0 = LiCoO2.get_ase()
+    positions, indices = tile_supercell(atoms0.positions, atoms0.cell)
+    assert np.allclose(positions, _tile_supercell_loop(atoms0).positions)
+    assert (indices == np.arange(27 * len(atoms0))).all()
+
+    positions, indices = tile_supercell(atoms0.positions, atoms0.cell, cutoff=1.0)
+    assert (indices[: len(atoms0)] == np.arange(len(atoms0))).all()
+    assert len(atoms0) < len(positions) < 27 * len(atoms0)
+    assert np.allclose(positions, _tile_supercell_loop(atoms0).positions[indices])
+
+
+@pytest.mark.parametrize('natoms', [10, 100, 500, 2000])
+def test_tile_supercell_memory(natoms):
+    """The tiling should only allocate a small multiple of the 27x output."""
+    import tracemalloc
+
+    from aiidalab_qe_hp.result.structure import tile_supercell
+
+    length = natoms ** (1 / 3) * 2.0
+    cell = np.diag([length, length, length])
+    positions = np.random.default_rng(0).random((natoms, 3)) @ cell
+    tracemalloc.start()
+    supercell, _ = tile_supercell(positions, cell)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert supercell.shape == (27 * natoms, 3)
+    assert peak < 3 * supercell.nbytes + 64 * 1024
+
+
+def test_hubbard_deltas():
+    from aiidalab_qe_hp.result.trace import get_hubbard_deltas, parse_call_label
+
+    old = [(0, '3d', 0, '3d', 5.0, (0, 0, 0), 'V'), (0, '3d', 1, '2p', 1.0, (0, 0, 0), 'V')]
+    new = [(0, '3d', 0, '3d', 5.5, (0, 0, 0), 'V'), (0, '3d', 1, '2p', 0.9, (0, 0, 0), 'V')]
+    assert get_hubbard_deltas(old, new) == pytest.approx((0.5, 0.1))
+    assert get_hubbard_deltas(old[:1], new[:1]) == (pytest.approx(0.5), None)
+    assert get_hubbard_deltas(old[:1], new) == (None, None)
+    assert parse_call_label('iteration_02_scf_fixed_magnetic') == (2, 'scf')
+    assert parse_call_label('iteration_10_hp') == (10, 'hp')
+    assert parse_call_label('relax') is None
+
+
+def test_iteration_trace(aiida_profile_clean, hubbard_LiCoO2, pw_code, finished_run):
+    from aiida import orm
+    from aiida.common.links import LinkType
+    from aiidalab_qe_hp.result.provenance import ProcessTree
+    from aiidalab_qe_hp.result.trace import format_trace, get_iteration_trace
+
+    workchain = finished_run('SelfConsistentHubbardWorkChain', inputs={'tolerance_onsite': orm.Float(0.1)})
+    output = hubbard_LiCoO2.clone()
+    output.hubbard = output.hubbard.model_copy(update={
+        'parameters': [
+            parameter.model_copy(update={'value': parameter.value + 0.05})
+            for parameter in output.hubbard.parameters
+        ]
+    })
+    hp = finished_run(
+        'HpWorkChain',
+        output,
+        inputs={'hp__hubbard_structure': hubbard_LiCoO2.clone()},
+        caller=workchain,
+        link_label='iteration_01_hp',
+    )
+
+    calculation = orm.CalcJobNode(computer=pw_code.computer)
+    calculation.set_option('resources', {'num_machines': 2, 'num_mpiprocs_per_machine': 4})
+    calculation.base.links.add_incoming(hp, LinkType.CALL_CALC, 'hp')
+    calculation.store()
+
+    tree = ProcessTree.fetch(workchain, input_labels=['hp__hubbard_structure'])
+    assert len(tree) == 2
+    assert tree.find('SelfConsistentHubbardWorkChain') == []
+    assert [tree.columns['link_label'][row] for row in tree.children()] == ['iteration_01_hp']
+    assert tree.descendants(workchain.pk, calculations_only=True) == [tree.children(hp.pk)[0]]
+    assert tree.outputs[hp.pk] == {'hubbard_structure': output.pk}
+    assert tree.inputs[hp.pk].keys() == {'hp__hubbard_structure'}
+
+    trace = get_iteration_trace(workchain, tree)
+    assert trace['tolerance_onsite'] == 0.1 and trace['tolerance_intersite'] is None
+    (iteration,) = trace['iterations']
+    assert iteration['iteration'] == 1
+    assert iteration['delta_onsite'] == pytest.approx(0.05)
+    assert iteration['delta_intersite'] == pytest.approx(0.05)
+    assert set(iteration['stages']) == {'hp'}
+    # without scheduler job info, the CPU time is the run time on the 8 cores
+    run_time = (calculation.mtime - calculation.ctime).total_seconds()
+    assert iteration['stages']['hp']['cpu'] == pytest.approx(8 * run_time, abs=1e-3)
+    assert iteration['stages']['hp']['queue'] == 0
+    assert '&#10003;' in format_trace(trace)
+
+
+def test_results_panel_download(hubbard_LiCoO2, tmp_path, monkeypatch):
+    import base64
+    import csv
+    import tempfile
+
+    import ipywidgets as ipw
+    from IPython import display
+
+    from aiidalab_qe_hp.result import HpResultsModel, HpResultsPanel
+    from aiidalab_qe_hp.result.table import compute_table_columns, get_hubbard_arrays
+
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+    displayed = []
+    monkeypatch.setattr(display, 'display', displayed.append)
+    model = HpResultsModel()
+    model.table_columns = compute_table_columns(get_hubbard_arrays(hubbard_LiCoO2))
+    model.process_uuid = '0123456789abcdef'
+    panel = HpResultsPanel(model=model)
+    panel.export_format = ipw.Dropdown(options=[('CSV', 'csv')], value='csv')
+    panel.download_button = ipw.Button()
+    panel.download_link = ipw.Output()
+    panel._on_download_click()
+    # The file is sent to the browser, and no temporary files are left behind
+    assert not list(tmp_path.iterdir())
+    script = displayed[0].data
+    assert "link.download = 'hubbard_parameters_01234567.csv'" in script
+    payload = script.split('base64,')[1].split("'")[0]
+    rows = list(csv.DictReader(base64.b64decode(payload).decode().splitlines()))
+    assert len(rows) == 4
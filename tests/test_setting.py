@@ -15,14 +15,182 @@ def test_setting(LiCoO2):
     setting._update_hubbard_tables() # Render
     assert parameters == {
         'method': 'one-shot',
+        'relax_type': 'cell',
         'qpoints_distance': 1.2,
         'parallelize_atoms': True,
         'parallelize_qpoints': True,
         'calculation_type': 'DFT+U+V',
         'projector_type': 'ortho-atomic',
-        'hubbard_u': [['Co', '3d', 3.0]],
-        'hubbard_v': [['Co', '3d', 'O', '2p', 1.0]],
+        'merge_kinds': False,
+        'warm_start': False,
+        'reuse_charge_density': False,
+        'hubbard_v_cutoff': 3.5,
+        'hubbard_u': {'kind': ['Co'], 'manifold': ['3d'], 'value': [3.0]},
+        'hubbard_v': {'kind_i': ['Co'], 'manifold_i': ['3d'], 'kind_j': ['O'], 'manifold_j': ['2p'], 'value': [1.0]},
     }
-    parameters['hubbard_u'][0][2] = 4.0
+    parameters['hubbard_u']['value'][0] = 4.0
+    parameters['hubbard_v_cutoff'] = 4.0
     setting._model.set_model_state(parameters)
     assert model.hubbard_u == [['Co', '3d', 4.0]]
+    assert model.hubbard_v_cutoff == 4.0
+
+
+def test_hubbard_grid():
+    from aiidalab_qe_hp.grid import HUBBARD_V_COLUMNS, HubbardGrid
+
+    grid = HubbardGrid(HUBBARD_V_COLUMNS, key_fields=('kind_i', 'kind_j'))
+    grid.set_rows([
+        {'selected': False, 'kind_i': 'Co', 'manifold_i': '', 'kind_j': 'O', 'manifold_j': '', 'value': 0.0},
+        {'selected': False, 'kind_i': 'Co', 'manifold_i': '', 'kind_j': 'Li', 'manifold_j': '', 'value': 0.0},
+    ])
+    # A cell edit in the browser sends back a single row
+    grid.updatedRow = {**grid.data[1], 'selected': True, 'manifold_i': '3d', 'value': '1.5'}
+    assert grid.get_row(('Co', 'Li'))['value'] == 1.5
+    # An emptied number cell keeps its last valid value
+    grid.updatedRow = {**grid.data[1], 'value': ''}
+    assert grid.get_row(('Co', 'Li'))['value'] == 1.5
+    grid.update_row(('Co', 'O'), selected=True, manifold_i='3d', manifold_j='2p')
+    assert [row['selected'] for row in grid.data] == [True, True]
+    assert grid.get_row(('Co', 'O'))['manifold_j'] == '2p'
+
+
+def test_hubbard_row_updates(LiCoO2):
+    import asyncio
+
+    from aiidalab_qe_hp.model import HPSettingsModel
+    from aiidalab_qe_hp.setting import HPSettingsPanel
+
+    model = HPSettingsModel()
+    model.input_structure = LiCoO2
+    model.calculation_type = 'DFT+U+V'
+    setting = HPSettingsPanel(model=model)
+    setting._update_hubbard_tables()
+    changes = []
+    model.observe(changes.append, ['hubbard_u', 'hubbard_v'])
+
+    async def edit():
+        # Browser edits within the debounce delay reach the model as one change per list
+        u_row = setting.hubbard_u.get_row('Co')
+        setting.hubbard_u.updatedRow = {**u_row, 'selected': True, 'manifold': '3d', 'value': 3.0}
+        v_row = setting.hubbard_v.get_row(('Co', 'O'))
+        setting.hubbard_v.updatedRow = {**v_row, 'selected': True, 'manifold_i': '3d', 'manifold_j': '2p'}
+        assert model.hubbard_u == []
+        await asyncio.sleep(2 * setting.hubbard_debounce_delay)
+
+    asyncio.run(edit())
+    assert model.hubbard_u == [['Co', '3d', 3.0]]
+    assert model.hubbard_v == [['Co', '3d', 'O', '2p', 1e-10]]
+    assert len(changes) == 2
+    # Edits from Python are applied immediately
+    setting.hubbard_u.update_row('Co', selected=False)
+    assert model.hubbard_u == []
+
+
+def test_hubbard_tables_keep_selections(LiCoO2):
+    from aiidalab_qe_hp.model import HPSettingsModel
+    from aiidalab_qe_hp.setting import HPSettingsPanel
+
+    model = HPSettingsModel()
+    model.input_structure = LiCoO2
+    setting = HPSettingsPanel(model=model)
+    setting._update_hubbard_tables()
+    # The V table is only built for DFT+U+V
+    assert setting.hubbard_v.data == []
+    setting.hubbard_u.update_row('Co', selected=True, manifold='3d', value=3.0)
+    model.calculation_type = 'DFT+U+V'
+    assert model.hubbard_u == [['Co', '3d', 3.0]]
+    assert setting.hubbard_u.get_row('Co')['selected']
+    setting.hubbard_v.update_row(('Co', 'O'), selected=True, manifold_i='3d', manifold_j='2p', value=1.0)
+    assert model.hubbard_v == [['Co', '3d', 'O', '2p', 1.0]]
+    # Hiding the V table keeps its rows, but V is only submitted for DFT+U+V
+    model.calculation_type = 'DFT+U'
+    assert model.hubbard_v == []
+    model.calculation_type = 'DFT+U+V'
+    assert model.hubbard_v == [['Co', '3d', 'O', '2p', 1.0]]
+    # Rows of the kinds that are still in the structure keep their edits
+    setting._update_hubbard_tables()
+    assert model.hubbard_u == [['Co', '3d', 3.0]]
+
+
+def test_hubbard_tables_show_model_changes(LiCoO2):
+    from aiidalab_qe_hp.model import HPSettingsModel
+    from aiidalab_qe_hp.setting import HPSettingsPanel
+
+    model = HPSettingsModel()
+    model.input_structure = LiCoO2
+    setting = HPSettingsPanel(model=model)
+    setting._update_hubbard_tables()
+    setting.hubbard_u.update_row('Li', selected=True, manifold='2s', value=1.0)
+    # A state loaded after the tables are built replaces the selection
+    model.hubbard_u = [['Co', '3d', 4.0]]
+    assert setting.hubbard_u.get_row('Co')['selected']
+    assert setting.hubbard_u.get_row('Co')['value'] == 4.0
+    assert not setting.hubbard_u.get_row('Li')['selected']
+    # and is kept by the next edit
+    setting.hubbard_u.update_row('O', selected=True, manifold='2p', value=2.0)
+    assert model.hubbard_u == [['Co', '3d', 4.0], ['O', '2p', 2.0]]
+
+
+def test_cost_estimate_symmetry_cache(LiCoO2, monkeypatch):
+    from aiidalab_qe_hp import setting as setting_module
+    from aiidalab_qe_hp.model import HPSettingsModel
+    from aiidalab_qe_hp.setting import HPSettingsPanel
+
+    calls = []
+    original = setting_module.get_estimate_symmetry
+
+    def get_estimate_symmetry(structure, merge_kinds=False, magnetic_moments=None):
+        calls.append(merge_kinds)
+        return original(structure, merge_kinds, magnetic_moments)
+
+    monkeypatch.setattr(setting_module, 'get_estimate_symmetry', get_estimate_symmetry)
+    model = HPSettingsModel()
+    setting = HPSettingsPanel(model=model)
+    model.input_structure = LiCoO2
+    for distance in (1.0, 0.8, 0.6):
+        model.qpoints_distance = distance
+    assert 'hp.x jobs' in setting.Info.value
+    # The symmetry search only runs again for another `merge_kinds`
+    assert calls == [False]
+    model.merge_kinds = True
+    assert calls == [False, True]
+    # nor for magnetic moments that are not used
+    model.moments = {'Co': 1.0}
+    assert calls == [False, True]
+    model.spin_type = 'collinear'
+    assert calls == [False, True, True]
+
+
+def test_hubbard_pending_edits_in_state(LiCoO2):
+    import asyncio
+
+    from aiidalab_qe_hp.model import HPSettingsModel
+    from aiidalab_qe_hp.setting import HPSettingsPanel
+
+    model = HPSettingsModel()
+    model.input_structure = LiCoO2
+    setting = HPSettingsPanel(model=model)
+    setting._update_hubbard_tables()
+
+    async def edit():
+        row = setting.hubbard_u.get_row('Co')
+        setting.hubbard_u.updatedRow = {**row, 'selected': True, 'manifold': '3d', 'value': 3.0}
+        # Reading the state, e.g. on submission, does not wait for the debounce
+        return model.get_model_state()
+
+    state = asyncio.run(edit())
+    assert state['hubbard_u'] == {'kind': ['Co'], 'manifold': ['3d'], 'value': [3.0]}
+    assert setting._pending_flush is None
+
+
+def test_cost_estimate_core_hours(LiCoO2):
+    from aiidalab_qe_hp.model import HPSettingsModel
+    from aiidalab_qe_hp.setting import HPSettingsPanel
+
+    model = HPSettingsModel()
+    setting = HPSettingsPanel(model=model)
+    model.input_structure = LiCoO2
+    assert 'core-hours' not in setting.Info.value
+    resources = {'nodes': 1, 'ntasks_per_node': 4, 'cpus_per_task': 1, 'max_wallclock_seconds': 3600}
+    model.codes = {'pw': resources, 'hp': resources}
+    assert 'core-hours' in setting.Info.value
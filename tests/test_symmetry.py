@@ -0,0 +1,78 @@
+import pytest
+from aiida import orm
+
+
+@pytest.fixture
+def CoO_two_kinds():
+    """Rocksalt CoO in a doubled cell, with the two Co sites given different kind names."""
+    a = 4.26
+    structure = orm.StructureData(cell=[[a, 0, 0], [0, a, 0], [0, 0, 2 * a]])
+    for index, z in enumerate((0.0, a)):
+        name = f'Co{index + 1}'
+        structure.append_atom(position=(0, 0, z), symbols='Co', name=name)
+        structure.append_atom(position=(a / 2, a / 2, z), symbols='Co', name=name)
+        structure.append_atom(position=(a / 2, 0, z), symbols='O', name='O')
+        structure.append_atom(position=(0, a / 2, z), symbols='O', name='O')
+        structure.append_atom(position=(0, 0, z + a / 2), symbols='O', name='O')
+        structure.append_atom(position=(a / 2, a / 2, z + a / 2), symbols='O', name='O')
+        structure.append_atom(position=(a / 2, 0, z + a / 2), symbols='Co', name=name)
+        structure.append_atom(position=(0, a / 2, z + a / 2), symbols='Co', name=name)
+    return structure
+
+
+def test_kind_mapping(CoO_two_kinds):
+    from aiidalab_qe_hp.symmetry import get_kind_mapping
+
+    assert get_kind_mapping(CoO_two_kinds) == {'Co1': 'Co1', 'Co2': 'Co1', 'O': 'O'}
+    # kinds with different magnetic moments are kept apart
+    moments = {'Co1': 3.0, 'Co2': -3.0, 'O': 0.0}
+    assert get_kind_mapping(CoO_two_kinds, moments) == {'Co1': 'Co1', 'Co2': 'Co2', 'O': 'O'}
+
+
+def test_kind_symmetry(CoO_two_kinds):
+    from aiidalab_qe_hp.symmetry import get_kind_symmetry
+
+    symmetry = get_kind_symmetry(CoO_two_kinds)
+    assert symmetry['Co1'] == {'sites': 4, 'irreducible': 1, 'merged_into': None}
+    assert symmetry['Co2']['irreducible'] == 1
+    merged = get_kind_symmetry(CoO_two_kinds, merge_kinds=True)
+    assert merged['Co1'] == {'sites': 8, 'irreducible': 1, 'merged_into': None}
+    assert merged['Co2'] == {'sites': 0, 'irreducible': 0, 'merged_into': 'Co1'}
+
+
+def test_estimate_cost_merge_kinds(CoO_two_kinds):
+    from aiidalab_qe_hp.cost import estimate_cost
+
+    parameters = {'merge_kinds': True, 'hubbard_u': [['Co1', '3d', 3.0], ['Co2', '3d', 3.0]]}
+    assert estimate_cost(CoO_two_kinds, parameters)['perturbed_atoms'] == 1
+    # antiferromagnetic sublattices are not merged, as in `get_builder`
+    moments = {'Co1': 3.0, 'Co2': -3.0, 'O': 0.0}
+    assert estimate_cost(CoO_two_kinds, parameters, magnetic_moments=moments)['perturbed_atoms'] == 2
+
+
+def test_canonicalize_kinds(CoO_two_kinds):
+    from aiidalab_qe_hp.symmetry import canonicalize_kinds, get_kind_mapping, merge_kind_parameters
+
+    mapping = get_kind_mapping(CoO_two_kinds)
+    canonical = canonicalize_kinds(CoO_two_kinds, mapping)
+    assert canonical.get_kind_names() == ['Co1', 'O']
+    assert len(canonical.sites) == len(CoO_two_kinds.sites)
+    parameters = {
+        'hp': {
+            'hubbard_u': [['Co1', '3d', 1.0], ['Co2', '3d', 2.0]],
+            'hubbard_v': [['Co1', '3d', 'O', '2p', 1.0], ['Co2', '3d', 'O', '2p', 1.0]],
+        },
+        'advanced': {'initial_magnetic_moments': {'Co1': 3.0, 'Co2': 3.0, 'O': 0.0}},
+    }
+    merge_kind_parameters(parameters, mapping)
+    assert parameters['hp']['hubbard_u'] == [['Co1', '3d', 1.0]]
+    assert parameters['hp']['hubbard_v'] == [['Co1', '3d', 'O', '2p', 1.0]]
+    assert parameters['advanced']['initial_magnetic_moments'] == {'Co1': 3.0, 'O': 0.0}
+
+
+def test_merged_cost(CoO_two_kinds):
+    from aiidalab_qe_hp.cost import estimate_cost
+
+    hp_parameters = {'hubbard_u': [['Co1', '3d', 1.0], ['Co2', '3d', 1.0]], 'parallelize_atoms': True}
+    assert estimate_cost(CoO_two_kinds, hp_parameters)['perturbed_atoms'] == 2
+    assert estimate_cost(CoO_two_kinds, {**hp_parameters, 'merge_kinds': True})['perturbed_atoms'] == 1
@@ -0,0 +1,55 @@
+import pytest
+from aiida import orm
+from aiida.common.links import LinkType
+
+
+@pytest.fixture
+def converged_run(LiCoO2, pw_code, finished_run):
+    """A finished `SelfConsistentHubbardWorkChain` on LiCoO2, with an scf that left a remote folder."""
+    from aiida_quantumespresso.data.hubbard_structure import HubbardStructureData
+
+    inputs = HubbardStructureData.from_structure(LiCoO2)
+    inputs.initialize_onsites_hubbard('Co', '3d', 1e-10)
+    outputs = HubbardStructureData.from_structure(LiCoO2)
+    outputs.initialize_onsites_hubbard('Co', '3d', 7.5)
+    outputs.initialize_intersites_hubbard('Co', '3d', 'O', '2p', 1.2)
+    workchain = finished_run('SelfConsistentHubbardWorkChain', outputs, inputs={'hubbard_structure': inputs})
+
+    scf = finished_run('PwBaseWorkChain', caller=workchain, link_label='iteration_01_scf_smearing')
+    folder = orm.RemoteData(computer=pw_code.computer, remote_path='/tmp').store()
+    folder.base.links.add_incoming(scf, LinkType.RETURN, 'remote_folder')
+    return workchain, folder
+
+
+def test_reduced_composition():
+    from aiidalab_qe_hp.warmstart import get_reduced_composition
+
+    assert get_reduced_composition(['Co', 'O', 'O', 'Co']) == (('Co', 1), ('O', 1))
+    assert get_reduced_composition(['Li', 'Co', 'O', 'O']) == (('Co', 1), ('Li', 1), ('O', 2))
+
+
+def test_find_previous_run(aiida_profile_clean, LiCoO2, converged_run):
+    from aiidalab_qe_hp.warmstart import find_previous_run
+
+    workchain, _ = converged_run
+    assert find_previous_run(LiCoO2) == (workchain, True)
+    # a supercell has the same composition, but is not the same structure
+    supercell = orm.StructureData(ase=LiCoO2.get_ase().repeat((2, 1, 1)))
+    node, same_structure = find_previous_run(supercell)
+    assert node.pk == workchain.pk and not same_structure
+    assert find_previous_run(supercell, match='structure') is None
+
+
+def test_warm_start_hubbard(aiida_profile_clean, LiCoO2, converged_run):
+    from aiidalab_qe_hp.warmstart import get_charge_density_folder, warm_start_hubbard
+
+    workchain, folder = converged_run
+    hubbard_u, hubbard_v = warm_start_hubbard(
+        LiCoO2,
+        [['Co', '3d', 1e-10], ['Li', '2s', 1e-10]],
+        [['Co', '3d', 'O', '2p', 1e-10]],
+        workchain.outputs.hubbard_structure,
+    )
+    assert hubbard_u == [['Co', '3d', 7.5], ['Li', '2s', 1e-10]]
+    assert hubbard_v == [['Co', '3d', 'O', '2p', 1.2]]
+    assert get_charge_density_folder(workchain).pk == folder.pk
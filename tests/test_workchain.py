@@ -1,4 +1,4 @@
-def test_workchain(LiCoO2, pw_code, hp_code):
+def test_workchain(LiCoO2, pw_code, hp_code, pseudo_family):
     from aiidalab_qe_hp.workchain import get_builder
     from aiidalab_qe_hp.setting import HPSettingsPanel
     from aiidalab_qe_hp.model import HPSettingsModel
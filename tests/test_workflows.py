@@ -0,0 +1,40 @@
+import pytest
+from aiida import orm
+
+
+def test_qpoints_distances_validation():
+    from aiidalab_qe_hp.workflows import validate_qpoints_distances
+
+    assert validate_qpoints_distances(orm.List([2.0, 1.0, 0.5]), None) is None
+    assert 'at least one' in validate_qpoints_distances(orm.List([]), None)
+    assert 'positive' in validate_qpoints_distances(orm.List([1.0, 0.0]), None)
+    assert 'decreasing' in validate_qpoints_distances(orm.List([1.0, 1.0]), None)
+
+
+def test_max_differences():
+    from aiidalab_qe_hp.workflows import get_max_differences
+
+    old = [(0, '3d', 0, '3d', 5.0, (0, 0, 0), 'Ueff'), (0, '3d', 1, '2p', 1.0, (0, 0, 0), 'V')]
+    new = [(0, '3d', 0, '3d', 5.3, (0, 0, 0), 'Ueff'), (0, '3d', 1, '2p', 0.95, (0, 0, 0), 'V')]
+    onsite, intersite = get_max_differences(old, new)
+    assert onsite == pytest.approx(0.3)
+    assert intersite == pytest.approx(0.05)
+    assert get_max_differences(old[:1], new[:1]) == (pytest.approx(0.3), None)
+
+
+def test_adaptive_workchain_spec():
+    from aiida.plugins import WorkflowFactory
+    from aiida_hubbard.workflows.hubbard import SelfConsistentHubbardWorkChain
+
+    from aiidalab_qe_hp.workflows import AdaptiveHubbardWorkChain, QpointsRefinementWorkChain
+
+    spec = AdaptiveHubbardWorkChain.spec()
+    assert not spec.inputs['qpoints_distances'].required
+    assert 'qpoints_distance' in spec.outputs
+    # it accepts every input of the `SelfConsistentHubbardWorkChain`
+    assert set(SelfConsistentHubbardWorkChain.spec().inputs) < set(spec.inputs)
+    refinement = QpointsRefinementWorkChain.spec()
+    assert refinement.inputs['qpoints_distances'].required
+    assert {'hubbard_structure', 'qpoints_distance'} <= set(refinement.outputs)
+    assert WorkflowFactory('aiidalab_qe_hp.adaptive_hubbard') is AdaptiveHubbardWorkChain
+    assert WorkflowFactory('aiidalab_qe_hp.qpoints_refinement') is QpointsRefinementWorkChain